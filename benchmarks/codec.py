@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Records encoding: binary codecs against JSON+snappy
+
+Measures encode and decode throughput and encoded size for each record family:
+
+    python -m benchmarks.codec --records 200000"""
+
+import argparse
+import json
+import time
+
+import snappy
+
+from sotoki.utils.database.codec import (
+    RecordCodec,
+    file_codec,
+    user_codec,
+)
+
+RECORDS: dict[str, tuple[RecordCodec, tuple]] = {
+    "user": (user_codec, ("User 123456", 12345, 1, 12, 34)),
+    "file": (
+        file_codec,
+        (
+            "https://i.sstatic.net/AbCdE.png?s=64&g=1",
+            "users_profiles/123456.webp",
+            0,
+        ),
+    ),
+}
+
+
+def json_snappy_encode(record: tuple) -> bytes:
+    return snappy.compress(json.dumps(record))
+
+
+def json_snappy_decode(data: bytes) -> tuple:
+    return json.loads(snappy.decompress(data))
+
+
+def timed(func, arg, nb_records: int) -> str:
+    started_on = time.perf_counter()
+    for _ in range(nb_records):
+        func(arg)
+    duration = time.perf_counter() - started_on
+    return f"{nb_records / duration:>12,.0f}/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'record':<17}{'scheme':<12}{'encode':>14}{'decode':>14}{'size':>7}")
+    for name, (codec, record) in RECORDS.items():
+        for scheme, encode, decode in (
+            ("json+snappy", json_snappy_encode, json_snappy_decode),
+            ("codec", codec.encode, codec.decode),
+        ):
+            data = encode(record)
+            encode_speed = timed(encode, record, args.records)
+            decode_speed = timed(decode, data, args.records)
+            print(f"{name:<17}{scheme:<12}{encode_speed}{decode_speed}{len(data):>6}B")
+
+
+if __name__ == "__main__":
+    main()
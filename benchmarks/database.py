@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Database backends comparison on questions and users records
+
+Records synthetic questions and users through PostsDatabase and UsersDatabase, then
+reads them back as rendering does (one lookup per question and per user):
+
+    python -m benchmarks.database --questions 100000 --backends redis sqlite
+
+Questions metadata and details go to the (backend independent) memory-mapped
+questions store, included in reported size.
+
+Redis backend uses REDIS_URL (default redis://localhost:6379) and FLUSHES it.
+Users records memory saving of hash buckets is measured against one hash per record:
+
+    python -m benchmarks.database --backends redis --bucket-size 1"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sotoki.context import Context
+
+tmpdir = Path(tempfile.mkdtemp())
+Context.setup(
+    domain="test.stackexchange.com",
+    mirror="https://archive.org",
+    title="Benchmark",
+    description="Database backends benchmark",
+    output_dir=tmpdir / "output",
+    tmp_dir=tmpdir / "build",
+)
+
+from sotoki.utils.database.base import Database  # noqa: E402
+from sotoki.utils.database.posts import PostsDatabase  # noqa: E402
+from sotoki.utils.database.redisdb import RedisDatabase  # noqa: E402
+from sotoki.utils.database.sqlitedb import SQLiteDatabase  # noqa: E402
+from sotoki.utils.database.tags import TagsDatabase  # noqa: E402
+from sotoki.utils.database.users import UsersDatabase  # noqa: E402
+from sotoki.utils.shared import shared  # noqa: E402
+from tests.conftest import BODY  # noqa: E402
+
+BACKENDS = {"redis": RedisDatabase, "sqlite": SQLiteDatabase}
+
+
+def get_question(post_id: int) -> dict:
+    return {
+        "Id": post_id,
+        "Score": post_id % 100,
+        "Title": f"How to do thing number {post_id}?",
+        "Body": BODY,
+        "Tags": ["python", "threads"],
+        "OwnerUserId": str(post_id % 1000),
+        "OwnerName": str(post_id % 1000),
+        "CreationTimestamp": 1620000000 + post_id,
+        "has_accepted": bool(post_id % 2),
+        "nb_answers": post_id % 5,
+        "users_ids": {post_id % 1000},
+    }
+
+
+def get_user(user_id: int) -> dict:
+    return {
+        "Id": user_id,
+        "DisplayName": f"User {user_id}",
+        "Reputation": user_id * 10,
+        "nb_gold": 1,
+        "nb_silver": 2,
+        "nb_bronze": 3,
+    }
+
+
+def timed(func, nb_items: int) -> str:
+    started_on = time.perf_counter()
+    func()
+    duration = time.perf_counter() - started_on
+    return f"{nb_items / duration:>10,.0f}/s"
+
+
+def database_size(backend: str) -> str:
+    if backend == "redis":
+        size = shared.database.memory_usage() or 0
+    else:
+        size = sum(
+            fpath.stat().st_size for fpath in shared.build_dir.glob("database.sqlite*")
+        )
+    size += shared.postsdatabase.questions.size()
+    return f"{size / 2**20:>8,.1f}MiB"
+
+
+def run(backend: str, nb_questions: int, nb_users: int):
+    shared.build_dir = tmpdir / backend
+    shared.build_dir.mkdir(parents=True, exist_ok=True)
+    shared.database = BACKENDS[backend](initialize=True)
+    shared.tagsdatabase = TagsDatabase()
+    shared.postsdatabase = PostsDatabase()
+    shared.usersdatabase = UsersDatabase()
+
+    def write():
+        for post_id in range(nb_questions):
+            shared.postsdatabase.record_question(get_question(post_id))
+        for user_id in range(nb_users):
+            shared.usersdatabase.record_user(get_user(user_id))
+        shared.database.commit()
+        shared.postsdatabase.ack_questions_store()
+
+    def read():
+        for post_id in range(nb_questions):
+            shared.postsdatabase.get_question_details(post_id)
+        for user_id in range(nb_users):
+            shared.usersdatabase.get_user_full(user_id)
+
+    nb_items = nb_questions + nb_users
+    write_speed = timed(write, nb_items)
+    read_speed = timed(read, nb_items)
+    shared.database.purge()
+    print(
+        f"{backend:<8} write: {write_speed}  read: {read_speed}  "
+        f"size: {database_size(backend)}"
+    )
+    shared.database.teardown()
+    shared.database.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument("--bucket-size", type=int, default=Database.records_bucket_size)
+    args = parser.parse_args()
+
+    Database.records_bucket_size = args.bucket_size
+    print(
+        f"{args.questions} questions, {args.users} users, "
+        f"{args.bucket_size} records per bucket"
+    )
+    for backend in args.backends:
+        try:
+            run(backend, args.questions, args.users)
+        except Exception as exc:
+            print(f"{backend:<8} failed: {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Full scrape of a real site with each database backend
+
+Runs the scraper (downloading dumps from --mirror) once per backend and reports wall
+time, peak RSS of the scraper process and database size once scrape completed:
+
+    python -m benchmarks.end_to_end --domain sports.stackexchange.com \\
+        --mirror https://archive.org/download/stackexchange_20240829 \\
+        --backends redis sqlite -- --without-images
+
+Arguments after `--` are passed to the scraper. SQLite database size is the size
+of its files ; Redis one is `used_memory` (and `used_memory_peak`) of the server at
+REDIS_URL (default redis://localhost:6379), which is FLUSHED before and after.
+
+Redis memory saved by records buckets is measured against one hash per record,
+along the database memory report (per keys family) of last step:
+
+    python -m benchmarks.end_to_end --domain sports.stackexchange.com \\
+        --mirror https://archive.org/download/stackexchange_20240829 \\
+        --backends redis --bucket-sizes 1 100 -- --without-images"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import redis
+
+BACKENDS = ["redis", "sqlite"]
+# scraper's records_bucket_size is kept
+DEFAULT_BUCKET_SIZE = "default"
+
+
+def run_scraper():
+    """scraper entrypoint (in subprocess) with records bucket size as first argument"""
+    import sotoki.__main__  # noqa: PLC0415
+
+    bucket_size = sys.argv.pop(1)
+    prepare_context = sotoki.__main__.prepare_context
+
+    def prepare_context_with_bucket_size(raw_args: list[str]):
+        prepare_context(raw_args)
+        # database modules require an initialized context
+        from sotoki.utils.database.base import Database  # noqa: PLC0415
+
+        if bucket_size != DEFAULT_BUCKET_SIZE:
+            Database.records_bucket_size = int(bucket_size)
+
+    sotoki.__main__.prepare_context = prepare_context_with_bucket_size
+    sotoki.__main__.main()
+
+
+def scrape(
+    backend: str, bucket_size: str, args: argparse.Namespace, work_dir: Path
+) -> dict:
+    """run the scraper in a subprocess, returning its duration and peak RSS"""
+    command = [
+        sys.executable,
+        "-c",
+        "from benchmarks.end_to_end import run_scraper; run_scraper()",
+        bucket_size,
+        "--domain",
+        args.domain,
+        "--mirror",
+        args.mirror,
+        "--title",
+        "Benchmark",
+        "--description",
+        "End-to-end database backends benchmark",
+        "--db-backend",
+        backend,
+        "--tmp-dir",
+        str(work_dir),
+        "--output",
+        str(work_dir / "output"),
+        "--stats-filename",
+        str(work_dir / "stats.json"),
+        "--build-in-tmp",
+        "--keep",
+        "--keep-redis",
+        *args.scraper_args,
+    ]
+    started_on = time.perf_counter()
+    process = subprocess.Popen(command)  # nosec
+    _, status, rusage = os.wait4(process.pid, 0)
+    duration = time.perf_counter() - started_on
+    if os.waitstatus_to_exitcode(status):
+        raise RuntimeError(f"scraper exited with {os.waitstatus_to_exitcode(status)}")
+    # ru_maxrss is in KiB on Linux
+    return {"duration": duration, "peak_rss": rusage.ru_maxrss * 2**10}
+
+
+def database_size(backend: str, work_dir: Path, client: redis.Redis) -> str:
+    if backend == "redis":
+        info = client.info("memory")
+        return (
+            f"{info['used_memory'] / 2**20:,.1f}MiB "
+            f"(peak {info['used_memory_peak'] / 2**20:,.1f}MiB)"
+        )
+    size = sum(fpath.stat().st_size for fpath in work_dir.glob("database.sqlite*"))
+    return f"{size / 2**20:,.1f}MiB"
+
+
+def memory_report(work_dir: Path) -> list[str]:
+    """estimated memory per keys family of last step's database report, if any"""
+    with open(work_dir / "stats.json") as fh:
+        reports = json.load(fh).get("database_memory")
+    if not reports:
+        return []
+    step, report = list(reports.items())[-1]
+    return [f"  after {step}: {report['estimated_bytes'] / 2**20:,.1f}MiB"] + [
+        f"    {family:<12} {family_report['keys']:>12,} keys "
+        f"{family_report['estimated_bytes'] / 2**20:>10,.1f}MiB"
+        for family, family_report in report["families"].items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--domain", required=True)
+    parser.add_argument("--mirror", required=True)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--bucket-sizes", nargs="+", default=[DEFAULT_BUCKET_SIZE])
+    parser.add_argument("scraper_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    if args.scraper_args[:1] == ["--"]:
+        args.scraper_args = args.scraper_args[1:]
+
+    client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
+    results = []
+    for backend in args.backends:
+        for bucket_size in args.bucket_sizes:
+            name = f"{backend}/{bucket_size}"
+            work_dir = Path(tempfile.mkdtemp(prefix=f"{backend}_{bucket_size}_"))
+            if backend == "redis":
+                client.flushdb()
+            try:
+                measures = scrape(backend, bucket_size, args, work_dir)
+                results.append(
+                    f"{name:<16} {measures['duration']:>10,.0f}s "
+                    f"{measures['peak_rss'] / 2**20:>10,.1f}MiB "
+                    f"{database_size(backend, work_dir, client):>12}"
+                )
+                results += memory_report(work_dir)
+            except Exception as exc:
+                results.append(f"{name:<16} failed: {exc}")
+            finally:
+                if backend == "redis":
+                    client.flushdb()
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{args.domain} (backend/records bucket size)")
+    print(f"{'':<16} {'wall time':>11} {'peak RSS':>13} {'database':>12}")
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Questions rendering throughput depending on the number of executor threads
+
+Renders a synthetic dump with PostGenerator (no Redis, no ZIM) for several values
+of --threads. Compare results between a regular and a free-threaded (3.14t) build:
+
+    python -m benchmarks.free_threading --questions 2000 --threads 1 2 4 8 16
+    python3.14t -m benchmarks.free_threading --questions 2000 --threads 1 2 4 8 16
+"""
+
+import argparse
+import functools
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sotoki.context import Context
+
+tmpdir = Path(tempfile.mkdtemp())
+Context.setup(
+    domain="test.stackexchange.com",
+    mirror="https://archive.org",
+    title="Benchmark",
+    description="Rendering throughput benchmark",
+    output_dir=tmpdir / "output",
+    tmp_dir=tmpdir / "build",
+)
+
+from sotoki.posts import PostGenerator  # noqa: E402
+from sotoki.utils.executor import SotokiExecutor  # noqa: E402
+from sotoki.utils.misc import is_gil_enabled  # noqa: E402
+from sotoki.utils.shared import shared  # noqa: E402
+from tests.conftest import setup_shared, write_posts_complete  # noqa: E402
+
+
+def run(nb_threads: int) -> float:
+    """seconds it took to render all questions using nb_threads workers"""
+    shared.executor = SotokiExecutor(
+        queue_size=max(10, 2 * nb_threads), nb_workers=nb_threads
+    )
+    started_on = time.perf_counter()
+    PostGenerator().run()
+    return time.perf_counter() - started_on
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    build_dir = tmpdir / "build"
+    build_dir.mkdir(parents=True, exist_ok=True)
+    write_posts_complete(build_dir / "posts_complete.xml", args.questions)
+    setup_shared(build_dir, functools.partial(setattr, shared))
+
+    gil = "enabled" if is_gil_enabled() else "disabled"
+    print(f"Python {sys.version.split()[0]} - GIL {gil}")
+    baseline = None
+    for nb_threads in args.threads:
+        duration = run(nb_threads)
+        throughput = args.questions / duration
+        baseline = baseline or throughput
+        print(
+            f"{nb_threads:>3} threads: {throughput:>8.1f} questions/s "
+            f"(x{throughput / baseline:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
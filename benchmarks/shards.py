@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Redis sharding throughput on users records with 1, 2 and 4 redis instances
+
+Starts redis-server instances (on unix sockets in a temporary folder) then records
+synthetic users and reads them back, in pages, from concurrent threads as
+rendering does:
+
+    python -m benchmarks.shards --users 500000 --threads 8 --shards 1 2 4
+
+Requires redis-server in PATH."""
+
+import argparse
+import concurrent.futures
+import shutil
+import subprocess
+import time
+
+from benchmarks.database import get_user, timed, tmpdir
+from sotoki.utils.database.redisdb import RedisDatabase
+from sotoki.utils.database.users import UsersDatabase
+from sotoki.utils.shared import context, shared
+
+# users read at once, as on a page
+PAGE_SIZE = 36
+
+
+def start_servers(
+    redis_server: str, nb_shards: int
+) -> tuple[list[subprocess.Popen], list[str]]:
+    """redis-server processes and their URLs, once accepting connections"""
+    processes, sockets = [], []
+    for index in range(nb_shards):
+        socket = tmpdir / f"redis-{nb_shards}-{index}.sock"
+        processes.append(
+            subprocess.Popen(
+                [
+                    redis_server,
+                    "--port",
+                    "0",
+                    "--unixsocket",
+                    str(socket),
+                    "--save",
+                    "",
+                    "--appendonly",
+                    "no",
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+        )
+        sockets.append(socket)
+    while not all(socket.exists() for socket in sockets):
+        time.sleep(0.1)
+    return processes, [f"unix://{socket}" for socket in sockets]
+
+
+def run(redis_server: str, nb_shards: int, nb_users: int, nb_threads: int):
+    processes, urls = start_servers(redis_server, nb_shards)
+    context.redis_url = ",".join(urls)
+    shared.database = RedisDatabase(initialize=True)
+    shared.usersdatabase = UsersDatabase()
+    pages = [
+        range(start, min(start + PAGE_SIZE, nb_users))
+        for start in range(0, nb_users, PAGE_SIZE)
+    ]
+
+    def write():
+        with concurrent.futures.ThreadPoolExecutor(nb_threads) as executor:
+            for page in pages:
+                executor.submit(
+                    lambda page: [
+                        shared.usersdatabase.record_user(get_user(user_id))
+                        for user_id in page
+                    ],
+                    page,
+                )
+        shared.database.commit()
+
+    def read():
+        with concurrent.futures.ThreadPoolExecutor(nb_threads) as executor:
+            list(executor.map(shared.usersdatabase.get_users_full, pages))
+
+    try:
+        write_speed = timed(write, nb_users)
+        read_speed = timed(read, nb_users)
+        print(f"{nb_shards} shard(s)  write: {write_speed}  read: {read_speed}")
+        shared.database.teardown()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    redis_server = shutil.which("redis-server")
+    if not redis_server:
+        parser.error("redis-server is not in PATH")
+
+    context.nb_threads = args.threads
+    print(f"{args.users} users, {args.threads} threads")
+    for nb_shards in args.shards:
+        run(redis_server, nb_shards, args.users, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Top users tracking: heap-based TopDict against scanning the dict on each insert
+
+Records users with a long-tailed reputation distribution (most users have a
+reputation of 1, as on StackOverflow) into a top of NB_PAGINATED_USERS:
+
+    python -m benchmarks.topk --users 2000000
+
+Scanning implementation is O(top size) per insert so it is only run on the first
+--scan-users users."""
+
+import argparse
+import collections
+import random
+import threading
+import time
+
+from sotoki.constants import NB_PAGINATED_USERS
+from sotoki.utils.topk import TopDict
+
+
+class ScanTopDict(collections.UserDict):
+    """previous implementation: min(values) and key lookup on each insert"""
+
+    def __init__(self, maxlen: int):
+        super().__init__()
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            if len(self) >= self.maxlen:
+                min_val = min(self.values())
+                if value < min_val:
+                    return
+                min_key = list(self.keys())[list(self.values()).index(min_val)]
+                del self[min_key]
+            super().__setitem__(key, value)
+
+
+def reputations(nb_users: int, seed: int = 42) -> list[int]:
+    rng = random.Random(seed)  # nosec # noqa: S311
+    return [int(rng.paretovariate(0.5)) for _ in range(nb_users)]
+
+
+def timed(top_class, values: list[int]) -> float:
+    top = top_class(NB_PAGINATED_USERS)
+    started_on = time.perf_counter()
+    for user_id, reputation in enumerate(values):
+        top[user_id] = reputation
+    return time.perf_counter() - started_on
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2_000_000)
+    parser.add_argument("--scan-users", type=int, default=50_000)
+    args = parser.parse_args()
+
+    values = reputations(args.users)
+    print(f"top {NB_PAGINATED_USERS:,} of {args.users:,} users")
+    for name, top_class, nb_users in (
+        ("scan", ScanTopDict, min(args.scan_users, args.users)),
+        ("heap", TopDict, args.users),
+    ):
+        duration = timed(top_class, values[:nb_users])
+        print(
+            f"{name:<6}{nb_users:>12,} users in {duration:>8.2f}s "
+            f"{nb_users / duration:>14,.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
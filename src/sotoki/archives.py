@@ -4,9 +4,11 @@ import concurrent.futures as cf
 
 from zimscraperlib.download import save_large_file, stream_file
 
+from sotoki.utils.database.columnar import ANSWERS_INDEX
 from sotoki.utils.misc import has_binary
 from sotoki.utils.preparation import (
     count_xml_rows,
+    extract_answers_index,
     merge_posts_with_answers_comments,
     merge_users_with_badges,
 )
@@ -128,6 +130,10 @@ class ArchiveManager:
                 logger.info("Extracted parts present; reusing")
         else:
             logger.info("Prepared dumps already present; reusing.")
+            answers_index = shared.build_dir / ANSWERS_INDEX
+            if not answers_index.exists():
+                extract_answers_index(src=posts, dst=answers_index)
+                logger.info("Extracted answers index from prepared posts")
             self.count_items(users, posts, tags)
             shared.progresser.update(nb_done=1, nb_total=1)
             return
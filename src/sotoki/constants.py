@@ -30,6 +30,24 @@ NB_USERS_PER_PAGE = 36
 NB_USERS_PAGES = 100
 NB_PAGINATED_USERS = NB_USERS_PER_PAGE * NB_USERS_PAGES
 
+# number of entries in users and questions (title, excerpt) LRU caches
+USERS_CACHE_SIZE = 50000
+QUESTIONS_CACHE_SIZE = 50000
+# number of rendered user cards (~1KiB) in LRU cache, per user and page depth
+USER_CARDS_CACHE_SIZE = 50000
+
+# default upper bound of processing threads (factor of --threads) in adaptive mode
+ADAPTIVE_MAX_THREADS_FACTOR = 4
+
+# memory watchdog: seconds between two samples of memory usage
+MEMORY_WATCHDOG_INTERVAL = 5
+# throttle executors above this ratio of used memory ; resume below low watermark
+MEMORY_HIGH_WATERMARK = 0.9
+MEMORY_LOW_WATERMARK = 0.8
+
+# SQLite database backend: max bytes of database file mapped in memory (per process)
+SQLITE_MMAP_SIZE = 64 * 2**30
+
 HTTP_REQUEST_TIMEOUT = 30
 MAX_FILE_DOWNLOAD_RETRIES = 5
 # minimum number of files failing download before starting to consider for failing
@@ -8,7 +8,7 @@ from typing import Any
 
 from zimscraperlib.logging import DEFAULT_FORMAT_WITH_THREADS, getLogger
 
-from sotoki.constants import NAME
+from sotoki.constants import ADAPTIVE_MAX_THREADS_FACTOR, NAME
 
 
 @dataclass(kw_only=True)
@@ -26,7 +26,9 @@ class Context:
     domain: str
     mirror: str
 
-    # URL to redis instance
+    # database backend: redis or sqlite
+    db_backend: str = "redis"
+    # URL to redis instance ; comma-separated URLs to shard keys across instances
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
 
     # ZIM metadata
@@ -48,7 +50,10 @@ class Context:
     tmp_dir: Path = Path(os.getenv("TMPDIR", "./build"))
 
     # performances
-    nb_threads: int = 1
+    nb_threads: int = 3
+    nb_img_threads: int = 10
+    adaptive_threads: bool = False
+    max_threads: int | None = None
     s3_url_with_credentials: str | None = ""
 
     # censorship
@@ -60,9 +65,13 @@ class Context:
     without_users_links: bool = False
     without_names: bool = False
 
+    # no a/{answer_id} redirects to question pages
+    without_answers_redirects: bool = False
+
     # debug/devel
     keep_build_dir: bool = False
     keep_redis: bool = False
+    resume: bool = False
     debug: bool = False
     prepare_only: bool = False
     keep_intermediate_files: bool = False
@@ -119,6 +128,18 @@ class Context:
                     return None
         return None
 
+    @property
+    def redis_urls(self) -> list[str]:
+        """URLs of redis instances (shards) in --redis-url"""
+        return [url.strip() for url in self.redis_url.split(",") if url.strip()]
+
+    @property
+    def max_workers(self) -> int:
+        """maximum number of processing workers (adaptive executor can grow)"""
+        if not self.adaptive_threads:
+            return self.nb_threads
+        return self.max_threads or self.nb_threads * ADAPTIVE_MAX_THREADS_FACTOR
+
     @property
     def any_restriction(self) -> bool:
         return (
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import datetime
 import re
+import threading
 from typing import Any
 
 from sotoki.constants import NB_PAGINATED_QUESTIONS, NB_QUESTIONS_PER_PAGE
@@ -29,7 +30,6 @@ class WalkerWithTrigger(Walker):
         self.seen += 1
         if self.seen % 10000 == 0:
             logger.debug(f"Seen {self.seen}")
-            shared.collect()
 
 
 class FirstPassWalker(WalkerWithTrigger):
@@ -78,6 +78,9 @@ class FirstPassWalker(WalkerWithTrigger):
 
 class PostFirstPasser(Generator):
 
+    batch_size = 100
+    batch_max_size = 2_000_000
+
     @property
     def walker(self):
         return FirstPassWalker
@@ -91,6 +94,7 @@ class PostFirstPasser(Generator):
         self.nb_answered = 0
         self.nb_accepted = 0
         self.most_recent_ts = 0
+        self.stats_lock = threading.Lock()
 
     def run(self):
         super().run()
@@ -104,28 +108,25 @@ class PostFirstPasser(Generator):
     def processor(self, item):
         # ignore deleted posts
         if "DeletionDate" in item:
-            self.release()
             return
         # skip post without answers ; maybe?
         if context.without_unanswered and not item["nb_answers"]:
-            self.release()
             return
 
         harmonize_post(item)
 
         # update stats
-        self.nb_answers += item["nb_answers"]
-        if item["has_accepted"]:
-            self.nb_accepted += 1
-        if item["nb_answers"]:
-            self.nb_answered += 1
+        with self.stats_lock:
+            self.nb_answers += item["nb_answers"]
+            if item["has_accepted"]:
+                self.nb_accepted += 1
+            if item["nb_answers"]:
+                self.nb_answered += 1
 
-        self.most_recent_ts = max(self.most_recent_ts, item["CreationTimestamp"])
+            self.most_recent_ts = max(self.most_recent_ts, item["CreationTimestamp"])
 
         shared.postsdatabase.record_question(post=item)
 
-        self.release()
-
 
 class PostsWalker(WalkerWithTrigger):
     """posts_complete SAX parser
@@ -260,11 +261,9 @@ class PostGenerator(Generator):
     def processor(self, item):
         post = item
         if context.without_unanswered and not post["answers"]:
-            self.release()
             return
         # ignore deleted posts
         if "DeletionDate" in item:
-            self.release()
             return
         harmonize_post(post)
 
@@ -285,40 +284,32 @@ class PostGenerator(Generator):
             )
         del post_page
 
-        for answer in post.get("answers", []):
-            with shared.lock:
-                shared.creator.add_redirect(
-                    path=f'a/{answer["Id"]}',
-                    target_path=path,
-                )
+        # list item of questions displayed in listings, while post is at hand
+        if shared.postsdatabase.is_listed(post["Id"]):
+            shared.postsdatabase.record_list_item(
+                post["Id"], shared.renderer.get_question_list_item(post)
+            )
 
-        self.release()
+        # links to answers are rewritten to their question page (see Rewriter)
+        # a/{id} redirects are for linking into the ZIM as online
+        if not context.without_answers_redirects and post.get("answers"):
+            with shared.lock:
+                for answer in post["answers"]:
+                    shared.creator.add_redirect(
+                        path=f'a/{answer["Id"]}',
+                        target_path=path,
+                    )
 
     def generate_questions_page(self):
-        paginator = SortedSetPaginator(
-            shared.postsdatabase.questions_key(),
-            per_page=NB_QUESTIONS_PER_PAGE,
-            at_most=NB_PAGINATED_QUESTIONS,
+        shared.executor.start()
+        self.submit_pages(
+            SortedSetPaginator(
+                shared.postsdatabase.questions_key(),
+                per_page=NB_QUESTIONS_PER_PAGE,
+                at_most=NB_PAGINATED_QUESTIONS,
+            ),
+            path="questions",
+            title="Highest Voted Questions",
+            render=shared.renderer.get_all_questions_for_page,
         )
-        for page_number in paginator.page_range:
-            page = paginator.get_page(page_number)
-            with shared.lock:
-                page_content = shared.renderer.get_all_questions_for_page(page)
-                # we don't index same-title page for all paginated pages
-                # instead we index the redirect to the first page
-                shared.creator.add_item_for(
-                    path=(
-                        "questions"
-                        if page_number == 1
-                        else f"questions_page={page_number}"
-                    ),
-                    content=page_content,
-                    mimetype="text/html",
-                    title="Highest Voted Questions" if page_number == 1 else None,
-                    is_front=page_number == 1,
-                )
-                del page_content
-        with shared.lock:
-            shared.creator.add_redirect(
-                path="questions_page=1", target_path="questions", is_front=False
-            )
+        self.join_tasks()
@@ -3,13 +3,27 @@
 import datetime
 from typing import Any
 
-from jinja2 import Environment, PackageLoader
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    PackageLoader,
+    pass_context,
+)
+from jinja2.runtime import Context as TemplateContext
 from jinja2_pluralize import pluralize_dj
 
+from sotoki.constants import USER_CARDS_CACHE_SIZE
+from sotoki.utils.cache import MISSING, LRUCache
+from sotoki.utils.database.users import user_key
 from sotoki.utils.html import get_slug_for
 from sotoki.utils.paginator import Paginator
 from sotoki.utils.shared import context, shared
 
+# stands for the action time (asked/answered/edited date) in cached user cards
+ACTION_TIME_PLACEHOLDER = "\x00action_time\x00"
+# stands for the page depth (to_root) in pre-rendered question list items
+TO_ROOT_PLACEHOLDER = "\x00to_root\x00"
+
 
 def number_format(number: int, *, short: bool = False):
     try:
@@ -50,13 +64,35 @@ def date_format(adate: datetime.datetime | str, fmt: str = "%b %d '%y at %H:%M")
     return adate
 
 
-def extend_questions(questions):
-    for post_id, score in questions:
-        yield shared.postsdatabase.get_question_details(post_id=post_id, score=score)
+def extend_questions(questions) -> list[dict]:
+    """details for a page of (post_id, score) questions, fetched at once"""
+    return shared.postsdatabase.get_questions_details(questions)
+
+
+def prefetch_owners(questions: list[dict]) -> dict:
+    """users map of questions owners, for the `user` filter"""
+    return shared.usersdatabase.get_users_full(
+        {question.get("owner_user_id") for question in questions} - {None}
+    )
+
 
+def get_post_users_ids(post: dict) -> set:
+    """ids of users displayed on a question page: owners, editors and commenters"""
+    users_ids = set()
+    for item in [post, *post.get("answers", [])]:
+        users_ids.add(item.get("OwnerUserId"))
+        users_ids.add(item.get("LastEditorUserId"))
+        users_ids.update(comment.get("UserId") for comment in item.get("comments", []))
+    users_ids.discard(None)
+    return users_ids
 
-def get_user_details(user_id):
-    user = shared.usersdatabase.get_user_full(user_id)
+
+def get_user_details(user_id, users: dict | None = None):
+    """user for templates, from prefetched users map if it includes it"""
+    if users is not None and user_id in users:
+        user = users[user_id]
+    else:
+        user = shared.usersdatabase.get_user_full(user_id)
     if not user:
         return {"deleted": True, "name": user_id}
     user["slug"] = get_slug_for(user["name"])
@@ -64,6 +100,12 @@ def get_user_details(user_id):
     return user
 
 
+@pass_context
+def user_filter(ctx: TemplateContext, user_id):
+    """`user` filter, using users prefetched for the page (if any)"""
+    return get_user_details(user_id, ctx.get("prefetched_users"))
+
+
 class SortedSetPaginator(Paginator):
     def __init__(self, set_name: str, per_page: int = 10, at_most: int | None = None):
         self.set_name = set_name
@@ -100,34 +142,81 @@ class ListPaginator(Paginator):
 
 class Renderer:
     def __init__(self):
+        # compiled templates are kept in tmp_dir so next runs (and other renderers)
+        # load bytecode instead of parsing and compiling templates again.
+        # Entries are keyed by template source checksum so they can't get stale
+        bytecode_dir = context.tmp_dir / "templates_bytecode"
+        bytecode_dir.mkdir(parents=True, exist_ok=True)
         # disabling autoescape as we are mosty inputing HTML content from SE dumps
         # that we trust already (should not include any XSS)
         self.env = Environment(  # nosec
-            loader=PackageLoader("sotoki"), autoescape=False  # noqa: S701
+            loader=PackageLoader("sotoki"),
+            autoescape=False,  # noqa: S701
+            bytecode_cache=FileSystemBytecodeCache(str(bytecode_dir)),
+            # templates are packaged: never check for source updates
+            auto_reload=False,
+            # never evict a compiled template
+            cache_size=-1,
         )
         self.env.filters["int"] = int
-        self.env.filters["user"] = get_user_details
+        self.env.filters["user"] = user_filter
         self.env.filters["number"] = number_format
         self.env.filters["number_short"] = number_format_short
         self.env.filters["datetime"] = date_format
         self.env.filters["datetime"] = date_format
         self.env.filters["pluralize"] = pluralize_dj
-        self.env.filters["question_score"] = shared.postsdatabase.get_question_score
-        self.env.filters["has_accepted"] = (
-            shared.postsdatabase.question_has_accepted_answer
-        )
         self.env.filters["rewrote"] = shared.rewriter.rewrite
         self.env.filters["rewrote_comment"] = shared.rewriter.rewrite_comment
         self.env.filters["rewrote_string"] = shared.rewriter.rewrite_string
         self.env.filters["slugify"] = get_slug_for
+        self.env.globals["user_card"] = self.user_card
         self.global_context = {
             "shared": shared,
             "context": context,
         }
+        # rendered user cards, enabled once users records won't change
+        self.user_cards: LRUCache | None = None
+        # compile all templates upfront so rendering threads only read from env
+        for template_name in self.env.list_templates():
+            self.env.get_template(template_name)
+
+    def enable_user_cards_cache(
+        self, max_size: int = USER_CARDS_CACHE_SIZE
+    ) -> LRUCache:
+        """cache rendered user cards. Only once all users are recorded"""
+        self.user_cards = LRUCache("User cards", max_size)
+        return self.user_cards
+
+    @pass_context
+    def user_card(self, ctx: TemplateContext, user_id, action_time: str) -> str:
+        """user_card.html for user_id, with action time (`asked …`)
+
+        A card only depends on the user and page depth (to_root) once rendered with
+        a placeholder for action time: it is cached and the placeholder replaced"""
+        key = (user_key(user_id), ctx.get("to_root"))
+        card = self.user_cards.get(key) if self.user_cards is not None else MISSING
+        if card is MISSING:
+            card = self.env.get_template("user_card.html").render(
+                user=get_user_details(user_id, ctx.get("prefetched_users")),
+                action_time=ACTION_TIME_PLACEHOLDER,
+                action_from_now=False,
+                to_root=ctx.get("to_root"),
+            )
+            if self.user_cards is not None:
+                self.user_cards.set(key, card)
+        return card.replace(ACTION_TIME_PLACEHOLDER, action_time)
 
     def get_question(self, post: dict):
         """Single question HTML for ZIM"""
+        # fetch all users and linked questions of the page at once
+        links = [item for items in post.get("links", {}).values() for item in items]
+        states = shared.postsdatabase.get_questions_states(item["Id"] for item in links)
+        for item in links:
+            item.update(states[item["Id"]])
         return self.env.get_template("question.html").render(
+            prefetched_users=shared.usersdatabase.get_users_full(
+                get_post_users_ids(post)
+            ),
             body_class="question-page",
             whereis="questions",
             post=post,
@@ -136,6 +225,43 @@ class Renderer:
             **self.global_context,
         )
 
+    def get_question_list_item(self, post: dict) -> str:
+        """question_list_item.html of a question, for any page depth
+
+        Rendered with a placeholder for to_root: see get_questions_list_items()"""
+        return self.env.get_template("question_list_item.html").render(
+            question=shared.postsdatabase.get_question_details(
+                post["Id"], score=post["Score"]
+            ),
+            to_root=TO_ROOT_PLACEHOLDER,
+            **self.global_context,
+        )
+
+    def get_questions_list_items(self, page, to_root: str) -> list[str]:
+        """question_list_item.html of (post_id, score) questions of a page
+
+        Uses list items pre-rendered during questions step, rendering only those
+        missing (and their owners lookups)"""
+        items = shared.postsdatabase.get_list_items(post_id for post_id, _ in page)
+        missing = [
+            question for question, item in zip(page, items, strict=True) if item is None
+        ]
+        if missing:
+            questions = extend_questions(missing)
+            template = self.env.get_template("question_list_item.html")
+            prefetched_users = prefetch_owners(questions)
+            rendered = iter(
+                template.render(
+                    question=question,
+                    prefetched_users=prefetched_users,
+                    to_root=TO_ROOT_PLACEHOLDER,
+                    **self.global_context,
+                )
+                for question in questions
+            )
+            items = [item if item is not None else next(rendered) for item in items]
+        return [item.replace(TO_ROOT_PLACEHOLDER, to_root) for item in items]
+
     def get_all_questions_for_page(self, page):
         """All tags listing HTML for ZIM"""
         return self.env.get_template("questions.html").render(
@@ -145,7 +271,7 @@ class Renderer:
             popular_tags=shared.database.query_set(
                 shared.tagsdatabase.tags_key(), num=10, scored=False
             ),
-            questions=extend_questions(page),
+            questions_items=self.get_questions_list_items(page, to_root="./"),
             to_root="./",
             page_obj=page,
             **self.global_context,
@@ -179,7 +305,7 @@ class Renderer:
             whereis="questions",
             to_root="../../",
             title=f"Highest Voted '{tag}' Questions",
-            questions=extend_questions(page),
+            questions_items=self.get_questions_list_items(page, to_root="../../"),
             page_obj=page,
             nb_questions=shared.tagsdatabase.get_numquestions_for_tag(tag),
             **self.global_context,
@@ -200,9 +326,11 @@ class Renderer:
     def get_users_for_page(self, page):
         """All users listing HTML for ZIM"""
 
-        def extend_users(users):
-            for user_id in users:
-                yield get_user_details(user_id=user_id)
+        def extend_users(users_ids):
+            users_ids = list(users_ids)
+            users = shared.usersdatabase.get_users_full(users_ids)
+            for user_id in users_ids:
+                yield get_user_details(user_id=user_id, users=users)
 
         return self.env.get_template("users.html").render(
             body_class="users-page",
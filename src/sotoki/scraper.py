@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
+import contextlib
 import datetime
 import logging
 import pathlib
 import re
 import shutil
+import signal
 import tempfile
+import threading
 from urllib.parse import urlparse
 
 import bs4
@@ -21,7 +24,6 @@ from sotoki.archives import ArchiveManager
 from sotoki.constants import (
     HTTP_REQUEST_TIMEOUT,
     NAME,
-    NB_PAGINATED_QUESTIONS_PER_TAG,
     NB_QUESTIONS_PAGES,
     NB_QUESTIONS_PER_PAGE,
     NB_USERS_PAGES,
@@ -40,18 +42,22 @@ from sotoki.tags import (
     TagGenerator,
 )
 from sotoki.users import UserGenerator
+from sotoki.utils.checkpoint import Checkpoints
 from sotoki.utils.database.posts import PostsDatabase
 from sotoki.utils.database.redisdb import RedisDatabase
+from sotoki.utils.database.sqlitedb import SQLiteDatabase
 from sotoki.utils.database.tags import TagsDatabase
 from sotoki.utils.database.users import UsersDatabase
 from sotoki.utils.exceptions import DatabaseError
 from sotoki.utils.executor import SotokiExecutor
+from sotoki.utils.gcpolicy import GCPolicy
 from sotoki.utils.html import Rewriter
 from sotoki.utils.imager import Imager
-from sotoki.utils.misc import web_backoff
+from sotoki.utils.misc import is_gil_enabled, web_backoff
 from sotoki.utils.progress import Progresser
 from sotoki.utils.s3 import setup_s3_and_check_credentials
 from sotoki.utils.shared import context, logger, shared
+from sotoki.utils.watchdog import MemoryWatchdog, format_size
 
 
 class StackExchangeToZim:
@@ -78,12 +84,18 @@ class StackExchangeToZim:
         context.tmp_dir.mkdir(parents=True, exist_ok=True)
         if context.build_dir_is_tmp_dir:
             shared.build_dir = context.tmp_dir
+        elif context.resume:
+            # same folder for all runs so that next one can resume from it
+            shared.build_dir = context.tmp_dir / f"{shared.online_domain}_resumable"
+            shared.build_dir.mkdir(exist_ok=True)
         else:
             shared.build_dir = pathlib.Path(
                 tempfile.mkdtemp(prefix=f"{shared.online_domain}_", dir=context.tmp_dir)
             )
         if context.stats_filename:
             context.stats_filename.parent.mkdir(parents=True, exist_ok=True)
+        self.checkpoints = Checkpoints(shared.build_dir / "checkpoint.json")
+        self.completed = False
 
     @web_backoff(base=10, max_tries=10)
     def _get_site_details(self):
@@ -192,7 +204,8 @@ class StackExchangeToZim:
 
     def cleanup(self):
         """Remove temp files and release resources before exiting"""
-        if not context.keep_build_dir:
+        # failed run's build folder is kept to resume from it
+        if not context.keep_build_dir and (self.completed or not context.resume):
             logger.debug(f"Removing {shared.build_dir}")
             shutil.rmtree(shared.build_dir, ignore_errors=True)
 
@@ -252,19 +265,25 @@ class StackExchangeToZim:
 
     def run(self):
 
-        redis_url = urlparse(context.redis_url)
-        if redis_url and redis_url.scheme not in ("unix", "redis"):
-            raise ValueError(
-                f"Unknown scheme `{redis_url.scheme}` for redis. "
-                "Use redis:// or unix://"
-            )
+        for url in context.redis_urls if context.db_backend == "redis" else []:
+            redis_url = urlparse(url)
+            if redis_url and redis_url.scheme not in ("unix", "redis"):
+                raise ValueError(
+                    f"Unknown scheme `{redis_url.scheme}` for redis. "
+                    "Use redis:// or unix://"
+                )
 
         # shell implies debug
         if context.open_shell:
             context.debug = True
 
+        shared.gc_policy = GCPolicy()
+        shared.gc_policy.install()
+
         try:
-            shared.database = RedisDatabase(initialize=True)
+            shared.database = {"redis": RedisDatabase, "sqlite": SQLiteDatabase}[
+                context.db_backend
+            ](initialize=True)
         except Exception as exc:
             raise DatabaseError(exc) from exc
 
@@ -281,19 +300,21 @@ class StackExchangeToZim:
         )
 
         # mostly transforms HTML and sends to zim.
-        # tests show no speed improv. beyond 3 workers.
+        # optionally adapts its number of workers to the load
         shared.executor = SotokiExecutor(
-            queue_size=10,
-            nb_workers=3,
+            queue_size=max(10, 2 * context.max_workers),
+            nb_workers=context.nb_threads,
+            max_workers=context.max_workers if context.adaptive_threads else None,
         )
 
         # images handled on a different queue.
         # mostly network I/O to retrieve and/or upload image.
         # if not in S3 bucket, resize/optimize webp image
+        # workers are long-running loops over hosts so their number is fixed
         # we should consider using coroutines instead of threads
         shared.img_executor = SotokiExecutor(
             queue_size=200,
-            nb_workers=10,
+            nb_workers=context.nb_img_threads,
             prefix="IMG-T-",
         )
 
@@ -320,6 +341,8 @@ class StackExchangeToZim:
             f"  lang: {self.iso_langs_1} ({self.iso_langs_3})\n"
             f"  build_dir: {shared.build_dir}\n"
             f"  output_dir: {context.output_dir}\n"
+            f"  threads: {context.nb_threads} "
+            f"(GIL {'enabled' if is_gil_enabled() else 'disabled'})\n"
             f"{s3_msg}"
         )
 
@@ -424,26 +447,53 @@ class StackExchangeToZim:
 
             raise RuntimeError("End of debug shell session")
 
+        # dumps are prepared: answers index is available
+        shared.postsdatabase.ack_answers_index()
+
+        # checkpoint fingerprint can be checked
+        if context.resume:
+            self.checkpoints.resume()
+
         shared.creator.start()
+        shared.progresser.reporters.append(shared.database.report)
+
+        # throttles executors on memory pressure
+        watchdog = MemoryWatchdog([shared.executor, shared.img_executor])
+        watchdog.start()
+
+        # on-demand database memory report: kill -USR1 <pid>
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.on_report_signal)
 
         try:
             self.add_illustrations()
             self.add_assets()
 
-            self.process_tags_metadata()
+            with self.step(shared.progresser.TAGS_METADATA_STEP):
+                self.process_tags_metadata()
+            if context.resume:
+                self.checkpoints.save(shared.progresser.TAGS_METADATA_STEP)
 
-            self.process_questions_metadata()
+            with self.step(shared.progresser.QUESTIONS_METADATA_STEP):
+                self.process_questions_metadata()
+            if context.resume:
+                self.checkpoints.save(shared.progresser.QUESTIONS_METADATA_STEP)
 
-            self.process_indiv_users_pages()
+            with self.step(shared.progresser.USERS_STEP):
+                self.process_indiv_users_pages()
 
-            self.process_questions()
+            with self.step(shared.progresser.QUESTIONS_STEP):
+                self.process_questions()
 
-            self.process_tags()
+            with self.step(shared.progresser.TAGS_STEP):
+                self.process_tags()
 
-            self.process_pages_lists()
+            with self.step(shared.progresser.LISTS_STEP):
+                self.process_pages_lists()
 
-            shared.imager.process_images()
-            shared.img_executor.join()
+            with self.step(shared.progresser.IMAGES_STEP):
+                shared.imager.process_images()
+                shared.img_executor.join()
 
             shared.executor.shutdown()
             shared.img_executor.shutdown()
@@ -473,9 +523,50 @@ class StackExchangeToZim:
                 f"Finished Zim {shared.creator.filename.name} "
                 f"in {shared.creator.filename.parent}"
             )
+            self.completed = True
         finally:
+            if hasattr(signal, "SIGUSR1"):
+                signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+            watchdog.stop()
+            shared.gc_policy.report()
+            shared.gc_policy.uninstall()
             shared.progresser.print()
 
+    @contextlib.contextmanager
+    def step(self, name: str):
+        """bulk processing step (see GCPolicy), reporting database memory after it"""
+        with shared.gc_policy.step(name):
+            yield
+        self.report_database_memory(name)
+
+    def report_database_memory(self, label: str):
+        """log and record (in JSON progress file) database memory per keys family"""
+        report = shared.database.memory_report()
+        if report is None:
+            return
+        families = ", ".join(
+            f"{family}={format_size(family_report['estimated_bytes'])}"
+            for family, family_report in report["families"].items()
+        )
+        fragmentation = ", ".join(
+            str(info.get("mem_fragmentation_ratio")) for info in report["memory"]
+        )
+        logger.info(
+            f"Database memory after {label}: {families} "
+            f"(fragmentation: {fragmentation})"
+        )
+        shared.progresser.add_report("database_memory", label, report)
+
+    def on_report_signal(self, *_):
+        """SIGUSR1 handler: report database memory from a thread, not to block"""
+        label = datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds")
+        threading.Thread(
+            target=self.report_database_memory,
+            args=(f"{shared.progresser.current_step} ({label})",),
+            name="memory-report",
+            daemon=True,
+        ).start()
+
     def process_tags_metadata(self):
         # First, walk through Tags and record tags details in DB
         # Then walk through excerpts and record those in DB
@@ -499,8 +590,9 @@ class StackExchangeToZim:
         # We walk through all Posts a first time to record question in DB
         # list of users that had interactions
         # list of PostId for all questions
-        # list of PostId for all questions of all tags (incr. update)
+        # top PostIds (by score) of each tag, kept in memory then recorded
         # Details for all questions: date, owner, title, excerpt, has_accepted
+        # (in a memory-mapped columnar store)
         logger.info("Recording questions metadata to Database")
         shared.progresser.start(
             shared.progresser.QUESTIONS_METADATA_STEP,
@@ -508,10 +600,9 @@ class StackExchangeToZim:
         )
         if not context.skip_questions_meta:
             PostFirstPasser().run()
+        shared.postsdatabase.ack_questions_store()
         shared.usersdatabase.ack_users_ids()
-        shared.tagsdatabase.clear_extra_tags_questions_list(
-            NB_PAGINATED_QUESTIONS_PER_TAG
-        )
+        shared.tagsdatabase.write_tags_questions()
         shared.database.purge()
 
     def process_indiv_users_pages(self):
@@ -528,6 +619,12 @@ class StackExchangeToZim:
             UserGenerator().run()
         logger.debug("Cleaning-up users list")
         shared.usersdatabase.cleanup_users()
+        # users and questions records won't change anymore
+        shared.progresser.reporters += [
+            shared.usersdatabase.enable_cache().report,
+            shared.postsdatabase.enable_cache().report,
+            shared.renderer.enable_user_cards_cache().report,
+        ]
         shared.database.purge()
         if context.redis_pid:
             shared.database.defrag_external()
@@ -540,7 +637,9 @@ class StackExchangeToZim:
             shared.progresser.QUESTIONS_STEP,
             nb_total=shared.total_questions,
         )
+        shared.postsdatabase.record_listed_questions()
         PostGenerator().run()
+        shared.postsdatabase.ack_list_items()
         shared.database.purge()
 
     def process_tags(self):
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import functools
 import json
 from abc import abstractmethod
 
@@ -29,6 +30,8 @@ class TagsWalker(Walker):
 
 class TagFinder(Generator):
 
+    batch_size = 1000
+
     @property
     def walker(self):
         return TagsWalker
@@ -41,12 +44,10 @@ class TagFinder(Generator):
         tag = item
         if tag["Count"] == "0":
             logger.debug(f"Tag {item['TagName']} is not used.")
-            self.release()
             return
 
         tag["Count"] = int(tag["Count"])
         shared.tagsdatabase.record_tag(tag)
-        self.release()
 
 
 class TagsExcerptWalker(Walker):
@@ -57,6 +58,9 @@ class TagsExcerptWalker(Walker):
 
 class TagExcerptDescriptionRecorder(Generator):
 
+    batch_size = 500
+    batch_max_size = 1_000_000
+
     @property
     def walker(self):
         return TagsExcerptWalker
@@ -82,7 +86,6 @@ class TagExcerptDescriptionRecorder(Generator):
             shared.tagsdatabase.record_tag_detail(
                 name=tag_name, field=self.field, content=item.get("Body")
             )
-        self.release()
 
 
 class TagExcerptRecorder(TagExcerptDescriptionRecorder):
@@ -112,64 +115,26 @@ class TagGenerator(Generator):
         return shared.build_dir / "Tags.xml"
 
     def run(self):
-        # create individual pages for all tags
+        shared.executor.start()
+
+        # create individual pages for all tags: a task per tag
         for tag_name in shared.tagsdatabase.tags_ids.inverse.keys():
-            paginator = SortedSetPaginator(
-                shared.tagsdatabase.tag_key(tag_name),
-                per_page=NB_QUESTIONS_PER_TAG_PAGE,
-                at_most=NB_PAGINATED_QUESTIONS_PER_TAG,
+            shared.executor.submit(
+                self.generate_tag_pages,
+                tag_name=tag_name,
+                raises=True,
+                callback=functools.partial(shared.progresser.update, incr=True),
             )
-            for page_number in paginator.page_range:
-                page = paginator.get_page(page_number)
-                with shared.lock:
-                    page_content = shared.renderer.get_tag_for_page(tag_name, page)
-                    shared.creator.add_item_for(
-                        path=(
-                            f"questions/tagged/{tag_name}"
-                            if page_number == 1
-                            else f"questions/tagged/{tag_name}_page={page_number}"
-                        ),
-                        content=page_content,
-                        mimetype="text/html",
-                        title=(
-                            f"Highest Voted '{tag_name}' Questions"
-                            if page_number == 1
-                            else None
-                        ),
-                        is_front=page_number == 1,
-                    )
-                    del page_content
-
-            with shared.lock:
-                shared.creator.add_redirect(
-                    path=f"questions/tagged/{tag_name}_page=1",
-                    target_path=f"questions/tagged/{tag_name}",
-                    is_front=False,
-                )
-            shared.progresser.update(incr=True)
 
         # create paginated pages for tags
-        paginator = SortedSetPaginator(shared.tagsdatabase.tags_key(), per_page=36)
-        for page_number in paginator.page_range:
-            page = paginator.get_page(page_number)
-            with shared.lock:
-                page_content = shared.renderer.get_all_tags_for_page(page)
-                # we don't index same-title page for all paginated pages
-                # instead we index the redirect to the first page
-                shared.creator.add_item_for(
-                    path="tags" if page_number == 1 else f"tags_page={page_number}",
-                    content=page_content,
-                    mimetype="text/html",
-                    title="Tags" if page_number == 1 else None,
-                    is_front=page_number == 1,
-                )
-                del page_content
-        with shared.lock:
-            shared.creator.add_redirect(
-                path="tags_page=1",
-                target_path="tags",
-                is_front=False,
-            )
+        self.submit_pages(
+            SortedSetPaginator(shared.tagsdatabase.tags_key(), per_page=36),
+            path="tags",
+            title="Tags",
+            render=shared.renderer.get_all_tags_for_page,
+        )
+
+        self.join_tasks()
 
         with shared.lock:
             shared.creator.add_item_for(
@@ -180,3 +145,20 @@ class TagGenerator(Generator):
                 mimetype="application/json",
                 is_front=False,
             )
+
+    def generate_tag_pages(self, tag_name: str):
+        """paginated pages of a tag's questions, rendered in a single task"""
+        paginator = SortedSetPaginator(
+            shared.tagsdatabase.tag_key(tag_name),
+            per_page=NB_QUESTIONS_PER_TAG_PAGE,
+            at_most=NB_PAGINATED_QUESTIONS_PER_TAG,
+        )
+        for page_number in paginator.page_range:
+            self.add_page(
+                paginator,
+                page_number,
+                path=f"questions/tagged/{tag_name}",
+                title=f"Highest Voted '{tag_name}' Questions",
+                render=functools.partial(shared.renderer.get_tag_for_page, tag_name),
+            )
+        self.add_first_page_redirect(f"questions/tagged/{tag_name}")
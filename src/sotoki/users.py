@@ -55,6 +55,9 @@ class UsersWalker(Walker):
 
 class UserGenerator(Generator):
 
+    batch_size = 100
+    batch_max_size = 1_000_000
+
     @property
     def walker(self):
         return UsersWalker
@@ -99,31 +102,17 @@ class UserGenerator(Generator):
                 is_front=True,
             )
         del user_page
-        self.release()
 
     def generate_users_page(self):
-        paginator = ListPaginator(
-            shared.usersdatabase.top_users,
-            per_page=NB_USERS_PER_PAGE,
-            at_most=NB_PAGINATED_USERS,
+        shared.executor.start()
+        self.submit_pages(
+            ListPaginator(
+                shared.usersdatabase.top_users,
+                per_page=NB_USERS_PER_PAGE,
+                at_most=NB_PAGINATED_USERS,
+            ),
+            path="users",
+            title="Users",
+            render=shared.renderer.get_users_for_page,
         )
-        for page_number in paginator.page_range:
-            page = paginator.get_page(page_number)
-            with shared.lock:
-                page_content = shared.renderer.get_users_for_page(page)
-                # we don't index same-title page for all paginated pages
-                # instead we index the redirect to the first page
-                shared.creator.add_item_for(
-                    path="users" if page_number == 1 else f"users_page={page_number}",
-                    content=page_content,
-                    mimetype="text/html",
-                    title="Users" if page_number == 1 else None,
-                    is_front=page_number == 1,
-                )
-                del page_content
-        with shared.lock:
-            shared.creator.add_redirect(
-                path="users_page=1",
-                target_path="users",
-                is_front=False,
-            )
+        self.join_tasks()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+# returned by get() for keys not in cache (as None is a valid cached value)
+MISSING = object()
+
+
+class LRUCache:
+    """Bounded, thread-safe, Least-Recently-Used mapping with usage counters
+
+    Only suitable for immutable data: values are shared by all callers"""
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self.data: OrderedDict[Hashable, Any] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """cached value for key, marking it most recently used"""
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """cache value for key, evicting least recently used ones if full"""
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        """one-line usage summary"""
+        return (
+            f"{self.name} cache: {self.hits:,} hits ({self.hit_ratio:.0%}), "
+            f"{self.misses:,} misses, {self.evictions:,} evictions, "
+            f"{len(self):,}/{self.max_size:,} entries"
+        )
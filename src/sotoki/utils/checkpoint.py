@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import json
+import pathlib
+import shutil
+import uuid
+from typing import Any
+
+from sotoki.constants import UTF8, VERSION
+from sotoki.utils.exceptions import DatabaseError
+from sotoki.utils.progress import Progresser
+from sotoki.utils.shared import context, logger, shared
+
+
+class Checkpoints:
+    """Completed steps of a scrape, recorded in build dir to resume a later run
+
+    Only steps filling the database can be resumed: others write to the ZIM
+    which can't be appended to by another run. After each of those, the database
+    is committed and a state file records the step along with a fingerprint of
+    inputs and a token also written to the database. Database is not snapshotted:
+    its content must persist between runs by itself (SQLite file in build dir,
+    Redis with RDB or AOF persistence), which resuming checks first.
+
+    On resume, completed steps are skipped (as with --dev-skip-* flags) provided
+    the fingerprint matches and the database still holds the same token.
+    Otherwise, the scrape starts over with a cleared database and without the
+    build dir files written by those steps.
+
+    Writes of a step are idempotent so an interrupted one can be run again over
+    its partial writes. Images download queue is not checkpointed: it is filled
+    by users and questions steps, which are always run again, and flushed as they
+    start."""
+
+    # steps that can be skipped, mapped to the context flag skipping them
+    resumable_steps: dict[str, str] = {  # noqa: RUF012
+        Progresser.TAGS_METADATA_STEP: "skip_tags_meta",
+        Progresser.QUESTIONS_METADATA_STEP: "skip_questions_meta",
+    }
+    # options changing what resumable steps write
+    options = (
+        "without_unanswered",
+        "without_images",
+        "without_user_profiles",
+        "without_external_links",
+        "without_users_links",
+        "without_names",
+        "censor_words_list",
+    )
+    # build dir files and folders written by resumable steps
+    artifacts = (
+        "tags_ids.json",
+        "tags_details_ids.json",
+        "all_users_ids.bin",
+        "questions",
+    )
+    database_key = "checkpoint"
+
+    def __init__(self, fpath: pathlib.Path):
+        self.fpath = fpath
+        self.steps: list[str] = []
+
+    @classmethod
+    def fingerprint(cls) -> dict[str, Any]:
+        """what completed steps depend on: scraper, options and dumps files"""
+        return {
+            "version": VERSION,
+            "domain": context.domain,
+            "db_backend": context.db_backend,
+            "options": {name: getattr(context, name) for name in cls.options},
+            "dumps": {
+                fpath.name: fpath.stat().st_size
+                for fpath in sorted(shared.build_dir.glob("*.xml"))
+            },
+        }
+
+    def save(self, step: str):
+        """record step as completed once its writes are committed to database"""
+        if step not in self.resumable_steps or step in self.steps:
+            return
+        token = uuid.uuid4().hex
+        shared.database.pipe.set(self.database_key, token)
+        shared.database.commit()
+        self.steps.append(step)
+        state = {"fingerprint": self.fingerprint(), "token": token, "steps": self.steps}
+        tmp_fpath = self.fpath.with_suffix(".tmp")
+        with open(tmp_fpath, "w") as fh:
+            json.dump(state, fh, indent=4)
+        tmp_fpath.replace(self.fpath)
+        logger.debug(f"Checkpoint saved after {step} step")
+
+    def load(self) -> list[str]:
+        """completed steps of previous run, if consistent with current one"""
+        if not self.fpath.exists():
+            logger.info("No checkpoint to resume from")
+            return []
+        try:
+            with open(self.fpath) as fh:
+                state = json.load(fh)
+        except Exception as exc:
+            logger.warning(f"Unable to read checkpoint {self.fpath.name}: {exc}")
+            return []
+
+        if state.get("fingerprint") != self.fingerprint():
+            logger.warning(
+                "Checkpoint is for another scraper version, options or dumps"
+            )
+            return []
+
+        token = shared.database.safe_get(self.database_key)
+        if token is None or token.decode(UTF8) != state.get("token"):
+            logger.warning("Database content doesn't match checkpoint")
+            return []
+
+        return [step for step in state.get("steps", []) if step in self.resumable_steps]
+
+    def clear(self):
+        """remove database content and build dir files of resumable steps"""
+        shared.database.clear()
+        for name in self.artifacts:
+            path = shared.build_dir / name
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+
+    def resume(self):
+        """skip steps completed by previous run ; start over if none"""
+        if not shared.database.is_persistent():
+            raise DatabaseError(
+                "--resume requires a database persisting its content across "
+                "restarts: enable RDB (save) or AOF (appendonly) on Redis"
+            )
+        self.steps = self.load()
+        if not self.steps:
+            logger.info("Starting over with a cleared database")
+            self.clear()
+            return
+        logger.info(f"Resuming after completed steps: {', '.join(self.steps)}")
+        for step in self.steps:
+            setattr(context, self.resumable_steps[step], True)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from sotoki.utils.database.writer import BackgroundWriter
+
+
+class Database(ABC):
+    """Storage backend used by Tags, Posts, Users and Files databases
+
+    API is the subset of Redis commands we use:
+    - writes are queued on `pipe` (set, setnx, zadd) and executed in background
+      by a writer thread, coalesced into pipelines ; commit() waits for them
+    - reads and list operations are immediate, through safe_command()
+    - sorted sets are queried with query_set() and get_set_count()
+    - per-id records (questions, users) are packed into hashes of consecutive ids
+      with set_record() and get_record() ; get_records() and get_scores() read
+      many at once"""
+
+    # number of consecutive ids sharing a record hash (bucket)
+    records_bucket_size = 100
+    # protects thread-specific registries (connections) that get iterated
+    registry_lock = threading.Lock()
+
+    def __init__(self, *, initialize: bool = False):
+        self.connections: dict[int, Any] = {}
+
+        if initialize:
+            self.initialize()
+
+        self.writer = BackgroundWriter(self)
+
+    @property
+    @abstractmethod
+    def conn(self) -> Any:
+        """thread-specific connection"""
+
+    @property
+    def pipe(self) -> BackgroundWriter:
+        """writes queue, shared by all threads, executed in background pipelines"""
+        return self.writer
+
+    @abstractmethod
+    def execute_writes(self, commands: list[tuple[str, tuple, dict]]):
+        """execute (command, args, kwargs) write commands in a single pipeline
+
+        Called by the writer thread only"""
+
+    @abstractmethod
+    def initialize(self):
+        """prepare database for use, cleaning up previous content if any"""
+
+    def safe_get(self, key: str):
+        """GET command retried on ConnectionError"""
+        return self.safe_command("get", key)
+
+    def safe_zcard(self, key: str):
+        """ZCARD command retried on ConnectionError"""
+        return self.safe_command("zcard", key)
+
+    def safe_zscore(self, key: str, member: str | int):
+        """ZSCORE command retried on ConnectionError"""
+        return self.safe_command("zscore", key, member)
+
+    def record_key(self, family: str, record_id: int | str) -> tuple[str, int]:
+        """hash name and field for a record: {family}:{id // N} and id % N"""
+        bucket, field = divmod(int(record_id), self.records_bucket_size)
+        return f"{family}:{bucket}", field
+
+    def set_record(
+        self, family: str, record_id: int | str, value: bytes, *, nx: bool = False
+    ):
+        """queue (HSET or HSETNX) a record for writing"""
+        name, field = self.record_key(family, record_id)
+        if nx:
+            self.pipe.hsetnx(name, field, value)
+        else:
+            self.pipe.hset(name, field, value)
+
+    def get_record(self, family: str, record_id: int | str) -> bytes | None:
+        """recorded value for a record_id ; None if missing or not a valid id"""
+        try:
+            name, field = self.record_key(family, record_id)
+        except (TypeError, ValueError):
+            return None
+        return self.safe_command("hget", name, field)
+
+    def get_records(
+        self, records: Iterable[tuple[str, int | str]]
+    ) -> list[bytes | None]:
+        """recorded values for (family, record_id) pairs, in order"""
+        return [self.get_record(family, record_id) for family, record_id in records]
+
+    def get_scores(self, set_name: str, members: Iterable) -> list[float | None]:
+        """scores of members in named sorted set, in order"""
+        return [self.safe_zscore(set_name, member) for member in members]
+
+    @abstractmethod
+    def safe_command(self, command: str, *args, retries: int = 20):
+        """RO command retried on ConnectionError"""
+
+    def commit(self):
+        """execute all writes queued so far (by any thread), waiting for them
+
+        Meant to be called at barriers, before reading what was written"""
+        self.writer.flush()
+
+    def purge(self):
+        """reclaim space freed by deleted entries, if applicable"""
+
+    def defrag_external(self):
+        """defragment database using external means, if applicable"""
+
+    def is_persistent(self) -> bool:
+        """whether content survives a restart of the database server"""
+        return True
+
+    @abstractmethod
+    def dump(self):
+        """persist database on disk (in tmp_dir)"""
+
+    @abstractmethod
+    def teardown(self):
+        """commit remaining data, stop writer and release connections"""
+
+    @abstractmethod
+    def remove(self):
+        """flush database"""
+
+    @abstractmethod
+    def clear(self):
+        """remove all content, regardless of --keep-redis"""
+
+    def report(self) -> str:
+        """one-line connections and writer usage summary"""
+        return f"Database: {len(self.connections)} connections, {self.writer.report()}"
+
+    def memory_usage(self) -> int | None:
+        """memory used by the database server, if not part of scraper's process"""
+        return None
+
+    def memory_report(self) -> dict[str, Any] | None:
+        """memory usage per keys family, if applicable"""
+        return None
+
+    def get_set_count(self, set_name: str) -> int:
+        """Number of recorded entries in set"""
+        return self.safe_zcard(set_name)
+
+    @abstractmethod
+    def query_set(
+        self,
+        set_name: str,
+        start: int = 0,
+        num: int | None = None,
+        *,
+        desc: bool = True,
+        scored: bool = True,
+    ) -> Iterator[tuple[object, int] | object]:
+        """Query entries in named sorted set"""
+
+    def query_sets(self, set_names: Iterable[str], num: int) -> Iterator[list[str]]:
+        """top num members (without scores) of each named sorted set, in order"""
+        for set_name in set_names:
+            yield [
+                str(member)
+                for member in self.query_set(set_name, num=num, scored=False)
+            ]
+
+    def request_commit(self):
+        """request writer to execute queued writes now, without waiting"""
+        self.writer.flush(wait=False)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import struct
+from abc import ABC, abstractmethod
+from typing import Any
+
+from sotoki.constants import UTF8
+
+VERSION = struct.Struct("<B")
+LENGTH = struct.Struct("<H")
+
+
+def pack_string(value: str) -> bytes:
+    """UTF-8 encoded string prefixed with its (uint16) length"""
+    data = value.encode(UTF8)
+    return LENGTH.pack(len(data)) + data
+
+
+def unpack_string(data: memoryview, offset: int) -> tuple[str, int]:
+    """string packed with pack_string() at offset and offset following it"""
+    (length,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    return str(data[offset : offset + length], UTF8), offset + length
+
+
+class RecordCodec(ABC):
+    """Versioned binary layout for a family of records (tuples)
+
+    Records are small tuples with a known layout: packing them with struct is
+    both smaller and faster to encode/decode than JSON (compressed or not).
+    Encoded records start with the layout version so it can evolve."""
+
+    version: int = 1
+
+    def encode(self, record: tuple) -> bytes:
+        return VERSION.pack(self.version) + self.pack(*record)
+
+    def decode(self, data: bytes) -> tuple:
+        (version,) = VERSION.unpack_from(data)
+        if version != self.version:
+            raise ValueError(f"Unsupported {type(self).__name__} version: {version}")
+        return self.unpack(memoryview(data)[VERSION.size :])
+
+    @abstractmethod
+    def pack(self, *values: Any) -> bytes:
+        """values as bytes (without version)"""
+
+    @abstractmethod
+    def unpack(self, data: memoryview) -> tuple:
+        """values from bytes (without version)"""
+
+
+class UserCodec(RecordCodec):
+    """name, reputation, nb_gold, nb_silver, nb_bronze ; name fills the end"""
+
+    fixed = struct.Struct("<iIII")
+
+    def pack(
+        self, name: str, reputation: int, nb_gold: int, nb_silver: int, nb_bronze: int
+    ) -> bytes:
+        return self.fixed.pack(reputation, nb_gold, nb_silver, nb_bronze) + (
+            name.encode(UTF8)
+        )
+
+    def unpack(self, data: memoryview) -> tuple:
+        reputation, nb_gold, nb_silver, nb_bronze = self.fixed.unpack_from(data)
+        name = str(data[self.fixed.size :], UTF8)
+        return name, reputation, nb_gold, nb_silver, nb_bronze
+
+
+class FileCodec(RecordCodec):
+    """url, zim_path, download_attempts ; url fills the end of the record"""
+
+    fixed = struct.Struct("<H")
+
+    def pack(self, url: str, zim_path: str, download_attempts: int) -> bytes:
+        return (
+            self.fixed.pack(download_attempts)
+            + pack_string(zim_path)
+            + url.encode(UTF8)
+        )
+
+    def unpack(self, data: memoryview) -> tuple:
+        (download_attempts,) = self.fixed.unpack_from(data)
+        zim_path, offset = unpack_string(data, self.fixed.size)
+        return str(data[offset:], UTF8), zim_path, download_attempts
+
+
+class QuestionsStatsCodec(RecordCodec):
+    """nb_answers, nb_answered, nb_accepted, most_recent_ts"""
+
+    fixed = struct.Struct("<QQQq")
+
+    def pack(self, *values: int) -> bytes:
+        return self.fixed.pack(*values)
+
+    def unpack(self, data: memoryview) -> tuple:
+        return self.fixed.unpack_from(data)
+
+
+user_codec = UserCodec()
+file_codec = FileCodec()
+questions_stats_codec = QuestionsStatsCodec()
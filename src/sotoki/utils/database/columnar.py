@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+
+import array
+import mmap
+import pathlib
+import threading
+
+from sotoki.constants import UTF8
+from sotoki.utils.database.codec import pack_string, unpack_string
+
+# flags column bits
+HAS_ACCEPTED = 1
+OWNER_IS_ID = 2
+OWNER_IS_NAME = 4
+
+# columns file name (in store directory) and array typecode
+# rows are in recording order ; index maps question id to row + 1 (0 if missing)
+COLUMNS = {
+    "ids": "I",
+    "created": "I",
+    "answers": "I",
+    "owners": "i",
+    "flags": "B",
+    # CSR: tags of row r are tags[tags_indptr[r]:tags_indptr[r + 1]]
+    "tags_indptr": "Q",
+    "tags": "I",
+    # CSR: details of row r are details.bin[details_indptr[r]:details_indptr[r + 1]]
+    "details_indptr": "Q",
+    "index": "I",
+}
+DETAILS = "details.bin"
+# answers index (see AnswersIndex) file name, in build dir
+ANSWERS_INDEX = "answers_questions.idx"
+# pre-rendered list items (see ListItemsStore) folder name, in build dir
+LIST_ITEMS = "list_items"
+
+
+class QuestionsStoreWriter:
+    """Appends questions to the columns of a QuestionsStore (built with finalize())
+
+    Rows are buffered in arrays and appended to column files every buffer_rows.
+    Thread-safe: a row is appended to all columns at once."""
+
+    buffer_rows = 2**16
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.nb_rows = 0
+        self.nb_tags = 0
+        self.details_size = 0
+        self.max_id = -1
+        self.started = False
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.columns = {
+            name: array.array(typecode)
+            for name, typecode in COLUMNS.items()
+            if name != "index"
+        }
+        self.details = bytearray()
+
+    def add(
+        self,
+        post_id: int,
+        creation_ts: int,
+        owner: int | str | None,
+        has_accepted: bool,  # noqa: FBT001
+        nb_answers: int,
+        tags_ids: list[int],
+        title: str,
+        excerpt: str,
+    ):
+        flags = HAS_ACCEPTED if has_accepted else 0
+        if isinstance(owner, int):
+            flags |= OWNER_IS_ID
+        elif isinstance(owner, str):
+            flags |= OWNER_IS_NAME
+        details = (
+            pack_string(title)
+            + pack_string(owner if isinstance(owner, str) else "")
+            + excerpt.encode(UTF8)
+        )
+        with self.lock:
+            if not self.nb_rows:
+                # CSR columns start with offset of first row
+                self.columns["tags_indptr"].append(0)
+                self.columns["details_indptr"].append(0)
+            self.nb_rows += 1
+            self.nb_tags += len(tags_ids)
+            self.details_size += len(details)
+            self.max_id = max(self.max_id, post_id)
+            self.columns["ids"].append(post_id)
+            self.columns["created"].append(creation_ts)
+            self.columns["answers"].append(nb_answers)
+            self.columns["owners"].append(owner if isinstance(owner, int) else 0)
+            self.columns["flags"].append(flags)
+            self.columns["tags"].extend(tags_ids)
+            self.columns["tags_indptr"].append(self.nb_tags)
+            self.details += details
+            self.columns["details_indptr"].append(self.details_size)
+            if len(self.columns["ids"]) >= self.buffer_rows:
+                self._flush()
+
+    def _flush(self):
+        mode = "ab" if self.started else "wb"
+        if not self.started:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.started = True
+        for name, column in self.columns.items():
+            with open(self.path / name, mode) as fh:
+                column.tofile(fh)
+        with open(self.path / DETAILS, mode) as fh:
+            fh.write(self.details)
+        self._reset_buffers()
+
+    def finalize(self) -> QuestionsStore:
+        """write remaining rows and id index, returning the opened store
+
+        Index is filled through a mapping of its file so it is not held in memory"""
+        with self.lock:
+            self._flush()
+            index_fpath = self.path / "index"
+            itemsize = array.array(COLUMNS["index"]).itemsize
+            with open(index_fpath, "wb") as fh:
+                fh.truncate(itemsize * (self.max_id + 1))
+            if self.nb_rows:
+                with (
+                    open(self.path / "ids", "rb") as ids_fh,
+                    open(index_fpath, "r+b") as index_fh,
+                    mmap.mmap(ids_fh.fileno(), 0, access=mmap.ACCESS_READ) as ids_map,
+                    mmap.mmap(index_fh.fileno(), 0) as index_map,
+                ):
+                    ids = memoryview(ids_map).cast(COLUMNS["ids"])
+                    index = memoryview(index_map).cast(COLUMNS["index"])
+                    for row, post_id in enumerate(ids, start=1):
+                        # first recorded row wins, like records set with nx
+                        if not index[post_id]:
+                            index[post_id] = row
+                    ids.release()
+                    index.release()
+        return QuestionsStore(self.path)
+
+
+class QuestionsStore:
+    """Read-only, memory-mapped, columnar store of questions metadata and details
+
+    Built once all questions are recorded (see QuestionsStoreWriter) it replaces
+    per-question database records: reads are local (no round-trip), lock-free and
+    served from the OS page cache, shared by all threads (and processes).
+
+    Metadata are fixed-size columns indexed by row, tags ids are CSR-encoded and
+    title, owner name and excerpt are in an offset-indexed blob (details.bin)"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.mmaps: list[mmap.mmap] = []
+        self.columns = {
+            name: self._map(path / name).cast(typecode)
+            for name, typecode in COLUMNS.items()
+        }
+        self.details = self._map(path / DETAILS)
+
+    @staticmethod
+    def exists(path: pathlib.Path) -> bool:
+        return (path / "index").exists()
+
+    def _map(self, fpath: pathlib.Path) -> memoryview:
+        with open(fpath, "rb") as fh:
+            if not fpath.stat().st_size:
+                return memoryview(b"")
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mmaps.append(mapped)
+        return memoryview(mapped)
+
+    def __len__(self) -> int:
+        return len(self.columns["ids"])
+
+    def __contains__(self, post_id: object) -> bool:
+        return self._row(post_id) is not None
+
+    def _row(self, post_id) -> int | None:
+        try:
+            post_id = int(post_id)
+        except (TypeError, ValueError):
+            return None
+        index = self.columns["index"]
+        if post_id < 0 or post_id >= len(index):
+            return None
+        row = index[post_id]
+        return row - 1 if row else None
+
+    def _details(self, row: int) -> tuple[str, str, str]:
+        """title, owner name and excerpt of row"""
+        indptr = self.columns["details_indptr"]
+        data = self.details[indptr[row] : indptr[row + 1]]
+        title, offset = unpack_string(data, 0)
+        owner_name, offset = unpack_string(data, offset)
+        return title, owner_name, str(data[offset:], UTF8)
+
+    def get_title_desc(self, post_id) -> tuple[str, str] | None:
+        """title and excerpt of a question ; None if not recorded"""
+        row = self._row(post_id)
+        if row is None:
+            return None
+        title, _, excerpt = self._details(row)
+        return title, excerpt
+
+    def get_question(self, post_id) -> tuple | None:
+        """creation_ts, owner, has_accepted, nb_answers, tags_ids of a question
+
+        Owner is a user id, a (deleted user) name or None ; None if not recorded"""
+        row = self._row(post_id)
+        if row is None:
+            return None
+        flags = self.columns["flags"][row]
+        if flags & OWNER_IS_ID:
+            owner = self.columns["owners"][row]
+        elif flags & OWNER_IS_NAME:
+            owner = self._details(row)[1]
+        else:
+            owner = None
+        indptr = self.columns["tags_indptr"]
+        return (
+            self.columns["created"][row],
+            owner,
+            bool(flags & HAS_ACCEPTED),
+            self.columns["answers"][row],
+            self.columns["tags"][indptr[row] : indptr[row + 1]].tolist(),
+        )
+
+    def has_accepted(self, post_id) -> bool:
+        row = self._row(post_id)
+        return row is not None and bool(self.columns["flags"][row] & HAS_ACCEPTED)
+
+    def size(self) -> int:
+        """bytes used on disk"""
+        return sum(fpath.stat().st_size for fpath in self.path.iterdir())
+
+    def close(self):
+        for view in (*self.columns.values(), self.details):
+            view.release()
+        for mapped in self.mmaps:
+            mapped.close()
+        self.mmaps.clear()
+
+
+class AnswersIndexWriter:
+    """Records question id of answers, written as an AnswersIndex with finalize()
+
+    Pairs are appended to a temporary file as max answer id is only known at the
+    end. Index is then filled through a mapping of its file.
+    Not thread-safe: answers are recorded while merging dumps."""
+
+    # (answer id, question id) pairs buffered before being written to pairs file
+    buffer_pairs = 2**16
+
+    def __init__(self, fpath: pathlib.Path):
+        self.fpath = fpath
+        self.pairs_fpath = fpath.with_suffix(".pairs")
+        self.pairs_fh = open(self.pairs_fpath, "wb")
+        self.buffer = array.array(AnswersIndex.typecode)
+        self.nb_answers = 0
+        self.max_id = -1
+
+    def add(self, answer_id: int, question_id: int):
+        self.buffer.extend((answer_id, question_id))
+        self.nb_answers += 1
+        self.max_id = max(self.max_id, answer_id)
+        if len(self.buffer) >= 2 * self.buffer_pairs:
+            self.buffer.tofile(self.pairs_fh)
+            del self.buffer[:]
+
+    def finalize(self) -> AnswersIndex:
+        """write index, removing pairs file, returning the opened index"""
+        self.buffer.tofile(self.pairs_fh)
+        self.pairs_fh.close()
+        with open(self.fpath, "wb") as fh:
+            fh.truncate(self.buffer.itemsize * (self.max_id + 1))
+        if self.nb_answers:
+            with (
+                open(self.pairs_fpath, "rb") as pairs_fh,
+                open(self.fpath, "r+b") as index_fh,
+                mmap.mmap(pairs_fh.fileno(), 0, access=mmap.ACCESS_READ) as pairs_map,
+                mmap.mmap(index_fh.fileno(), 0) as index_map,
+            ):
+                pairs = memoryview(pairs_map).cast(AnswersIndex.typecode)
+                index = memoryview(index_map).cast(AnswersIndex.typecode)
+                for position in range(0, len(pairs), 2):
+                    index[pairs[position]] = pairs[position + 1]
+                pairs.release()
+                index.release()
+        self.pairs_fpath.unlink()
+        return AnswersIndex(self.fpath)
+
+
+class AnswersIndex:
+    """Read-only, memory-mapped, question id of answers
+
+    A uint32 array indexed by answer id (0 for ids that are not answers): 4B per
+    post id, lookups are O(1) and served from the OS page cache.
+    Written during dumps preparation (see AnswersIndexWriter)"""
+
+    typecode = "I"
+
+    def __init__(self, fpath: pathlib.Path):
+        self.fpath = fpath
+        self.mmap: mmap.mmap | None = None
+        with open(fpath, "rb") as fh:
+            if fpath.stat().st_size:
+                self.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = (
+            memoryview(self.mmap).cast(self.typecode)
+            if self.mmap
+            else memoryview(array.array(self.typecode))
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, answer_id) -> int | None:
+        """question id of an answer ; None if not an answer id"""
+        try:
+            answer_id = int(answer_id)
+        except (TypeError, ValueError):
+            return None
+        if answer_id < 0 or answer_id >= len(self.index):
+            return None
+        return self.index[answer_id] or None
+
+    def close(self):
+        self.index.release()
+        if self.mmap:
+            self.mmap.close()
+
+
+class ListItemsStoreWriter:
+    """Appends blobs (list items) of ids to a ListItemsStore (built with finalize())
+
+    Blobs are appended to a file as they come while their ids and offsets, a few
+    bytes per row, are kept in arrays until finalize().
+    Thread-safe: list items are recorded by all questions step workers."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.blobs_fh = open(self.path / ListItemsStore.blobs, "wb")
+        self.ids = array.array(ListItemsStore.typecodes["ids"])
+        self.indptr = array.array(ListItemsStore.typecodes["indptr"], [0])
+        self.max_id = -1
+
+    def add(self, item_id: int, blob: bytes):
+        with self.lock:
+            self.blobs_fh.write(blob)
+            self.ids.append(item_id)
+            self.indptr.append(self.indptr[-1] + len(blob))
+            self.max_id = max(self.max_id, item_id)
+
+    def finalize(self) -> ListItemsStore:
+        """write offsets and id index, returning the opened store
+
+        Index is filled through a mapping of its file so it is not held in memory"""
+        with self.lock:
+            self.blobs_fh.close()
+            for name, column in (("ids", self.ids), ("indptr", self.indptr)):
+                with open(self.path / name, "wb") as fh:
+                    column.tofile(fh)
+            index_fpath = self.path / "index"
+            itemsize = array.array(ListItemsStore.typecodes["index"]).itemsize
+            with open(index_fpath, "wb") as fh:
+                fh.truncate(itemsize * (self.max_id + 1))
+            if self.ids:
+                with (
+                    open(index_fpath, "r+b") as index_fh,
+                    mmap.mmap(index_fh.fileno(), 0) as index_map,
+                ):
+                    index = memoryview(index_map).cast(
+                        ListItemsStore.typecodes["index"]
+                    )
+                    for row, item_id in enumerate(self.ids, start=1):
+                        index[item_id] = row
+                    index.release()
+            self.ids, self.indptr = array.array("I"), array.array("Q")
+        return ListItemsStore(self.path)
+
+
+class ListItemsStore:
+    """Read-only, memory-mapped, blobs (pre-rendered list items) by id
+
+    Blobs are concatenated in a file, offset-indexed by row (indptr) and an index
+    maps ids to row + 1 (0 if missing). Written during questions step
+    (see ListItemsStoreWriter), read by listings from the OS page cache."""
+
+    blobs = "blobs.bin"
+    typecodes = {"ids": "I", "indptr": "Q", "index": "I"}  # noqa: RUF012
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.mmaps: list[mmap.mmap] = []
+        self.indptr = self._map(path / "indptr").cast(self.typecodes["indptr"])
+        self.index = self._map(path / "index").cast(self.typecodes["index"])
+        self.data = self._map(path / self.blobs)
+
+    def _map(self, fpath: pathlib.Path) -> memoryview:
+        with open(fpath, "rb") as fh:
+            if not fpath.stat().st_size:
+                return memoryview(b"")
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mmaps.append(mapped)
+        return memoryview(mapped)
+
+    def __len__(self) -> int:
+        return max(len(self.indptr) - 1, 0)
+
+    def get(self, item_id) -> bytes | None:
+        """blob of an id ; None if not recorded"""
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return None
+        if item_id < 0 or item_id >= len(self.index) or not self.index[item_id]:
+            return None
+        row = self.index[item_id] - 1
+        return bytes(self.data[self.indptr[row] : self.indptr[row + 1]])
+
+    def close(self):
+        for view in (self.indptr, self.index, self.data):
+            view.release()
+        for mapped in self.mmaps:
+            mapped.close()
+        self.mmaps.clear()
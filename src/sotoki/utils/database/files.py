@@ -1,8 +1,6 @@
-import json
 from dataclasses import dataclass
 
-import snappy
-
+from sotoki.utils.database.codec import file_codec
 from sotoki.utils.shared import shared
 
 
@@ -26,17 +24,15 @@ class FileDatabase:
         file = shared.database.safe_command("rpop", self._list_name)
         if not file:
             return None
-        file = json.loads(snappy.decompress(file))
-        return File(url=file[0], zim_path=file[1], download_attempts=file[2])
+        url, zim_path, download_attempts = file_codec.decode(file)
+        return File(url=url, zim_path=zim_path, download_attempts=download_attempts)
 
     def push(self, file: File):
-        file_bytes = snappy.compress(
-            json.dumps(
-                (
-                    file.url,
-                    file.zim_path,
-                    file.download_attempts,
-                )
+        file_bytes = file_codec.encode(
+            (
+                file.url,
+                file.zim_path,
+                file.download_attempts,
             )
         )
 
@@ -1,12 +1,30 @@
 #!/usr/bin/env python
 
 import datetime
-import json
+from collections.abc import Iterable
 
 import snappy
 
+from sotoki.constants import (
+    NB_PAGINATED_QUESTIONS,
+    NB_PAGINATED_QUESTIONS_PER_TAG,
+    QUESTIONS_CACHE_SIZE,
+    UTF8,
+)
+from sotoki.utils.bitmap import IdsBitmap
+from sotoki.utils.cache import MISSING, LRUCache
+from sotoki.utils.database.codec import questions_stats_codec
+from sotoki.utils.database.columnar import (
+    ANSWERS_INDEX,
+    LIST_ITEMS,
+    AnswersIndex,
+    ListItemsStore,
+    ListItemsStoreWriter,
+    QuestionsStore,
+    QuestionsStoreWriter,
+)
 from sotoki.utils.html import get_text
-from sotoki.utils.shared import shared
+from sotoki.utils.shared import logger, shared
 
 
 class PostsDatabase:
@@ -22,25 +40,76 @@ class PostsDatabase:
 
     - A `T:{tag}` ordered set of PostId ordered by question Score for each Tag.
     We use this to build the list of questions inside individual Tag pages.
+    Only the paginated top is kept in memory and written at the end of the step
+    (see TagsDatabase.record_tag_question)
 
-    - A `Q:{id}` containing a JSON list of CreationDate, OwnerName and a bool of whether
-    this question has an accepted answer.
+    Questions metadata and details are not in the Database but in a columnar
+    QuestionsStore (see columnar module), written during first pass and memory-mapped
+    once complete (ack_questions_store):
+
+    - CreationDate, OwnerName, a bool of whether this question has an accepted
+    answer, number of answers and Tags IDs.
     We use those to expand post-info when building list of questions
 
-    - A `QD:{id}` containing a JSON list of Title, Excerpt for all questions. This alone
-    can take up to 9GB for StackOverflow.
+    - Title, Excerpt for all questions. This alone can take up to 9GB for
+    StackOverflow.
     We use this to display title and excerpt for posts in questions listing.
 
+    Question of each answer is in a memory-mapped AnswersIndex written during dumps
+    preparation, so that links to answers are rewritten to their question page.
+
+    Questions displayed in listings (home and tag pages) have their list item HTML
+    rendered while generating their page. It is stored snappy-compressed in a
+    memory-mapped ListItemsStore (`list_items/` in build dir) so listings only
+    concatenate those.
+
     Note: When using the --without-unanswered flag, nothing is recorded for questions
     with a zero count of answers."""
 
-    @staticmethod
-    def question_key(post_id):
-        return f"Q:{post_id}"
-
-    @staticmethod
-    def question_details_key(post_id):
-        return f"QD:{post_id}"
+    def __init__(self):
+        # questions title and excerpt cache, enabled once all questions are recorded
+        self.cache: LRUCache | None = None
+        # questions metadata and details, written during first pass then read-only
+        # (writer only creates its files on first flush)
+        self.store_writer: QuestionsStoreWriter | None = QuestionsStoreWriter(
+            self.store_path
+        )
+        self.store: QuestionsStore | None = None
+        # question id of answers, available once dumps are prepared
+        self.answers: AnswersIndex | None = None
+        # questions displayed in listings, collected before questions step
+        self.listed: IdsBitmap | None = None
+        # pre-rendered list items, written during questions step then read-only
+        self.list_items_writer: ListItemsStoreWriter | None = None
+        self.list_items: ListItemsStore | None = None
+
+    def enable_cache(self, max_size: int = QUESTIONS_CACHE_SIZE) -> LRUCache:
+        """cache questions title and excerpt. Only once questions are recorded"""
+        self.cache = LRUCache("Questions", max_size)
+        return self.cache
+
+    @property
+    def store_path(self):
+        return shared.build_dir / "questions"
+
+    @property
+    def list_items_path(self):
+        return shared.build_dir / LIST_ITEMS
+
+    @property
+    def answers_index_path(self):
+        return shared.build_dir / ANSWERS_INDEX
+
+    def ack_answers_index(self):
+        """open answers index written during dumps preparation"""
+        self.answers = AnswersIndex(self.answers_index_path)
+        logger.debug(f"Answers index covers {len(self.answers)} posts ids")
+
+    def get_answer_question_id(self, answer_id) -> int | None:
+        """question id of an answer ; None if not an answer in dumps"""
+        if self.answers is None:
+            return None
+        return self.answers.get(answer_id)
 
     @staticmethod
     def questions_key():
@@ -53,110 +122,102 @@ class PostsDatabase:
     def record_question(self, post: dict):
 
         # update set of users_ids (users with activity)
-        for user_id in post.get("users_ids") or []:
-            shared.usersdatabase._all_users_ids.add(user_id)
+        shared.usersdatabase.record_active_users(post.get("users_ids") or [])
 
         # add this postId to the ordered list of questions sorted by score
         shared.database.pipe.zadd(
             self.questions_key(), mapping={post["Id"]: post["Score"]}, nx=True
         )
 
-        # Add this question's PostId to the ordered questions sets of all its tags
+        # Add this question's PostId to the top questions of all its tags
         for tag in post.get("Tags", []):
-            shared.database.pipe.zadd(
-                shared.tagsdatabase.tag_key(tag),
-                mapping={post["Id"]: post["Score"]},
-                nx=True,
-            )
+            shared.tagsdatabase.record_tag_question(tag, post["Id"], post["Score"])
 
-        # store int for user Ids (most use) to save some space in redis
+        # store int for user Ids (most use)
         # names stored as str thus belong to deleted users. this prevents del users
         # with a name such as "3200" to be considered User#3200
         if post.get("OwnerUserId"):
             post["OwnerName"] = int(post["OwnerUserId"])
 
-        # store question details
-        shared.database.pipe.setnx(
-            self.question_key(post["Id"]),
-            snappy.compress(
-                json.dumps(
-                    (
-                        post["CreationTimestamp"],
-                        post["OwnerName"],
-                        post["has_accepted"],
-                        post["nb_answers"],
-                        # Tag ID can be None in the event a Tag existed and was not used
-                        # but got used first during the dumping process, after the Tags
-                        # were dumped but before questions we fully dumped.
-                        # SO Tag `imac` in 2021-06 dumps for instance
-                        [
-                            shared.tagsdatabase.get_tag_id(tag)
-                            for tag in post.get("Tags", [])
-                            if shared.tagsdatabase.get_tag_id(tag)
-                        ],
-                    )
-                )
-            ),
+        if self.store_writer is None:
+            raise OSError("Questions store is read-only once acknowledged")
+
+        # store question metadata and details (title, excerpt)
+        self.store_writer.add(
+            post["Id"],
+            post["CreationTimestamp"],
+            post["OwnerName"],
+            post["has_accepted"],
+            post["nb_answers"],
+            # Tag ID can be None in the event a Tag existed and was not used
+            # but got used first during the dumping process, after the Tags
+            # were dumped but before questions we fully dumped.
+            # SO Tag `imac` in 2021-06 dumps for instance
+            [
+                shared.tagsdatabase.get_tag_id(tag)
+                for tag in post.get("Tags", [])
+                if shared.tagsdatabase.get_tag_id(tag)
+            ],
+            post["Title"],
+            get_text(post["Body"], strip_at=250),
         )
 
-        # record question's meta: ID: title, excerpt for use in home and tag pages
-        shared.database.pipe.set(
-            self.question_details_key(post["Id"]),
-            snappy.compress(
-                json.dumps((post["Title"], get_text(post["Body"], strip_at=250)))
-            ),
+    def ack_questions_store(self):
+        """build questions store from recorded questions or open existing one
+
+        Existing store is used if no question was recorded (--skip-questions-meta)"""
+        if self.store_writer is None:
+            raise OSError("Questions store already acknowledged")
+        if self.store_writer.nb_rows or not QuestionsStore.exists(self.store_path):
+            self.store = self.store_writer.finalize()
+        else:
+            logger.debug(f"loading questions store from {self.store_path.name}")
+            self.store = QuestionsStore(self.store_path)
+        self.store_writer = None
+        logger.debug(
+            f"Questions store: {len(self.store):,} questions, "
+            f"{self.store.size() / 2**20:,.1f}MiB"
         )
 
-        shared.database.bump_seen(4 + len(post.get("Tags", [])))
-        shared.database.commit_maybe()
-
     def record_questions_stats(
         self, nb_answers: int, nb_answered: int, nb_accepted: int, most_recent_ts: int
     ):
         """store total number of answers through dump"""
         shared.database.pipe.set(
             self.questions_stats_key(),
-            json.dumps((nb_answers, nb_answered, nb_accepted, most_recent_ts)),
+            questions_stats_codec.encode(
+                (nb_answers, nb_answered, nb_accepted, most_recent_ts)
+            ),
         )
 
-        shared.database.bump_seen()
-        shared.database.commit_maybe()
-
-    def get_question_title_desc(self, post_id: int) -> dict:
-        """dict including title and excerpt fo a question by PostId"""
-        try:
-            data = json.loads(
-                snappy.decompress(
-                    shared.database.safe_get(self.question_details_key(post_id))
-                )
-            )
-        except Exception:
-            # we might not have a record for that post_id:
-            # - post_id can be erroneous (from a mistyped link)
-            # - post_id can reference an excluded question (no answer)
-            data = [None, None]
-        return {"title": data[0], "excerpt": data[1]}
-
-    def get_question_details(self, post_id, score: int | None = None):
-        """Detailed information for a question
+    @property
+    def questions(self) -> QuestionsStore:
+        if self.store is None:
+            raise OSError("Questions store is not available before first pass end")
+        return self.store
 
-        is, score, creation_date, owner_user_id, has_accepted"""
-        if score is None:
-            score = shared.database.safe_zscore(self.questions_key(), post_id)
-
-        item = self.get_question_title_desc(post_id) or {}
+    @staticmethod
+    def _title_desc_from(title_desc: tuple[str, str] | None) -> dict:
+        # we might not have a record for that post_id:
+        # - post_id can be erroneous (from a mistyped link)
+        # - post_id can reference an excluded question (no answer)
+        title, excerpt = title_desc or (None, None)
+        return {"title": title, "excerpt": excerpt}
+
+    def _details_from(self, post_id, score: int | None) -> dict:
+        item = self._title_desc_from(self.questions.get_title_desc(post_id))
         item["score"] = score
         item["id"] = post_id
 
-        post_entry = shared.database.safe_get(self.question_key(post_id))
-        if post_entry:
+        question = self.questions.get_question(post_id)
+        if question:
             (
                 item["creation_date"],
                 item["owner_user_id"],
                 item["has_accepted"],
                 item["nb_answers"],
                 item["tags"],
-            ) = json.loads(snappy.decompress(post_entry))
+            ) = question
             item["creation_date"] = datetime.datetime.fromtimestamp(
                 item["creation_date"], datetime.UTC
             )
@@ -165,21 +226,96 @@ class PostsDatabase:
             ]
         return item
 
-    def get_question_score(self, post_id: int) -> int:
-        """Score of a question by PostId"""
-        return int(shared.database.safe_zscore(self.questions_key(), int(post_id)))
+    def get_question_title_desc(self, post_id: int) -> dict:
+        """dict including title and excerpt fo a question by PostId"""
+        item = self.cache.get(post_id) if self.cache is not None else MISSING
+        if item is MISSING:
+            item = self._title_desc_from(self.questions.get_title_desc(post_id))
+            if self.cache is not None:
+                self.cache.set(post_id, item)
+        # callers can extend returned dict while cached one is shared
+        return dict(item)
 
-    def question_has_accepted_answer(self, post_id: int) -> bool:
-        """Whether the question has an accepted answer or not"""
-        post_entry = shared.database.safe_get(self.question_key(post_id))
-        if post_entry:
-            return json.loads(snappy.decompress(post_entry))[2]  # 3rd entry, accepted
-        return False
+    def get_question_details(self, post_id, score: int | None = None):
+        """Detailed information for a question
+
+        is, score, creation_date, owner_user_id, has_accepted"""
+        if score is None:
+            score = shared.database.safe_zscore(self.questions_key(), post_id)
+        return self._details_from(post_id, score)
+
+    def get_questions_details(self, questions: Iterable[tuple]) -> list[dict]:
+        """Detailed information for (post_id, score) questions"""
+        return [self._details_from(post_id, score) for post_id, score in questions]
+
+    def get_questions_states(self, post_ids: Iterable[int]) -> dict[int, dict]:
+        """score and has_accepted of questions by PostId, scores fetched at once"""
+        post_ids = list(post_ids)
+        scores = shared.database.get_scores(self.questions_key(), post_ids)
+        return {
+            post_id: {
+                "score": int(score or 0),
+                "has_accepted": self.questions.has_accepted(post_id),
+            }
+            for post_id, score in zip(post_ids, scores, strict=True)
+        }
+
+    def record_listed_questions(self):
+        """collect ids of questions displayed in listings
+
+        Those are the top questions (home pages) and top of each tag (tag pages).
+        Their list items are recorded to a new list items store"""
+        self.list_items_writer = ListItemsStoreWriter(self.list_items_path)
+        self.listed = IdsBitmap()
+        self.listed.update(
+            int(post_id)
+            for post_id in shared.database.query_set(
+                self.questions_key(), num=NB_PAGINATED_QUESTIONS, scored=False
+            )
+        )
+        # tags sets are queried in batches (single round-trip per batch)
+        for post_ids in shared.database.query_sets(
+            map(shared.tagsdatabase.tag_key, shared.tagsdatabase.tags_ids.inverse),
+            num=NB_PAGINATED_QUESTIONS_PER_TAG,
+        ):
+            self.listed.update(map(int, post_ids))
+        logger.debug(f"{len(self.listed):,} questions are displayed in listings")
+
+    def is_listed(self, post_id: int) -> bool:
+        """whether question is displayed in listings (see record_listed_questions)"""
+        return self.listed is not None and int(post_id) in self.listed
+
+    def record_list_item(self, post_id: int, content: str):
+        """store pre-rendered list item HTML of a question"""
+        if self.list_items_writer is None:
+            raise OSError("List items store is read-only once acknowledged")
+        self.list_items_writer.add(int(post_id), snappy.compress(content.encode(UTF8)))
+
+    def ack_list_items(self):
+        """build list items store from recorded ones, freeing listed questions"""
+        if self.list_items_writer is None:
+            return
+        self.list_items = self.list_items_writer.finalize()
+        self.list_items_writer = None
+        self.listed = None
+        logger.debug(f"List items store: {len(self.list_items):,} questions")
+
+    def get_list_items(self, post_ids: Iterable) -> list[str | None]:
+        """pre-rendered list item HTML of questions, in order (None if missing)"""
+        if self.list_items is None:
+            return [None for _ in post_ids]
+        entries = [self.list_items.get(post_id) for post_id in post_ids]
+        return [
+            snappy.decompress(entry).decode(UTF8) if entry else None
+            for entry in entries
+        ]
 
     def get_questions_stats(self) -> dict[str, int]:
         """total number of answers in dump (not in DB)"""
         try:
-            item = json.loads(shared.database.safe_get(self.questions_stats_key()))
+            item = questions_stats_codec.decode(
+                shared.database.safe_get(self.questions_stats_key())
+            )
         except Exception:
             item = [0, 0, 0, 0]
         return {
@@ -1,104 +1,147 @@
 #!/usr/bin/env python
 
+import concurrent.futures
+import itertools
 import threading
 import time
-from collections.abc import Iterator
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any
 
 import redis
-import redis.client
 import redis.exceptions
 
 from sotoki.constants import UTF8
+from sotoki.utils.database.base import Database
 from sotoki.utils.misc import restart_redis_at
 from sotoki.utils.shared import context, logger
 
 
-class RedisDatabase:
-
-    commit_every = 1000
+class RedisDatabase(Database):
+    """Redis server backed Database
+
+    Records are stored in hashes of records_bucket_size fields which Redis keeps
+    listpack-encoded (a compact, contiguous array) as long as hash_max_listpack_value
+    is large enough for our (encoded) records. This saves the per-key overhead
+    (dict entry, robj, expire-able key) of millions of individual keys.
+
+    All threads share a single client over a bounded, blocking, connection pool
+    sized for the maximum number of workers. Writes are executed by the writer thread
+    in non-transactional pipelines, which only hold a connection while executing.
+
+    Keys can be sharded across several redis instances (comma-separated URLs), each
+    with its own client and pool: single-key commands on strings and hashes (records)
+    are routed by a stable hash (crc32) of the key, so by family and bucket of ids.
+    Sorted sets and lists are pinned to the first shard (ranges, scores of many
+    members). Pipelines are split per shard; writer's ones executed concurrently."""
+
+    # longest encoded records are files (url and zim path) and users (name)
+    hash_max_listpack_value = 1024
+    # connections for non-worker threads: parsing/main, memory watchdog
+    extra_connections = 4
+    # seconds to wait for a free connection before raising ConnectionError
+    pool_timeout = 60
+    # keys of each family whose MEMORY USAGE is queried in memory_report()
+    memory_report_samples = 100
+    # keys of each shard counted per family in memory_report(), SCAN stopping there
+    memory_report_scan_limit = 100_000
+    # top-level sorted sets (on first shard) always measured in memory_report()
+    memory_report_keys = ("questions", "tags")
+    # sorted sets queried per pipeline in query_sets()
+    query_sets_batch_size = 1000
+    # nested values (hash fields, set members) MEMORY USAGE samples in a key
+    memory_usage_samples = 5
+    # INFO memory fields included in memory_report()
+    memory_info_fields = (
+        "used_memory",
+        "used_memory_rss",
+        "used_memory_peak",
+        "used_memory_dataset",
+        "used_memory_overhead",
+        "mem_fragmentation_ratio",
+        "mem_fragmentation_bytes",
+        "allocator_frag_ratio",
+        "allocator_frag_bytes",
+    )
+    # single-key commands routed to the shard of their key ; others go to first one
+    routed_commands = frozenset({"get", "set", "setnx", "hget", "hset", "hsetnx"})
 
     def __init__(self, *, initialize: bool = False):
-        self.connections: dict[int, redis.Redis] = {}
-        self.pipes: dict[int, redis.client.Pipeline] = {}
-        self.nb_seens: dict[int, int] = {}
-        self.should_commits: dict[int, bool] = {}
-
-        if initialize:
-            self.initialize()
+        self.pools = [
+            redis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=context.max_workers
+                + context.nb_img_threads
+                + self.extra_connections,
+                timeout=self.pool_timeout,
+                encoding=UTF8,
+                decode_responses=False,
+            )
+            for url in context.redis_urls
+        ]
+        self.clients = [redis.StrictRedis(connection_pool=pool) for pool in self.pools]
+        # executes writer's per-shard pipelines concurrently
+        self.shards_executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self.clients), thread_name_prefix="db-shard"
+            )
+            if len(self.clients) > 1
+            else None
+        )
+        super().__init__(initialize=initialize)
 
     @property
     def conn(self) -> redis.Redis:
-        """thread-specific Redis connection"""
-        try:
-            return self.connections[threading.get_ident()]
-        except KeyError:
-            self.connections[threading.get_ident()] = redis.StrictRedis.from_url(
-                context.redis_url, encoding=UTF8, decode_responses=False
-            )
-            return self.connections[threading.get_ident()]
+        """Redis client (thread-safe) of first shard, using its connection pool"""
+        return self.clients[0]
 
     @property
-    def pipe(self) -> redis.client.Pipeline:
-        """thread-specific Pipeline for this thread-specific connection"""
-        try:
-            return self.pipes[threading.get_ident()]
-        except KeyError:
-            self.pipes[threading.get_ident()] = self.conn.pipeline()
-            return self.pipes[threading.get_ident()]
+    def nb_shards(self) -> int:
+        return len(self.clients)
 
-    @property
-    def nb_seen(self):
-        """thread-specific number of items seen"""
-        try:
-            return self.nb_seens[threading.get_ident()]
-        except KeyError:
-            self.nb_seens[threading.get_ident()] = 0
-            return self.nb_seens[threading.get_ident()]
+    def shard(self, index: int) -> redis.Redis:
+        """Redis client of a shard"""
+        return self.clients[index] if index else self.conn
 
-    @nb_seen.setter
-    def nb_seen(self, value):
-        self.nb_seens[threading.get_ident()] = value
-
-    @property
-    def should_commit(self):
-        """thread-specific flag to decide if it should commit"""
-        try:
-            return self.should_commits[threading.get_ident()]
-        except KeyError:
-            self.should_commits[threading.get_ident()] = False
-            return self.should_commits[threading.get_ident()]
-
-    @should_commit.setter
-    def should_commit(self, value):
-        self.should_commits[threading.get_ident()] = value
+    def shard_index(self, command: str, key: str | bytes | None) -> int:
+        """index of the shard a command on key is sent to"""
+        if self.nb_shards == 1 or command not in self.routed_commands or key is None:
+            return 0
+        if isinstance(key, str):
+            key = key.encode(UTF8)
+        return zlib.crc32(key) % self.nb_shards
 
     def initialize(self):
-        # test connection
-        self.conn.get("NOOP")
-
-        # clean up potentially existing DB
-        if not context.open_shell and not context.keep_redis:
-            self.conn.flushdb()
-
-    def make_dummy_query(self):
-        self.pipe.get("")
+        # test connections
+        for index in range(self.nb_shards):
+            self.shard(index).get("NOOP")
 
-    def safe_get(self, key: str):
-        """GET command retried on ConnectionError"""
-        return self.safe_command("get", key)
+        self.configure_hashes_encoding()
 
-    def safe_zcard(self, key: str):
-        """ZCARD command retried on ConnectionError"""
-        return self.safe_command("zcard", key)
+        # clean up potentially existing DB (unless resuming from it)
+        if not context.open_shell and not context.keep_redis and not context.resume:
+            self.clear()
 
-    def safe_zscore(self, key: str, member: str | int):
-        """ZSCORE command retried on ConnectionError"""
-        return self.safe_command("zscore", key, member)
+    def configure_hashes_encoding(self):
+        """allow records buckets to fit in listpack-encoded hashes"""
+        try:
+            for index in range(self.nb_shards):
+                self.shard(index).config_set(
+                    "hash-max-listpack-entries",
+                    max(self.records_bucket_size, 128),
+                )
+                self.shard(index).config_set(
+                    "hash-max-listpack-value", self.hash_max_listpack_value
+                )
+        except redis.exceptions.ResponseError as exc:
+            # CONFIG might be disabled (managed servers)
+            logger.warning(f"Unable to configure Redis hashes encoding: {exc}")
 
     def safe_command(self, command: str, *args, retries: int = 20):
         """RO command retried on ConnectionError"""
         attempt = 1
-        func = getattr(self.conn, command.lower())
+        client = self.shard(self.shard_index(command, args[0] if args else None))
+        func = getattr(client, command.lower())
         while attempt < retries:
             try:
                 return func(*args)
@@ -111,31 +154,119 @@ class RedisDatabase:
                 threading.Event().wait(2)
         return func(*args)
 
-    def _execute_pipe_with_retry(self, pipe, retries: int = 20):
-        """Pipeline execute() retried on ConnectionError"""
+    def _execute_with_retry(
+        self,
+        commands: list[tuple[str, tuple, dict]],
+        retries: int = 20,
+        *,
+        concurrently: bool = False,
+    ) -> list:
+        """results of commands sent in a single non-transactional pipeline per shard
+
+        Shards pipelines are executed one after the other, or concurrently"""
+        if not commands:
+            return []
+        shards: dict[int, list[int]] = {}
+        for position, (command, args, _) in enumerate(commands):
+            index = self.shard_index(command, args[0] if args else None)
+            shards.setdefault(index, []).append(position)
+        if len(shards) == 1:
+            return self._execute_on_shard(next(iter(shards)), commands, retries)
+
+        def execute(index: int) -> list:
+            return self._execute_on_shard(
+                index, [commands[position] for position in shards[index]], retries
+            )
+
+        if concurrently and self.shards_executor:
+            results_of = dict(
+                zip(shards, self.shards_executor.map(execute, shards), strict=True)
+            )
+        else:
+            results_of = {index: execute(index) for index in shards}
+        results = [None] * len(commands)
+        for index, positions in shards.items():
+            for position, result in zip(positions, results_of[index], strict=True):
+                results[position] = result
+        return results
+
+    def _execute_on_shard(
+        self, index: int, commands: list[tuple[str, tuple, dict]], retries: int = 20
+    ) -> list:
+        """results of commands sent to a shard in a non-transactional pipeline
+
+        Pipeline is rebuilt on each attempt as execute() resets it, even on error.
+        Retried on ConnectionError"""
+
+        def execute():
+            pipe = self.shard(index).pipeline(transaction=False)
+            for command, args, kwargs in commands:
+                getattr(pipe, command)(*args, **kwargs)
+            return pipe.execute()
+
+        if not commands:
+            return []
         attempt = 1
         while attempt < retries:
             try:
-                return pipe.execute()
+                return execute()
             except redis.exceptions.ConnectionError as exc:
-                logger.error(f"Redis PIPE.EXECUTE Error #{attempt}/{retries}: {exc}")
+                logger.error(f"Redis PIPELINE Error #{attempt}/{retries}: {exc}")
                 attempt += 1
                 threading.Event().wait(2)
-        return pipe.execute()
+        return execute()
+
+    def safe_pipeline(self, commands: list[tuple[str, tuple]], retries: int = 20):
+        """results of RO commands sent in a single round-trip (non-transactional)
 
-    def commit(self, *, done=False):
-        self._execute_pipe_with_retry(self.pipe)
-        # make sure we've commited pipes on all thread-specific pipelines
-        if done:
-            time.sleep(2)  # prevent last-thread created while we iterate on mini domain
-            for pipe in self.pipes.values():
-                self._execute_pipe_with_retry(pipe)
+        Retried on ConnectionError"""
+        return self._execute_with_retry(
+            [(command, args, {}) for command, args in commands], retries=retries
+        )
+
+    def execute_writes(self, commands: list[tuple[str, tuple, dict]]):
+        self._execute_with_retry(commands, concurrently=True)
+
+    def get_records(
+        self, records: Iterable[tuple[str, int | str]]
+    ) -> list[bytes | None]:
+        """recorded values for (family, record_id) pairs, in a single round-trip"""
+        keys = []
+        for family, record_id in records:
+            try:
+                keys.append(self.record_key(family, record_id))
+            except (TypeError, ValueError):
+                keys.append(None)
+        values = iter(self.safe_pipeline([("hget", key) for key in keys if key]))
+        return [next(values) if key else None for key in keys]
+
+    def query_sets(self, set_names: Iterable[str], num: int) -> Iterator[list[str]]:
+        """top num members (without scores) of each named sorted set, in order
+
+        Sets are queried in pipelines of query_sets_batch_size sets"""
+        set_names = iter(set_names)
+        while batch := list(itertools.islice(set_names, self.query_sets_batch_size)):
+            for members in self.safe_pipeline(
+                [("zrevrange", (set_name, 0, num - 1)) for set_name in batch]
+            ):
+                yield [member.decode(UTF8) for member in members]
+
+    def get_scores(self, set_name: str, members: Iterable) -> list[float | None]:
+        """scores of members in named sorted set, in a single command"""
+        members = list(members)
+        if not members:
+            return []
+        return self.safe_command("zmscore", set_name, members)
 
     def purge(self):
         """ask redis to reclaim dirty pages space. Effective only on Linux"""
-        self.conn.memory_purge()
+        for index in range(self.nb_shards):
+            self.shard(index).memory_purge()
 
     def defrag_external(self):
+        if self.nb_shards > 1:
+            logger.warning("Cannot defrag sharded database")
+            return
         if not context.redis_pid:
             logger.warning(f"Cannot defrag with {context.redis_pid=}")
             return
@@ -156,23 +287,162 @@ class RedisDatabase:
                 break
         logger.debug("REDIS is ready")
 
+    def is_persistent(self) -> bool:
+        """whether all shards have RDB snapshots or AOF enabled"""
+        for index in range(self.nb_shards):
+            try:
+                config = self.shard(index).config_get("save")
+                config.update(self.shard(index).config_get("appendonly"))
+            except redis.exceptions.ResponseError as exc:
+                # CONFIG might be disabled (managed servers, usually persistent)
+                logger.warning(f"Unable to check Redis persistence: {exc}")
+                continue
+            if not config.get("save") and config.get("appendonly") != "yes":
+                return False
+        return True
+
     def dump(self):
-        """SAVE a dump on disk (as dump.rdb on CWD)"""
-        self.conn.config_set("dir", str(context.tmp_dir))
-        self.conn.save()
+        """SAVE a dump on disk (as dump.rdb in tmp_dir ; dump-{shard}.rdb if sharded)"""
+        for index in range(self.nb_shards):
+            client = self.shard(index)
+            client.config_set("dir", str(context.tmp_dir))
+            if self.nb_shards > 1:
+                client.config_set("dbfilename", f"dump-{index}.rdb")
+            client.save()
 
     def teardown(self):
-        self._execute_pipe_with_retry(self.pipe)
-        self.conn.close()
+        self.writer.stop()
+        if self.shards_executor:
+            self.shards_executor.shutdown()
+        for pool in self.pools:
+            pool.disconnect()
 
     def remove(self):
         """flush database"""
         if not context.keep_redis:
-            self.conn.flushdb()
-
-    def get_set_count(self, set_name: str) -> int:
-        """Number of recorded entries in set"""
-        return self.safe_zcard(set_name)
+            self.clear()
+
+    def clear(self):
+        for index in range(self.nb_shards):
+            self.shard(index).flushdb()
+
+    def report(self) -> str:
+        """one-line connections and writer usage summary"""
+        # pool queue holds idle connections and placeholders for not-yet-opened ones
+        in_use = sum(pool.max_connections - pool.pool.qsize() for pool in self.pools)
+        shards = f" over {self.nb_shards} shards" if self.nb_shards > 1 else ""
+        return (
+            f"Redis: {in_use} connections in use, "
+            f"{sum(pool.max_connections for pool in self.pools)} max{shards}, "
+            f"{self.writer.report()}"
+        )
+
+    def memory_usage(self) -> int | None:
+        """memory used by redis-server(s)"""
+        return sum(
+            int(self.shard(index).info("memory")["used_memory"])
+            for index in range(self.nb_shards)
+        )
+
+    @staticmethod
+    def key_family(key: str) -> str:
+        """family of a key: its prefix (T, TE, U…) or the key itself (questions)"""
+        if key.endswith("-files"):
+            return "*-files"
+        prefix, sep, _ = key.partition(":")
+        return prefix if sep else key
+
+    def memory_report(self) -> dict[str, Any] | None:
+        """estimated memory usage per keys family, with server memory info
+
+        Up to memory_report_scan_limit keys of each shard are counted per family
+        (SCAN order is random), counts being extrapolated to the shard's DBSIZE if
+        SCAN stopped there. MEMORY USAGE is queried only for the first
+        memory_report_samples keys of each family: a family's total is estimated
+        from its sampled keys average. memory_report_keys, which a stopped SCAN
+        could miss, are always measured. Server memory info is listed per shard"""
+        nb_keys: dict[str, float] = {}
+        sampled: dict[str, list[tuple[int, bytes]]] = {
+            key: [(0, key.encode(UTF8))] for key in self.memory_report_keys
+        }
+        try:
+            for index in range(self.nb_shards):
+                shard_keys: dict[str, int] = {}
+                for key in itertools.islice(
+                    self.shard(index).scan_iter(count=1000),
+                    self.memory_report_scan_limit,
+                ):
+                    family = self.key_family(key.decode(UTF8, errors="replace"))
+                    shard_keys[family] = shard_keys.get(family, 0) + 1
+                    family_sampled = sampled.setdefault(family, [])
+                    if (
+                        family not in self.memory_report_keys
+                        and len(family_sampled) < self.memory_report_samples
+                    ):
+                        family_sampled.append((index, key))
+                nb_scanned = sum(shard_keys.values())
+                ratio = (
+                    self.shard(index).dbsize() / nb_scanned
+                    if nb_scanned >= self.memory_report_scan_limit
+                    else 1
+                )
+                for family, count in shard_keys.items():
+                    nb_keys[family] = nb_keys.get(family, 0) + count * ratio
+
+            families = {}
+            for family, keys in sampled.items():
+                usages = [
+                    usage
+                    for index in range(self.nb_shards)
+                    for usage in self._execute_on_shard(
+                        index,
+                        [
+                            ("memory_usage", (key, self.memory_usage_samples), {})
+                            for key_index, key in keys
+                            if key_index == index
+                        ],
+                    )
+                    if usage is not None
+                ]
+                if family in self.memory_report_keys:
+                    # measured rather than counted: missing if there's no usage
+                    nb_keys[family] = len(usages)
+                if not nb_keys.get(family):
+                    continue
+                average = sum(usages) / len(usages) if usages else 0
+                families[family] = {
+                    "keys": round(nb_keys[family]),
+                    "sampled": len(usages),
+                    "estimated_bytes": round(average * nb_keys[family]),
+                }
+            infos = [
+                self.shard(index).info("memory") for index in range(self.nb_shards)
+            ]
+        except redis.exceptions.ResponseError as exc:
+            # MEMORY might be disabled (managed servers)
+            logger.warning(f"Unable to report Redis memory usage: {exc}")
+            return None
+
+        return {
+            "families": dict(
+                sorted(
+                    families.items(),
+                    key=lambda item: item[1]["estimated_bytes"],
+                    reverse=True,
+                )
+            ),
+            "estimated_bytes": sum(
+                family["estimated_bytes"] for family in families.values()
+            ),
+            "memory": [
+                {
+                    field: info[field]
+                    for field in self.memory_info_fields
+                    if field in info
+                }
+                for info in infos
+            ],
+        }
 
     def query_set(
         self,
@@ -207,17 +477,3 @@ class RedisDatabase:
             "score_cast_func": int,
         }
         return decode_results(func(**kwargs))
-
-    def commit_maybe(self):
-        """commit() should should_commit allows it"""
-        if self.should_commit:
-            self.commit()
-            self.should_commit = False
-
-    def bump_seen(self, by: int = 1):
-        """track number of items seen and update commit decision"""
-        old_threshold = self.nb_seen // self.commit_every
-        self.nb_seen += by
-        new_threshold = self.nb_seen // self.commit_every
-        if old_threshold != new_threshold:
-            self.should_commit = True
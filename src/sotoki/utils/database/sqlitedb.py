@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+import itertools
+import pathlib
+import sqlite3
+import threading
+import weakref
+from collections.abc import Iterator
+from typing import Any
+
+from sotoki.constants import SQLITE_MMAP_SIZE
+from sotoki.utils.database.base import Database
+from sotoki.utils.shared import context, logger, shared
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hashes (
+    name TEXT NOT NULL,
+    field INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (name, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS zsets (
+    name TEXT NOT NULL,
+    member TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (name, member)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS zsets_by_score ON zsets (name, score, member);
+CREATE TABLE IF NOT EXISTS lists (
+    name TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (name, pos)
+) WITHOUT ROWID;
+"""
+
+SET = "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)"
+SETNX = "INSERT OR IGNORE INTO kv (key, value) VALUES (?, ?)"
+HSET = "INSERT OR REPLACE INTO hashes (name, field, value) VALUES (?, ?, ?)"
+HSETNX = "INSERT OR IGNORE INTO hashes (name, field, value) VALUES (?, ?, ?)"
+ZADD = "INSERT OR REPLACE INTO zsets (name, member, score) VALUES (?, ?, ?)"
+ZADDNX = "INSERT OR IGNORE INTO zsets (name, member, score) VALUES (?, ?, ?)"
+
+
+def to_bytes(value: Any) -> bytes:
+    """value as stored, like redis-py does"""
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("UTF-8")
+
+
+class Transaction:
+    """context manager for a write transaction, yielding a cursor"""
+
+    def __init__(self, sqlite: sqlite3.Connection):
+        self.sqlite = sqlite
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.cursor = self.sqlite.cursor()
+        # take write lock upfront so concurrent writers wait (busy timeout)
+        # instead of failing to upgrade a read transaction
+        self.cursor.execute("BEGIN IMMEDIATE")
+        return self.cursor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cursor.execute("ROLLBACK" if exc_type else "COMMIT")
+        self.cursor.close()
+
+
+class SQLitePipeline:
+    """Buffered writes (redis Pipeline subset) executed in a single transaction"""
+
+    def __init__(self, conn: SQLiteConnection):
+        self.conn = conn
+        self.commands: list[tuple[str, tuple]] = []
+
+    def set(self, name: str, value: Any):
+        self.commands.append((SET, (name, to_bytes(value))))
+
+    def setnx(self, name: str, value: Any):
+        self.commands.append((SETNX, (name, to_bytes(value))))
+
+    def hset(self, name: str, key: int, value: Any):
+        self.commands.append((HSET, (name, key, to_bytes(value))))
+
+    def hsetnx(self, name: str, key: int, value: Any):
+        self.commands.append((HSETNX, (name, key, to_bytes(value))))
+
+    def zadd(self, name: str, mapping: dict, *, nx: bool = False):
+        for member, score in mapping.items():
+            self.commands.append(
+                (ZADDNX if nx else ZADD, (name, str(member), float(score)))
+            )
+
+    def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        if not commands:
+            return []
+        with self.conn.transaction() as cursor:
+            # group consecutive identical statements to use executemany
+            for sql, group in itertools.groupby(commands, key=lambda cmd: cmd[0]):
+                cursor.executemany(sql, [params for _, params in group])
+        return []
+
+
+class SQLiteConnection:
+    """Redis-like commands (subset we use) over a SQLite connection"""
+
+    def __init__(self, fpath: pathlib.Path):
+        self.sqlite = sqlite3.connect(
+            fpath, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.sqlite.execute("PRAGMA journal_mode=WAL")
+        # database is disposable: no need to wait for disk sync
+        self.sqlite.execute("PRAGMA synchronous=OFF")
+        self.sqlite.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        self.sqlite.execute("PRAGMA temp_store=MEMORY")
+
+    def transaction(self):
+        return Transaction(self.sqlite)
+
+    def pipeline(self) -> SQLitePipeline:
+        return SQLitePipeline(self)
+
+    def fetch_value(self, sql: str, *params) -> Any:
+        row = self.sqlite.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def get(self, name: str) -> bytes | None:
+        return self.fetch_value("SELECT value FROM kv WHERE key = ?", name)
+
+    def hget(self, name: str, key: int) -> bytes | None:
+        return self.fetch_value(
+            "SELECT value FROM hashes WHERE name = ? AND field = ?", name, key
+        )
+
+    def zcard(self, name: str) -> int:
+        return self.fetch_value("SELECT COUNT(*) FROM zsets WHERE name = ?", name)
+
+    def zscore(self, name: str, member: Any) -> float | None:
+        return self.fetch_value(
+            "SELECT score FROM zsets WHERE name = ? AND member = ?", name, str(member)
+        )
+
+    def zrange(
+        self, name: str, start: int, num: int, *, desc: bool
+    ) -> list[tuple[str, float]]:
+        order = "DESC" if desc else "ASC"
+        query = (
+            "SELECT member, score FROM zsets WHERE name = ? "  # nosec # noqa: S608
+            f"ORDER BY score {order}, member {order} LIMIT ? OFFSET ?"
+        )
+        return self.sqlite.execute(query, (name, num, start)).fetchall()
+
+    def zremrangebyrank(self, name: str, start: int, stop: int) -> int:
+        """remove members ranked start to stop (inclusive, from lowest score)"""
+        count = self.zcard(name)
+        start = start + count if start < 0 else start
+        stop = stop + count if stop < 0 else stop
+        if start > stop or start >= count:
+            return 0
+        with self.transaction() as cursor:
+            cursor.execute(
+                "DELETE FROM zsets WHERE name = ? AND member IN ("
+                "SELECT member FROM zsets WHERE name = ? "
+                "ORDER BY score ASC, member ASC LIMIT ? OFFSET ?)",
+                (name, name, stop - start + 1, start),
+            )
+            return cursor.rowcount
+
+    def lpush(self, name: str, *values: Any) -> int:
+        with self.transaction() as cursor:
+            for value in values:
+                cursor.execute(
+                    "INSERT INTO lists (name, pos, value) "
+                    "SELECT ?, COALESCE(MIN(pos), 0) - 1, ? FROM lists WHERE name = ?",
+                    (name, to_bytes(value), name),
+                )
+        return self.llen(name)
+
+    def rpop(self, name: str) -> bytes | None:
+        with self.transaction() as cursor:
+            row = cursor.execute(
+                "DELETE FROM lists WHERE name = ? AND pos = ("
+                "SELECT MAX(pos) FROM lists WHERE name = ?) RETURNING value",
+                (name, name),
+            ).fetchone()
+        return row[0] if row else None
+
+    def llen(self, name: str) -> int:
+        return self.fetch_value("SELECT COUNT(*) FROM lists WHERE name = ?", name)
+
+    def delete(self, *names: str) -> int:
+        with self.transaction() as cursor:
+            deleted = 0
+            for table, column in (
+                ("kv", "key"),
+                ("hashes", "name"),
+                ("zsets", "name"),
+                ("lists", "name"),
+            ):
+                cursor.executemany(
+                    f"DELETE FROM {table} WHERE {column} = ?",  # nosec # noqa: S608
+                    [(name,) for name in names],
+                )
+                deleted += max(cursor.rowcount, 0)
+        return deleted
+
+    def close(self):
+        self.sqlite.close()
+
+
+class SQLiteDatabase(Database):
+    """Embedded SQLite (WAL, memory-mapped) backed Database
+
+    Disk-backed alternative to Redis requiring no server: reads are local
+    (no round-trip) and served from the OS page cache via mmap.
+    Writes are batched by the writer thread into transactions just like with Redis.
+
+    Each thread has its own connection, closed once the thread exits."""
+
+    def __init__(self, *, initialize: bool = False):
+        self.local = threading.local()
+        super().__init__(initialize=initialize)
+
+    @property
+    def fpath(self) -> pathlib.Path:
+        return shared.build_dir / "database.sqlite"
+
+    @property
+    def conn(self) -> SQLiteConnection:
+        """thread-specific SQLite connection
+
+        Held by a thread-local so it is released when its thread exits: connections
+        registry only keeps weak references"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = SQLiteConnection(self.fpath)
+            with self.registry_lock:
+                self.connections[id(conn)] = weakref.ref(conn)
+            weakref.finalize(conn, self._release, id(conn), conn.sqlite)
+        return conn
+
+    def _release(self, key: int, sqlite: sqlite3.Connection):
+        """close connection of an exited thread, removing it from registry"""
+        with self.registry_lock:
+            self.connections.pop(key, None)
+        sqlite.close()
+
+    def initialize(self):
+        # clean up potentially existing DB (unless resuming from it)
+        if not context.open_shell and not context.keep_redis and not context.resume:
+            self._remove_files()
+        self.conn.sqlite.executescript(SCHEMA)
+        logger.debug(f"Using SQLite {sqlite3.sqlite_version} database at {self.fpath}")
+
+    def _remove_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            self.fpath.with_name(f"{self.fpath.name}{suffix}").unlink(missing_ok=True)
+
+    def safe_command(self, command: str, *args, retries: int = 20):
+        """command retried while database is locked (busy timeout exceeded)"""
+        attempt = 1
+        func = getattr(self.conn, command.lower())
+        while attempt < retries:
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                logger.error(
+                    f"SQLite {command.upper()} Error #{attempt}/{retries}: {exc}"
+                )
+                attempt += 1
+        return func(*args)
+
+    def execute_writes(self, commands: list[tuple[str, tuple, dict]]):
+        pipe = self.conn.pipeline()
+        for command, args, kwargs in commands:
+            getattr(pipe, command)(*args, **kwargs)
+        pipe.execute()
+
+    def purge(self):
+        """move WAL content into database file, truncating WAL"""
+        self.conn.sqlite.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def defrag_external(self):
+        logger.debug("No external defrag for SQLite database")
+
+    def dump(self):
+        """database is on disk already (in build dir) ; flush WAL into it"""
+        self.purge()
+
+    def teardown(self):
+        self.writer.stop()
+        with self.registry_lock:
+            connections = [ref() for ref in self.connections.values()]
+            self.connections.clear()
+        for conn in connections:
+            if conn is not None:
+                conn.close()
+
+    def remove(self):
+        """remove database files"""
+        if not context.keep_redis:
+            self._remove_files()
+
+    def clear(self):
+        with self.conn.transaction() as cursor:
+            for table in ("kv", "hashes", "zsets", "lists"):
+                cursor.execute(f"DELETE FROM {table}")  # nosec # noqa: S608
+
+    def query_set(
+        self,
+        set_name: str,
+        start: int = 0,
+        num: int | None = None,
+        *,
+        desc: bool = True,
+        scored: bool = True,
+    ) -> Iterator[tuple[object, int] | object]:
+        """Query entries in named sorted set"""
+        results = self.conn.zrange(
+            set_name, start=start, num=-1 if num is None else num, desc=desc
+        )
+        return ((member, int(score)) if scored else member for member, score in results)
@@ -4,8 +4,9 @@ import json
 
 from bidict import bidict
 
-from sotoki.constants import UTF8
+from sotoki.constants import NB_PAGINATED_QUESTIONS_PER_TAG, UTF8
 from sotoki.utils.shared import logger, shared
+from sotoki.utils.topk import TopIds
 
 
 class TagsDatabase:
@@ -29,6 +30,8 @@ class TagsDatabase:
         self.tags_details_ids = {}
         # bidirectionnal Tag ID:name and (as inverse) name:ID mapping
         self.tags_ids = bidict()
+        # top questions (by score) of each tag, until written to T:{name} sets
+        self.tags_questions = TopIds(NB_PAGINATED_QUESTIONS_PER_TAG)
 
     @staticmethod
     def tag_key(name):
@@ -75,9 +78,6 @@ class TagsDatabase:
             self.tags_key(), mapping={tag["TagName"]: tag["Count"]}, nx=True
         )
 
-        shared.database.bump_seen(2)
-        shared.database.commit_maybe()
-
     def ack_tags_ids(self):
         """dump or load tags_ids and tags_details_ids"""
         tags_ids_fpath = shared.build_dir / "tags_ids.json"
@@ -102,26 +102,26 @@ class TagsDatabase:
     def record_tag_detail(self, name: str, field: str, content: str):
         """insert or update tag row for excerpt or description"""
         shared.database.pipe.set(self.tag_detail_key(name, field), content)
-        shared.database.bump_seen()
-        shared.database.commit_maybe()
 
     def clear_tags_mapping(self):
         """releases the PostId/Type mapping used to filter usedful posts"""
         del self.tags_details_ids
 
-    def clear_extra_tags_questions_list(self, at_most: int):
-        """only keep at_most question IDs per tag in the database
+    def record_tag_question(self, name: str, post_id: int, score: int):
+        """track question in the top questions of tag, kept in memory
 
-        Those T:{post_id} ordered sets are used to build per-tag list of questions
+        Those T:{name} ordered sets are used to build per-tag list of questions
         and those are paginated up to some arbitrary value so it makes no sense
-        to keep more than this number"""
-
-        # don't use pipeline as those commands are RAM-hungry on redis side and
-        # we don't want to stack them up
-        for tag in self.tags_ids.inverse.keys():
-            shared.database.safe_command(
-                "zremrangebyrank", self.tag_key(tag), 0, -(at_most + 1)
+        to record more than this number"""
+        self.tags_questions.add(name, score, post_id)
+
+    def write_tags_questions(self):
+        """record top questions of all tags to their T:{name} sets, freeing them"""
+        for tag in list(self.tags_questions.tops):
+            shared.database.pipe.zadd(
+                self.tag_key(tag), mapping=self.tags_questions.pop(tag), nx=True
             )
+        shared.database.commit()
 
     def get_tag_id(self, name: str) -> int | None:
         """Tag ID for its name"""
@@ -1,40 +1,26 @@
 #!/usr/bin/env python
 
-import collections
 import json
 import threading
+from collections.abc import Iterable
 from typing import Any
 
-import snappy
-
-from sotoki.constants import NB_PAGINATED_USERS
+from sotoki.constants import NB_PAGINATED_USERS, USERS_CACHE_SIZE
+from sotoki.utils.bitmap import IdsBitmap
+from sotoki.utils.cache import MISSING, LRUCache
+from sotoki.utils.database.codec import user_codec
 from sotoki.utils.shared import logger, shared
+from sotoki.utils.topk import TopDict
 
 
-class TopDict(collections.UserDict):
-    """A fixed-sized dict that keeps only the highest values"""
-
-    def __init__(self, maxlen: int):
-        super().__init__()
-        self.maxlen = maxlen
-        self.lock = threading.Lock()
-
-    def __setitem__(self, key, value):
-        with self.lock:
-            # we're full, might not accept value
-            if len(self) >= self.maxlen:
-                # value is bellow our min, don't care
-                min_val = min(self.values())
-                if value < min_val:
-                    return
+def user_key(user_id) -> Any:
+    """UserId as int, either read from XML (str) or records (int), for cache keys
 
-                # value should be in top, let's remove our min to allow it
-                min_key = list(self.keys())[list(self.values()).index(min_val)]
-                del self[min_key]
-            super().__setitem__(key, value)
-
-    def sorted(self):
-        return [k for k, _ in sorted(self.items(), key=lambda x: x[1], reverse=True)]
+    Deleted users are recorded to a name, kept as is"""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return user_id
 
 
 class UsersDatabase:
@@ -46,11 +32,12 @@ class UsersDatabase:
     We also store the number of badges owned by class (gold, silver, bronze) as this
     is this is an extension to thre reputation.
 
-    We store this as a list in U:{userId} key for each user
+    We store this as a list in a U record for each user, packed by UserId into
+    U:{bucket} hashes (see Database.record_key)
 
     We also have a sorted set of UserIds scored by Reputation.
     Because we first go through Posts to eliminate all Users without interactions,
-    we first gather an un-ordered list of UserIds: a non-sorted set.
+    we first gather an un-ordered list of UserIds: a bitmap (see IdsBitmap).
     Once we're trhough with this step, we create the sorted one and trash the first one.
 
     List of users is essential to exclude users without interactions, so we don't
@@ -68,52 +55,55 @@ class UsersDatabase:
         self._top_users = TopDict(NB_PAGINATED_USERS)
 
         # temp set to hold all active users' IDs
-        self._all_users_ids = set()
+        self._all_users_ids = IdsBitmap()
+        self._all_users_ids_lock = threading.Lock()
 
         # total number of active users
         self.nb_users = 0
 
+        # users details cache, enabled once all users are recorded
+        self.cache: LRUCache | None = None
+
     @staticmethod
-    def user_key(user_id):
-        return f"U:{user_id}"
+    def user_family():
+        return "U"
+
+    def record_active_users(self, users_ids: Iterable[int]):
+        """add users_ids to the set of users with interactions"""
+        with self._all_users_ids_lock:
+            self._all_users_ids.update(users_ids)
 
     def record_user(self, user: dict[str, Any]):
-        """record basic user details to MEM at U:{id} key
+        """record basic user details to MEM as U record
 
         Name, Reputation, NbGoldBages, NbSilverBadges, NbBronzeBadges"""
 
         # record score in top mapping
         self._top_users[user["Id"]] = user["Reputation"]
 
-        # record profile details into individual key
-        shared.database.pipe.set(
-            self.user_key(user["Id"]),
-            snappy.compress(
-                json.dumps(
-                    (
-                        user["DisplayName"],
-                        user["Reputation"],
-                        user["nb_gold"],
-                        user["nb_silver"],
-                        user["nb_bronze"],
-                    )
+        # record profile details into bucketed record
+        shared.database.set_record(
+            self.user_family(),
+            user["Id"],
+            user_codec.encode(
+                (
+                    user["DisplayName"],
+                    user["Reputation"],
+                    user["nb_gold"],
+                    user["nb_silver"],
+                    user["nb_bronze"],
                 )
             ),
         )
 
-        shared.database.bump_seen()
-        shared.database.commit_maybe()
-
     def ack_users_ids(self):
         """dump or load users_ids"""
-        all_users_ids_fpath = shared.build_dir / "all_users_ids.json"
+        all_users_ids_fpath = shared.build_dir / "all_users_ids.bin"
         if not self._all_users_ids and all_users_ids_fpath.exists():
             logger.debug(f"loading all_users_ids from {all_users_ids_fpath.name}")
-            with open(all_users_ids_fpath) as fh:
-                self._all_users_ids = set(json.load(fh))
+            self._all_users_ids = IdsBitmap.load(all_users_ids_fpath)
         else:
-            with open(all_users_ids_fpath, "w") as fh:
-                json.dump(list(self._all_users_ids), fh, indent=4)
+            self._all_users_ids.dump(all_users_ids_fpath)
 
     def cleanup_users(self):
         """frees list of active users that we won't need anymore. sets nb_users
@@ -133,14 +123,11 @@ class UsersDatabase:
             with open(top_users_fpath, "w") as fh:
                 json.dump(self.top_users, fh, indent=4)
 
-    def get_user_full(self, user_id: int) -> dict[str, Any] | None:
-        """All recorded information for a UserId
-
-        id, name, rep, nb_gold, nb_silver, nb_bronze"""
-        user = shared.database.safe_get(self.user_key(user_id))
-        if not user:
+    @staticmethod
+    def _user_from(user_id, entry: bytes | None) -> dict[str, Any] | None:
+        if not entry:
             return None
-        user = json.loads(snappy.decompress(user))
+        user = user_codec.decode(entry)
         return {
             "id": user_id,
             "name": user[0],
@@ -150,6 +137,42 @@ class UsersDatabase:
             "nb_bronze": user[4],
         }
 
+    def enable_cache(self, max_size: int = USERS_CACHE_SIZE) -> LRUCache:
+        """cache users details. Only once all users have been recorded"""
+        self.cache = LRUCache("Users", max_size)
+        return self.cache
+
+    def get_user_full(self, user_id: int) -> dict[str, Any] | None:
+        """All recorded information for a UserId
+
+        id, name, rep, nb_gold, nb_silver, nb_bronze"""
+        return self.get_users_full([user_id])[user_id]
+
+    def get_users_full(self, users_ids: Iterable) -> dict[Any, dict[str, Any] | None]:
+        """All recorded information for many UserIds, fetched at once"""
+        users = {}
+        missing = []
+        for user_id in users_ids:
+            key = user_key(user_id)
+            user = self.cache.get(key) if self.cache is not None else MISSING
+            if user is MISSING:
+                missing.append(user_id)
+            else:
+                users[user_id] = user
+
+        entries = shared.database.get_records(
+            (self.user_family(), user_id) for user_id in missing
+        )
+        for user_id, entry in zip(missing, entries, strict=True):
+            users[user_id] = self._user_from(user_key(user_id), entry)
+            if self.cache is not None:
+                self.cache.set(user_key(user_id), users[user_id])
+
+        # callers can extend returned dicts while cached ones are shared
+        return {
+            user_id: dict(user) if user else None for user_id, user in users.items()
+        }
+
     def is_active_user(self, user_id):
         """whether a user_id is considered active (has interaction in content)
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from sotoki.utils.shared import logger
+
+if TYPE_CHECKING:
+    from sotoki.utils.database.base import Database
+
+# queued to stop the writer thread
+STOP = object()
+
+
+class Flush:
+    """queued to request execution of buffered commands, optionally awaited"""
+
+    def __init__(self, *, wait: bool):
+        self.done = threading.Event() if wait else None
+
+
+def payload_size(*values: Any) -> int:
+    """approximate number of bytes sent to the database for those values"""
+    return sum(len(value) if isinstance(value, bytes | str) else 8 for value in values)
+
+
+class BackgroundWriter:
+    """Writes of all threads coalesced into pipelines by a dedicated thread
+
+    Exposes the writing subset of Redis Pipeline API (set, setnx, hset, hsetnx, zadd)
+    which only queues commands. The writer thread batches them and has the database
+    execute each batch as a single (non-transactional) pipeline once flush_size bytes
+    are buffered, flush_interval seconds after the first buffered command, or on
+    flush() request.
+
+    Queue is bounded so producers wait if the database can't keep up."""
+
+    flush_size = 4 * 2**20
+    flush_interval = 1.0
+    queue_size = 100000
+
+    def __init__(self, database: Database):
+        self.database = database
+        self.queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        # last error executing a pipeline, raised on next awaited flush
+        self.exception: Exception | None = None
+        self.nb_commands = 0
+        self.nb_flushes = 0
+        self.nb_bytes = 0
+        self.thread = threading.Thread(target=self.run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def set(self, name: str, value: Any):
+        self.queue.put(("set", (name, value), {}, payload_size(name, value)))
+
+    def setnx(self, name: str, value: Any):
+        self.queue.put(("setnx", (name, value), {}, payload_size(name, value)))
+
+    def hset(self, name: str, key: int, value: Any):
+        self.queue.put(("hset", (name, key, value), {}, payload_size(name, key, value)))
+
+    def hsetnx(self, name: str, key: int, value: Any):
+        self.queue.put(
+            ("hsetnx", (name, key, value), {}, payload_size(name, key, value))
+        )
+
+    def zadd(self, name: str, mapping: dict, *, nx: bool = False):
+        self.queue.put(
+            (
+                "zadd",
+                (name, mapping),
+                {"nx": nx},
+                payload_size(name, *mapping.keys(), *mapping.values()),
+            )
+        )
+
+    def flush(self, *, wait: bool = True):
+        """execute all commands queued so far, waiting for completion if requested
+
+        Raises last pipeline execution error (once) if waiting"""
+        marker = Flush(wait=wait)
+        self.queue.put(marker)
+        if marker.done:
+            marker.done.wait()
+            if self.exception:
+                exception, self.exception = self.exception, None
+                raise exception
+
+    def stop(self):
+        """execute remaining commands and stop writer thread"""
+        try:
+            self.flush()
+        finally:
+            self.queue.put(STOP)
+            self.thread.join()
+
+    def run(self):
+        batch: list[tuple[str, tuple, dict]] = []
+        buffered = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                # flush_interval elapsed since first buffered command
+                item = Flush(wait=False)
+
+            if item is STOP:
+                return
+
+            if isinstance(item, Flush):
+                should_flush = True
+            else:
+                command, args, kwargs, size = item
+                batch.append((command, args, kwargs))
+                buffered += size
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                should_flush = buffered >= self.flush_size
+
+            if should_flush and batch:
+                try:
+                    self.database.execute_writes(batch)
+                except Exception as exc:
+                    logger.error(f"Unable to write {len(batch)} commands to database")
+                    logger.exception(exc)
+                    self.exception = exc
+                self.nb_commands += len(batch)
+                self.nb_flushes += 1
+                self.nb_bytes += buffered
+                batch = []
+                buffered = 0
+                deadline = None
+
+            if isinstance(item, Flush) and item.done:
+                item.done.set()
+
+    def report(self) -> str:
+        """one-line usage summary"""
+        return (
+            f"writer: {self.queue.qsize():,} queued, {self.nb_commands:,} commands "
+            f"in {self.nb_flushes:,} flushes ({self.nb_bytes / 2**20:,.1f}MiB)"
+        )
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
-import datetime
+import functools
 import queue
 import threading
+import time
 from collections.abc import Callable
 
 from sotoki.utils.shared import logger
@@ -11,7 +12,16 @@ _shutdown = False
 # Lock that ensures that new workers are not created while the interpreter is
 # shutting down. Must be held while mutating _threads_queues and _shutdown.
 _global_shutdown_lock = threading.Lock()
-thread_deadline_sec = 60
+# adaptive mode: seconds between two evaluations of workers load
+adapt_every_sec = 5
+# adaptive mode: add a worker above both those queue fill and workers busy ratios
+scale_up_fill_ratio = 0.8
+scale_up_busy_ratio = 0.9
+# adaptive mode: retire a worker below this workers busy ratio
+scale_down_busy_ratio = 0.5
+
+# poison pill: a worker receiving it exits
+_STOP = object()
 
 
 def excepthook(args):
@@ -28,16 +38,40 @@ class SotokiExecutor(queue.Queue):
     Providing more flexibility for the use cases we're interested about:
     - halt immediately (sort of) upon exception (if requested)
     - able to join() then restart later to accomodate successive steps
+    - optionally adapt the number of workers to the load (between nb_workers and
+      max_workers)
+    - throttle admission of new tasks (on memory pressure)
+
+    Every queue entry is released (task_done) once processed so join() is a
+    barrier: it returns once all submitted tasks are complete and workers exited.
 
     See: https://github.com/python/cpython/blob/3.8/Lib/concurrent/futures/thread.py
     """
 
-    def __init__(self, queue_size: int = 10, nb_workers: int = 1, prefix: str = "T-"):
+    def __init__(
+        self,
+        queue_size: int = 10,
+        nb_workers: int = 1,
+        prefix: str = "T-",
+        max_workers: int | None = None,
+    ):
         super().__init__(queue_size)
+        self.queue_size = queue_size
         self.prefix = prefix
         self._shutdown_lock = threading.Lock()
+        self._shutdown = True
         self.nb_workers = nb_workers
+        self.max_workers = max(nb_workers, max_workers or nb_workers)
         self.exceptions = []
+        # protects workers set and load statistics
+        self._workers_lock = threading.Lock()
+        self._workers: set[threading.Thread] = set()
+        self._workers_created = 0
+        self._to_retire = 0
+        self._busy_seconds = 0.0
+        self._monitor: threading.Thread | None = None
+        self._monitor_stop = threading.Event()
+        self.throttled = False
 
     @property
     def exception(self):
@@ -52,6 +86,17 @@ class SotokiExecutor(queue.Queue):
         """whether it should continue running"""
         return not self._shutdown
 
+    @property
+    def adaptive(self) -> bool:
+        """whether number of workers is adjusted to the load"""
+        return self.max_workers > self.nb_workers
+
+    @property
+    def nb_active_workers(self) -> int:
+        """number of started workers not requested to retire"""
+        with self._workers_lock:
+            return len(self._workers) - self._to_retire
+
     def submit(self, task: Callable, **kwargs):
         """Submit a callable and its kwargs for execution in one of the workers"""
         with self._shutdown_lock, _global_shutdown_lock:
@@ -64,58 +109,176 @@ class SotokiExecutor(queue.Queue):
             try:
                 self.put((task, kwargs), block=True, timeout=3.0)
             except queue.Full:
-                if self.no_more:
-                    break
+                if not self.alive:
+                    raise RuntimeError("executor died while submitting task") from None
             else:
                 break
 
+    def submit_batch(self, task: Callable, items: list, **kwargs):
+        """Submit a list of items to be processed by task in a single queue entry
+
+        task is called once per item (as `task(item=item)`), sequentially, in the
+        same worker. The queue entry (and its callback) is released once, after the
+        last item has been processed."""
+        self.submit(functools.partial(self._process_batch, task, items), **kwargs)
+
+    @staticmethod
+    def _process_batch(task: Callable, items: list):
+        for item in items:
+            try:
+                task(item=item)
+            except Exception:
+                # only failing item is logged, not the whole batch
+                item_id = item.get("Id") if isinstance(item, dict) else item
+                logger.error(f"Error processing {task} on item {item_id}")
+                raise
+
+    @classmethod
+    def describe(cls, func: Callable, kwargs: dict) -> str:
+        """task and its kwargs for logs ; only task and size of batches"""
+        if isinstance(func, functools.partial) and func.func == cls._process_batch:
+            task, items = func.args
+            return f"{task} on a batch of {len(items)} items"
+        return f"{func} with {kwargs=}"
+
+    def _put_stop(self):
+        """queue a poison pill, regardless of the queue being full"""
+        with self.not_full:
+            self._put(_STOP)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
     def start(self):
         """Enable executor, starting requested amount of workers
 
-        Workers are started always, not provisioned dynamicaly"""
+        Workers are started always. In adaptive mode, a monitor thread then adds
+        or retires workers (within bounds) depending on the load"""
         self.drain()
-        self.release_halt()
-        self._workers = set()
+        with self._workers_lock:
+            self._workers = set()
+            self._workers_created = 0
+            self._to_retire = 0
+            self._busy_seconds = 0.0
         self._shutdown = False
         self.exceptions[:] = []
 
-        for n in range(self.nb_workers):
-            t = threading.Thread(target=self.worker, name=f"{self.prefix}{n}")
+        for _ in range(self.nb_workers):
+            self.add_worker()
+
+        if self.adaptive:
+            self._monitor_stop.clear()
+            self._monitor = threading.Thread(
+                target=self.monitor, name=f"{self.prefix}monitor", daemon=True
+            )
+            self._monitor.start()
+
+    def add_worker(self):
+        """start an additional worker"""
+        with self._workers_lock:
+            t = threading.Thread(
+                target=self.worker, name=f"{self.prefix}{self._workers_created}"
+            )
             t.daemon = True
-            t.start()
+            self._workers_created += 1
             self._workers.add(t)
+        t.start()
 
-    def worker(self):
-        while self.alive or self.no_more:
-            try:
-                func, kwargs = self.get(block=True, timeout=2.0)
-            except queue.Empty:
-                if self.no_more:
-                    break
+    def retire_worker(self):
+        """request one worker to exit once done with its current task"""
+        with self._workers_lock:
+            self._to_retire += 1
+        self._put_stop()
+
+    def throttle(self, queue_size: int = 1):
+        """reduce admission: submit() blocks until less than queue_size are queued
+
+        In adaptive mode, extra workers are retired while throttled"""
+        with self.not_full:
+            self.maxsize = queue_size
+        self.throttled = True
+
+    def unthrottle(self):
+        """restore normal admission of tasks"""
+        with self.not_full:
+            self.maxsize = self.queue_size
+            self.not_full.notify_all()
+        self.throttled = False
+
+    def monitor(self):
+        """adjust number of workers based on queue depth and workers busy time
+
+        Adds a worker when the queue is mostly full while workers are busy (workers
+        are the bottleneck) and retires one when workers are mostly idle"""
+        last_busy, last_on = 0.0, time.monotonic()
+        while not self._monitor_stop.wait(timeout=adapt_every_sec):
+            if not self.alive:
+                break
+            now = time.monotonic()
+            with self._workers_lock:
+                busy = self._busy_seconds
+                nb_workers = len(self._workers) - self._to_retire
+            busy_ratio = (busy - last_busy) / max((now - last_on) * nb_workers, 1e-6)
+            fill_ratio = self.qsize() / self.maxsize if self.maxsize else 0
+            last_busy, last_on = busy, now
+
+            if self.throttled:
+                if nb_workers > self.nb_workers:
+                    self.retire_worker()
+                    logger.debug(
+                        f"{self.prefix} throttled down to {nb_workers - 1} workers"
+                    )
                 continue
-            except TypeError:
-                # received None from the queue. most likely shuting down
+
+            if fill_ratio >= scale_up_fill_ratio and busy_ratio >= scale_up_busy_ratio:
+                if nb_workers < self.max_workers:
+                    self.add_worker()
+                    logger.debug(
+                        f"{self.prefix} scaled up to {nb_workers + 1} workers "
+                        f"({fill_ratio=:.2f}, {busy_ratio=:.2f})"
+                    )
+            elif busy_ratio < scale_down_busy_ratio and nb_workers > self.nb_workers:
+                self.retire_worker()
+                logger.debug(
+                    f"{self.prefix} scaled down to {nb_workers - 1} workers "
+                    f"({fill_ratio=:.2f}, {busy_ratio=:.2f})"
+                )
+
+    def worker(self):
+        while True:
+            entry = self.get(block=True)
+            if entry is _STOP:
+                with self._workers_lock:
+                    self._to_retire = max(0, self._to_retire - 1)
+                    self._workers.discard(threading.current_thread())
+                self.task_done()
                 return
 
-            raises = kwargs.pop("raises") if "raises" in kwargs.keys() else False
-            callback = kwargs.pop("callback") if "callback" in kwargs.keys() else None
-            dont_release = kwargs.pop("dont_release", False)
+            func, kwargs = entry
+            raises = kwargs.pop("raises", False)
+            callback = kwargs.pop("callback", None)
 
+            # executor has been shut down. release entry without processing it
+            if not self.alive:
+                self.task_done()
+                continue
+
+            started_on = time.monotonic()
             try:
                 func(**kwargs)
             except Exception as exc:
-                logger.error(f"Error processing {func} with {kwargs=}")
+                logger.error(f"Error processing {self.describe(func, kwargs)}")
                 logger.exception(exc)
                 if raises:
                     self.exceptions.append(exc)
-                    self.shutdown()
+                    self.shutdown(wait=False)
             finally:
-                # user will manually release the queue for this task.
-                # most likely in a libzim-written callback
-                if not dont_release:
+                with self._workers_lock:
+                    self._busy_seconds += time.monotonic() - started_on
+                try:
+                    if callback:
+                        callback.__call__()
+                finally:
                     self.task_done()
-                if callback:
-                    callback.__call__()
 
     def drain(self):
         """Empty the queue without processing the tasks (tasks will be lost)"""
@@ -124,38 +287,48 @@ class SotokiExecutor(queue.Queue):
                 self.get_nowait()
             except queue.Empty:
                 break
+            self.task_done()
 
     def join(self):
-        """Await completion of workers, requesting them to stop taking new task"""
+        """Await completion of all submitted tasks then exit of all workers"""
         logger.debug(f"joining all threads for {self.prefix}")
-        self.no_more = True
-        for num, t in enumerate(self._workers):
-            deadline = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
-                seconds=thread_deadline_sec
-            )
-            logger.debug(f"Giving {self.prefix}{num} {thread_deadline_sec}s to join")
-            e = threading.Event()
-            while t.is_alive() and datetime.datetime.now(datetime.UTC) < deadline:
-                t.join(1)
-                e.wait(timeout=2)
-            if t.is_alive():
-                logger.debug(f"Thread {self.prefix}{num} is not joining. Skipping…")
-            else:
-                logger.debug(f"Thread {self.prefix}{num} joined")
-        logger.debug(f"all threads joined for {self.prefix}")
+        started_on = time.monotonic()
+
+        # stop resizing workers pool
+        self._monitor_stop.set()
+        if self._monitor:
+            self._monitor.join()
+            self._monitor = None
+
+        # barrier: every submitted entry has been processed (or drained)
+        super().join()
 
-    def release_halt(self):
-        """release the `no_more` flag preventing workers from taking up tasks"""
-        self.no_more = False
+        with self._workers_lock:
+            workers = list(self._workers)
+        for _ in workers:
+            self._put_stop()
+        for t in workers:
+            t.join()
+
+        logger.info(
+            f"All threads joined for {self.prefix} "
+            f"in {time.monotonic() - started_on:.2f}s"
+        )
 
     def shutdown(self, *, wait=True):
         """stop the executor, either somewhat immediately or awaiting completion"""
         logger.debug(f"shutting down executor {self.prefix} with {wait=}")
+        # pending tasks are processed (workers skip them once shut down)
+        if wait:
+            self.join()
         with self._shutdown_lock:
             self._shutdown = True
 
-            # Drain all work items from the queue
+            # Drain all work items from the queue and request workers to exit
             if not wait:
                 self.drain()
-        if wait:
-            self.join()
+                self._monitor_stop.set()
+                with self._workers_lock:
+                    nb_workers = len(self._workers)
+                for _ in range(nb_workers):
+                    self._put_stop()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import contextlib
+import gc
+import threading
+import time
+from dataclasses import dataclass
+
+from sotoki.utils.shared import logger
+
+# gen0 threshold during bulk steps. Default (2000) triggers very frequent young
+# collections while parsing/rendering millions of short-lived dicts
+bulk_threshold0 = 50_000
+
+
+@dataclass(kw_only=True)
+class GCStats:
+    nb_collections: int = 0
+    nb_collected: int = 0
+    pause: float = 0.0
+    max_pause: float = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.nb_collections} collections, {self.nb_collected} objects "
+            f"collected, {self.pause:.2f}s paused (max {self.max_pause * 1000:.1f}ms)"
+        )
+
+
+class GCPolicy:
+    """Garbage Collection tuned for our long bulk processing steps
+
+    - long-lived objects created during setup are frozen once, before first step,
+      so collections don't go over them again and again. Later objects are left
+      to the collector: freezing them would keep their cyclic garbage forever
+    - gen0 threshold is raised during steps ; older generations are collected
+      automatically, as per the interpreter's own heuristics
+    - GC pauses are recorded and reported per step"""
+
+    def __init__(self):
+        self.default_thresholds = gc.get_threshold()
+        self.current_step = "setup"
+        self.stats: dict[str, GCStats] = {}
+        self.lock = threading.Lock()
+        self._collect_started_on: float | None = None
+        self.frozen = False
+
+    def install(self):
+        """start recording collections"""
+        if self.on_gc not in gc.callbacks:
+            gc.callbacks.append(self.on_gc)
+
+    def uninstall(self):
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        gc.set_threshold(*self.default_thresholds)
+
+    def on_gc(self, phase: str, info: dict):
+        """gc.callbacks hook: record pause of each collection to current step"""
+        if phase == "start":
+            self._collect_started_on = time.perf_counter()
+            return
+        if self._collect_started_on is None:
+            return
+        pause = time.perf_counter() - self._collect_started_on
+        self._collect_started_on = None
+        with self.lock:
+            stats = self.stats.setdefault(self.current_step, GCStats())
+            stats.nb_collections += 1
+            stats.nb_collected += info.get("collected", 0)
+            stats.pause += pause
+            stats.max_pause = max(stats.max_pause, pause)
+
+    def freeze(self):
+        """move all currently tracked objects to permanent generation"""
+        gc.collect()
+        gc.freeze()
+        self.frozen = True
+        logger.debug(f"GC: {gc.get_freeze_count()} objects frozen")
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        """bulk processing step: freeze setup objects (once), raise threshold, report"""
+        if not self.frozen:
+            self.freeze()
+        self.current_step = name
+        gc.set_threshold(bulk_threshold0, *self.default_thresholds[1:])
+        try:
+            yield
+        finally:
+            gc.set_threshold(*self.default_thresholds)
+            logger.info(f"GC during {name} step: {self.stats.get(name, GCStats())}")
+            self.current_step = "idle"
+
+    def report(self):
+        """log GC stats for all steps"""
+        total = GCStats()
+        for name, stats in self.stats.items():
+            logger.debug(f"GC {name}: {stats}")
+            total.nb_collections += stats.nb_collections
+            total.nb_collected += stats.nb_collected
+            total.pause += stats.pause
+            total.max_pause = max(total.max_pause, stats.max_pause)
+        logger.info(f"GC overall: {total}")
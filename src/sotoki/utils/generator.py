@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 
+import functools
 import xml.sax.handler
 from abc import abstractmethod
+from collections.abc import Callable
 from pathlib import Path
 
+from sotoki.utils.paginator import Page, Paginator
 from sotoki.utils.shared import logger, shared
 
 
@@ -13,8 +16,19 @@ class Walker(xml.sax.handler.ContentHandler):
         self.processor = processor
 
 
+def estimate_size(item: dict) -> int:
+    """Cheap estimation of an item's size (in chars) from its top-level str values"""
+    return sum(len(value) for value in item.values() if isinstance(value, str))
+
+
 class Generator:
 
+    # number of items to group in a single executor task. 1 submits each item
+    # as its own task. Progress is reported once each task is processed
+    batch_size: int = 1
+    # submit a pending batch early once its items' estimated size exceeds this
+    batch_max_size: int | None = None
+
     @property
     @abstractmethod
     def walker(self) -> type[Walker]:
@@ -26,6 +40,8 @@ class Generator:
         pass
 
     def run(self):
+        self._batch: list[dict] = []
+        self._batch_size = 0
         shared.executor.start()
 
         # parse XML file. not using defusedxml for performances reasons.
@@ -40,27 +56,105 @@ class Generator:
                 parser.close()  # pyright: ignore[reportAttributeAccessIssue]
             except xml.sax.SAXException as exc:
                 logger.exception(exc)
+        # submit tail of items
+        self.submit_batch()
         logger.debug(f"Done parsing {type(self).__name__}, collecting workers…")
 
         # await offloaded processing
         shared.executor.join()
         logger.debug(f"{type(self).__name__} Workers collected.")
 
-        # ensure we commited tail of data
-        shared.database.commit(done=True)
+        # ensure tail of data is written (barrier)
+        shared.database.commit()
 
         if shared.executor.exception:
             raise shared.executor.exception
 
     def processor_callback(self, item):
-        shared.executor.submit(
-            self.processor, item=item, raises=True, dont_release=True
+        if self.batch_size <= 1:
+            shared.executor.submit(
+                self.processor,
+                item=item,
+                raises=True,
+                callback=functools.partial(shared.progresser.update, incr=True),
+            )
+            return
+
+        self._batch.append(item)
+        if self.batch_max_size:
+            self._batch_size += estimate_size(item)
+        if len(self._batch) >= self.batch_size or (
+            self.batch_max_size and self._batch_size >= self.batch_max_size
+        ):
+            self.submit_batch()
+
+    def submit_batch(self):
+        """submit pending items as a single executor task"""
+        if not self._batch:
+            return
+        items, self._batch, self._batch_size = self._batch, [], 0
+        shared.executor.submit_batch(
+            self.processor,
+            items=items,
+            raises=True,
+            callback=functools.partial(shared.progresser.update, incr=len(items)),
         )
 
+    @staticmethod
+    def add_page(
+        paginator: Paginator,
+        page_number: int,
+        path: str,
+        title: str,
+        render: Callable[[Page], str],
+    ):
+        """render a page of a paginated listing then add it to the ZIM
+
+        Rendering (database queries included) is lock-free: only adding to the ZIM
+        is serialized. First page is at path, others at {path}_page={number}"""
+        content = render(paginator.get_page(page_number))
+        with shared.lock:
+            # we don't index same-title page for all paginated pages
+            # instead we index the redirect to the first page
+            shared.creator.add_item_for(
+                path=path if page_number == 1 else f"{path}_page={page_number}",
+                content=content,
+                mimetype="text/html",
+                title=title if page_number == 1 else None,
+                is_front=page_number == 1,
+            )
+
+    @staticmethod
+    def add_first_page_redirect(path: str):
+        """{path}_page=1 redirect to first page of a paginated listing"""
+        with shared.lock:
+            shared.creator.add_redirect(
+                path=f"{path}_page=1", target_path=path, is_front=False
+            )
+
+    def submit_pages(
+        self, paginator: Paginator, path: str, title: str, render: Callable[[Page], str]
+    ):
+        """submit a task per page of a paginated listing (see add_page)"""
+        for page_number in paginator.page_range:
+            shared.executor.submit(
+                self.add_page,
+                paginator=paginator,
+                page_number=page_number,
+                path=path,
+                title=title,
+                render=render,
+                raises=True,
+            )
+        self.add_first_page_redirect(path)
+
+    @staticmethod
+    def join_tasks():
+        """await submitted tasks, raising the exception of a failed one"""
+        shared.executor.join()
+        if shared.executor.exception:
+            raise shared.executor.exception
+
     def processor(self, item):
         """to override: process item"""
         raise NotImplementedError()
-
-    def release(self):
-        shared.executor.task_done()
-        shared.progresser.update(incr=True)
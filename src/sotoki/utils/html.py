@@ -432,18 +432,25 @@ class Rewriter:
         #  - a/{aId}/
         #  - a/{aId}/{userId}
         #  - a/{aId}/{userId}/
-        # rewrite to a/{aId}
-        # we have a/{aId} redirect for all answer redirecting to questions/{qid}/{slug}
-        # so eventually this will lead to questions/{qid}/{slug}#{aid}
+        # rewrite to questions/{qid}/{slug}#{aid}, qid from answers index
         aid_m = self.aid_re.match(uri_path)
         if aid_m:
             aid = aid_m.groupdict().get("answer_id")
-            link["href"] = rebuild_uri(
-                uri=uri,
-                path=f"{to_root}a/{aid}",
-                fragment=aid,
-                failsafe=True,
-            ).geturl()
+            qid = shared.postsdatabase.get_answer_question_id(aid)
+            title = (
+                shared.postsdatabase.get_question_title_desc(qid)["title"]
+                if qid
+                else None
+            )
+            if not title:
+                del link.attrs["href"]
+            else:
+                link["href"] = rebuild_uri(
+                    uri=uri,
+                    path=f"{to_root}questions/{qid}/{get_slug_for(title)}",
+                    fragment=aid,
+                    failsafe=True,
+                ).geturl()
             return
 
         # link to user profile:
@@ -3,6 +3,7 @@
 import hashlib
 import io
 import re
+import threading
 import urllib.parse
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
@@ -67,6 +68,10 @@ class Imager:
         self.nb_done = 0
         self.filesDatabases: list[FileDatabase] = []
         self.hosts: dict[str, HostData] = {}
+        # protects handled, hosts and nb_* counters, updated from all workers
+        self.lock = threading.Lock()
+        # held by downloads while img_executor is throttled (memory pressure)
+        self.throttled_lock = threading.Lock()
 
     def abort(self):
         """request imager to cancel processing of futures"""
@@ -165,23 +170,25 @@ class Imager:
         if path is None:
             path = f"images/{digest}"
 
-        # do not add same image to process twice
-        if digest in self.handled:
-            return path
+        with self.lock:
+            # do not add same image to process twice
+            if digest in self.handled:
+                return path
 
-        # record that we are processing this one
-        self.handled.add(digest)
+            # record that we are processing this one
+            self.handled.add(digest)
 
-        self.nb_requested += 1
+            self.nb_requested += 1
 
-        if parsed_url.hostname not in self.hosts:
-            files_to_download = FileDatabase(parsed_url.hostname)
-            self.filesDatabases.append(files_to_download)
-            files_to_download.flush()
-            self.hosts[parsed_url.hostname] = HostData(
-                files_to_download=files_to_download
-            )
-        self.hosts[parsed_url.hostname].files_to_download.push(
+            if parsed_url.hostname not in self.hosts:
+                files_to_download = FileDatabase(parsed_url.hostname)
+                self.filesDatabases.append(files_to_download)
+                files_to_download.flush()
+                self.hosts[parsed_url.hostname] = HostData(
+                    files_to_download=files_to_download
+                )
+            host_data = self.hosts[parsed_url.hostname]
+        host_data.files_to_download.push(
             File(url=parsed_url.geturl(), zim_path=path, download_attempts=0)
         )
 
@@ -190,9 +197,16 @@ class Imager:
     def once_done(self):
         """default callback for single image processing"""
         # logger.debug("Once DONE")
-        self.nb_done += 1
+        with self.lock:
+            self.nb_done += 1
         shared.progresser.update(incr=1)
 
+    def once_failed(self, file: FileToDownload):
+        """record a file definitely failed to download"""
+        with self.lock:
+            file.host_data.download_failure += 1
+            self.nb_failed += 1
+
     def process_images(self):
         logger.info("Starting images download")
         for hostname, host_data in self.hosts.items():
@@ -265,7 +279,13 @@ class Imager:
                     next_file = self._get_next_file_to_download()
                 if next_file is None:
                     break
-                self.process_image(next_file)
+                # worker loops are long-running tasks, unaffected by admission
+                # throttling: downloads are serialized instead (see MemoryWatchdog)
+                if shared.img_executor.throttled:
+                    with self.throttled_lock:
+                        self.process_image(next_file)
+                else:
+                    self.process_image(next_file)
         except Exception:
             self.abort()
 
@@ -319,15 +339,13 @@ class Imager:
                     f"Error downloading file {file.url}, too many attempts failed, last"
                     f" one failed with '{err_details}', skipping"
                 )
-                file.host_data.download_failure += 1
-                self.nb_failed += 1
+                self.once_failed(file)
                 return
             if err_status_code == HTTPStatus.NOT_FOUND:
                 logger.warning(
                     f"Error downloading file {file.url}, received a 404, skipping"
                 )
-                file.host_data.download_failure += 1
-                self.nb_failed += 1
+                self.once_failed(file)
                 return
 
             if isinstance(exc, requests.HTTPError):
@@ -374,10 +392,10 @@ class Imager:
                 f"Error downloading file {file.url} due to '{exc}' exception, skipping",
                 exc_info=context.debug,
             )
-            file.host_data.download_failure += 1
-            self.nb_failed += 1
+            self.once_failed(file)
         else:
-            file.host_data.download_success += 1
+            with self.lock:
+                file.host_data.download_success += 1
 
     def download_image(self, file: FileToDownload):
         if self.aborted:
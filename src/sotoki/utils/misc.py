@@ -3,6 +3,7 @@
 import pathlib
 import platform
 import subprocess
+import sys
 import urllib.parse
 import zlib
 from functools import partial
@@ -26,6 +27,12 @@ def has_binary(name):
     )
 
 
+def is_gil_enabled() -> bool:
+    """whether the GIL is enabled (always, unless on a free-threaded build)"""
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_enabled() if is_enabled else True
+
+
 def get_short_hash(text: str) -> str:
     letters = ["E", "T", "A", "I", "N", "O", "S", "H", "R", "D"]
     return "".join([letters[int(x)] for x in str(zlib.adler32(text.encode("UTF-8")))])
@@ -55,7 +62,10 @@ def rebuild_uri(
         username = first(username, uri.username, "")
         password = first(password, uri.password, "")
         hostname = first(hostname, uri.hostname, "")
-        port = first(str(port), str(uri.port), "")
+        port = first(
+            None if port is None else str(port),
+            None if uri.port is None else str(uri.port),
+        )
         netloc = (
             f"{username}{':' if password else ''}{password}"
             f"{'@' if username or password else ''}{hostname}"
@@ -85,8 +95,8 @@ def rebuild_uri(
         raise exc
 
 
-def get_available_memory_from_cgroup() -> int | None:
-    """Available RAM in container if inside one, in bytes"""
+def get_memory_from_cgroup() -> tuple[int, int] | None:
+    """RAM limit and usage of container if inside one with a limit, in bytes"""
 
     # Retrieve mem for Docker limit (with the two paths possible depending
     # on Docker version, with priority for Docker >= 20)
@@ -96,7 +106,7 @@ def get_available_memory_from_cgroup() -> int | None:
             "/sys/fs/cgroup/memory/memory.limit_in_bytes"
         )
     cgroup_memory_usage_file = pathlib.Path("/sys/fs/cgroup/memory.current")
-    if not cgroup_memory_limit_file.exists():
+    if not cgroup_memory_usage_file.exists():
         cgroup_memory_usage_file = pathlib.Path(
             "/sys/fs/cgroup/memory/memory.usage_in_bytes"
         )
@@ -104,6 +114,9 @@ def get_available_memory_from_cgroup() -> int | None:
     if cgroup_memory_limit_file.exists() and cgroup_memory_usage_file.exists():
         try:
             mem_total_str = cgroup_memory_limit_file.read_text().strip()
+            # cgroup v2 without memory limit
+            if mem_total_str == "max":
+                return None
             if not mem_total_str.isdigit():
                 logger.warning(
                     f"Unexpected non-int value found in {cgroup_memory_limit_file}: "
@@ -115,16 +128,34 @@ def get_available_memory_from_cgroup() -> int | None:
             if not mem_used_str.isdigit():
                 logger.warning(
                     f"Unexpected non-int value found in {cgroup_memory_usage_file}: "
-                    f"{mem_total_str}"
+                    f"{mem_used_str}"
                 )
                 return
             mem_used = int(mem_used_str)
-            return mem_total - mem_used
+            return mem_total, mem_used
         except ValueError:
             logger.exception("Unexpected conversion error while getting memory")
         return None
 
 
+def get_available_memory_from_cgroup() -> int | None:
+    """Available RAM in container if inside one, in bytes"""
+    memory = get_memory_from_cgroup()
+    if memory is None:
+        return None
+    mem_total, mem_used = memory
+    return mem_total - mem_used
+
+
+def get_memory_usage() -> tuple[int, int]:
+    """RAM total and used in system (container if inside one) in bytes"""
+    memory = get_memory_from_cgroup()
+    if memory is not None:
+        return memory
+    vmem = psutil.virtual_memory()
+    return vmem.total, vmem.total - vmem.available
+
+
 def get_available_memory():
     """Available RAM in system (container if inside one) in bytes"""
 
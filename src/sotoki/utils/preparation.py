@@ -12,6 +12,7 @@ import subprocess
 import xml.sax.saxutils
 
 from sotoki.constants import UTF8
+from sotoki.utils.database.columnar import ANSWERS_INDEX, AnswersIndexWriter
 from sotoki.utils.misc import get_available_memory, has_binary
 from sotoki.utils.shared import logger
 
@@ -442,6 +443,8 @@ def add_post_names_to_links(
 class PostsAnswersLinksMerger:
     """merge <answers /> from answers file and <links /> from links file into posts
 
+    Also writes the answers index (question id of each answer) to answers_index_dst
+
     Factored as a multi-methods class in order to lower code complexity"""
 
     def __init__(
@@ -451,6 +454,7 @@ class PostsAnswersLinksMerger:
         answers_src: pathlib.Path,
         links_src: pathlib.Path,
         dst: pathlib.Path,
+        answers_index_dst: pathlib.Path,
         delete_src: bool = False,
     ):
         self.files = {
@@ -464,8 +468,10 @@ class PostsAnswersLinksMerger:
         self.indexes = {
             "id": get_index_in(questions_src, "Id"),
             "parent_id": get_index_in(answers_src, "ParentId"),
+            "answer_id": get_index_in(answers_src, "Id"),
             "post_id": get_index_in(links_src, "PostId"),
         }
+        self.answers_index = AnswersIndexWriter(answers_index_dst)
         self.open_files()
 
         # write header to dest
@@ -475,6 +481,7 @@ class PostsAnswersLinksMerger:
         self.handlers["dst"].write(b"</root>")
 
         self.release_files(delete_src)
+        self.answers_index.finalize().close()
 
     def write_lines(self):
         # read first lines of answers and links
@@ -498,6 +505,14 @@ class PostsAnswersLinksMerger:
                     has_answers = True
 
                 self.handlers["dst"].write(current_answer[1][0:-1])  # skip CRLF
+                self.answers_index.add(
+                    get_id_in(
+                        current_answer[1],
+                        self.indexes["answer_id"],
+                        within=get_within_chars(39, 2),
+                    ),
+                    post_id,
+                )
                 current_answer = self.read_line("answers")
             if has_answers:
                 self.handlers["dst"].write(b"</answers>")
@@ -542,6 +557,23 @@ class PostsAnswersLinksMerger:
                 self.files[key].unlink()
 
 
+def extract_answers_index(src: pathlib.Path, dst: pathlib.Path):
+    """write answers index (question id of each answer) from complete posts file
+
+    Only for posts prepared without it: index is written while merging posts"""
+    post_id_re = re.compile(rb'^<post Id="([0-9]+)"')
+    answer_id_re = re.compile(rb'<answer Id="([0-9]+)"')
+    answers_index = AnswersIndexWriter(dst)
+    with open(src, "rb") as srch:
+        for line in srch:
+            post_id_m = post_id_re.match(line)
+            if not post_id_m:
+                continue
+            for answer_id_m in answer_id_re.finditer(line):
+                answers_index.add(int(answer_id_m.group(1)), int(post_id_m.group(1)))
+    answers_index.finalize().close()
+
+
 def merge_users_with_badges(
     workdir: pathlib.Path, *, delete_src: bool = False
 ) -> pathlib.Path:
@@ -699,6 +731,7 @@ def merge_posts_with_answers_comments(
         answers_src=posts_com_answers_sorted,
         links_src=postlinks_named_sorted,
         dst=posts_complete,
+        answers_index_dst=workdir / ANSWERS_INDEX,
         delete_src=delete_src,
     )
 
@@ -2,15 +2,19 @@
 
 import datetime
 import json
+import threading
 from collections import OrderedDict, namedtuple
-from typing import ClassVar
+from collections.abc import Callable
+from typing import Any, ClassVar
 
-from sotoki.context import Context
-from sotoki.utils.shared import logger
+from sotoki.utils.shared import context, logger
 
 
 class Progresser:
 
+    # minimum interval between two writes of JSON progress file on updates
+    json_every_seconds = 5
+
     PREPARATION_STEP = "prep"
     TAGS_METADATA_STEP = "tags_meta"
     QUESTIONS_METADATA_STEP = "questions_meta"
@@ -69,16 +73,39 @@ class Progresser:
         }
 
         self.last_print_on = datetime.datetime.now(datetime.UTC)
+        self.last_json_on = self.last_print_on
+
+        # updates come from all workers concurrently: lock only protects counters,
+        # logging and JSON file writes are done outside of it
+        self.lock = threading.RLock()
+        # serializes JSON progress file writes
+        self.json_lock = threading.Lock()
+
+        # one-line usage reports (caches, database) logged along progress
+        self.reporters: list[Callable[[], str]] = []
+
+        # detailed reports (database memory…) added to JSON progress file, by name
+        self.reports: dict[str, dict[str, Any]] = {}
 
     def update_json(self):
         """Update JSON progress file if such a file was requested"""
-        if not Context.stats_filename:
+        if not context.stats_filename:
             return
-        with open(Context.stats_filename, "w") as fh:
-            json.dump(
-                {"done": round(self.overall_progress * 100, 2), "total": 100},
-                fh,
-            )
+        with self.lock:
+            content = {
+                "done": round(self.overall_progress * 100, 2),
+                "total": 100,
+                **self.reports,
+            }
+            self.last_json_on = datetime.datetime.now(datetime.UTC)
+        with self.json_lock, open(context.stats_filename, "w") as fh:
+            json.dump(content, fh)
+
+    def add_report(self, name: str, key: str, report: dict[str, Any]):
+        """record report as key of named section in JSON progress file"""
+        with self.lock:
+            self.reports.setdefault(name, {})[key] = report
+        self.update_json()
 
     def update(
         self,
@@ -92,39 +119,56 @@ class Progresser:
         set nb_done or nb_total to an arbitrary value
         or increment nb_done by any number"""
 
-        # record we received an update
-        self.current_step_updates += 1
-
-        if nb_done is not None:
-            self.current_step_progress = nb_done
-        elif incr is not None:
-            self.current_step_progress += int(incr)
-        if nb_total is not None:
-            self.current_step_total = nb_total
-
-        self.update_json()
+        with self.lock:
+            # record we received an update
+            self.current_step_updates += 1
+
+            if nb_done is not None:
+                self.current_step_progress = nb_done
+            elif incr is not None:
+                self.current_step_progress += int(incr)
+            if nb_total is not None:
+                self.current_step_total = nb_total
+
+            now = datetime.datetime.now(datetime.UTC)
+            print_due = (
+                self.current_step_updates % self.print_every_updates == 0
+                or self.last_print_on
+                + datetime.timedelta(seconds=self.print_every_seconds)
+                < now
+            )
+            json_due = (
+                bool(context.stats_filename)
+                and self.last_json_on
+                + datetime.timedelta(seconds=self.json_every_seconds)
+                < now
+            )
+            # claim those so concurrent updates don't repeat them
+            if print_due:
+                self.last_print_on = now
+            if json_due:
+                self.last_json_on = now
 
-        self.print_maybe()
+        if print_due:
+            self.print()
+        elif json_due:
+            self.update_json()
 
     def print(self):
-        """log current progress state"""
-
-        msg = (
-            f"PROGRESS: {self.overall_progress * 100:.1f}% – "  # noqa: RUF001
-            f"Step {self.current_step_index + 1}/{len(self.STEPS)}: "
-            f"{self.current_step.title()} -- "
-            f"{self.current_step_progress}/{self.current_step_total}"
-        )
+        """log current progress state (and update JSON progress file)"""
+
+        with self.lock:
+            msg = (
+                f"PROGRESS: {self.overall_progress * 100:.1f}% – "  # noqa: RUF001
+                f"Step {self.current_step_index + 1}/{len(self.STEPS)}: "
+                f"{self.current_step.title()} -- "
+                f"{self.current_step_progress}/{self.current_step_total}"
+            )
+            self.last_print_on = datetime.datetime.now(datetime.UTC)
         logger.info(msg)
-        self.last_print_on = datetime.datetime.now(datetime.UTC)
-
-    def print_maybe(self):
-        if (
-            self.current_step_updates % self.print_every_updates == 0
-            or self.last_print_on + datetime.timedelta(seconds=self.print_every_seconds)
-            < datetime.datetime.now(datetime.UTC)
-        ):
-            self.print()
+        for reporter in self.reporters:
+            logger.info(f"STATS: {reporter()}")
+        self.update_json()
 
     def start(self, step: str, nb_total: int = 0):
         """start a new step. Considers previous steps as completed.
@@ -144,11 +188,12 @@ class Progresser:
             ]
         )
 
-        self.current_step = step
-        self.current_step_index = step_index
-        self.current_step_total = nb_total
-        self.current_step_progress = 0
-        self.current_step_updates = 0
+        with self.lock:
+            self.current_step = step
+            self.current_step_index = step_index
+            self.current_step_total = nb_total
+            self.current_step_progress = 0
+            self.current_step_updates = 0
         self.print()
 
     def weight_for(self, step: str) -> float:
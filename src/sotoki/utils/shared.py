@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 
-import gc
 import pathlib
 import threading
 from threading import Lock
@@ -14,11 +13,12 @@ from sotoki.context import Context
 if TYPE_CHECKING:
     from sotoki.models import SiteDetails
     from sotoki.renderer import Renderer
+    from sotoki.utils.database.base import Database
     from sotoki.utils.database.posts import PostsDatabase
-    from sotoki.utils.database.redisdb import RedisDatabase
     from sotoki.utils.database.tags import TagsDatabase
     from sotoki.utils.database.users import UsersDatabase
     from sotoki.utils.executor import SotokiExecutor
+    from sotoki.utils.gcpolicy import GCPolicy
     from sotoki.utils.html import Rewriter
     from sotoki.utils.imager import Imager
     from sotoki.utils.progress import Progresser
@@ -32,13 +32,14 @@ class Shared:
 
     creator: Creator
     progresser: Progresser
-    database: RedisDatabase
+    database: Database
     tagsdatabase: TagsDatabase
     usersdatabase: UsersDatabase
     postsdatabase: PostsDatabase
     executor: SotokiExecutor
     img_executor: SotokiExecutor
     imager: Imager
+    gc_policy: GCPolicy
     rewriter: Rewriter
     renderer: Renderer
     site_details: SiteDetails
@@ -56,9 +57,5 @@ class Shared:
     # lock for operations needing synchronization
     lock = threading.Lock()
 
-    @staticmethod
-    def collect():
-        logger.debug(f"Collecting {gc.get_count()}… {gc.collect()} collected.")
-
 
 shared = Shared()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import array
+import collections
+import heapq
+import itertools
+import threading
+from collections.abc import Hashable
+from typing import Any
+
+
+class TopDict(collections.UserDict):
+    """A fixed-sized dict that keeps only the highest values
+
+    Entries are also kept in a min-heap of (value, order, key) so that the lowest
+    value is found and evicted in O(log n) instead of scanning the dict.
+    Updated or deleted keys leave their previous entry in the heap: it is skipped
+    once it reaches the top (lazy deletion) and the heap is compacted when such
+    stale entries outnumber live ones.
+
+    On equal values, most recently set keys are kept."""
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+        self.heap: list[tuple[Any, int, Hashable]] = []
+        # insertion order of the live heap entry of each key
+        self.orders: dict[Hashable, int] = {}
+        self.counter = itertools.count()
+        super().__init__()
+
+    def _is_live(self, entry: tuple[Any, int, Hashable]) -> bool:
+        return self.orders.get(entry[2]) == entry[1]
+
+    def _min_entry(self) -> tuple[Any, int, Hashable]:
+        """heap entry of lowest value, discarding stale ones on top"""
+        while not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def _compact(self):
+        self.heap = [entry for entry in self.heap if self._is_live(entry)]
+        heapq.heapify(self.heap)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            # we're full, might not accept value
+            if key not in self.data and len(self.data) >= self.maxlen:
+                min_value, _, min_key = self._min_entry()
+                # value is bellow our min, don't care
+                if value < min_value:
+                    return
+
+                # value should be in top, let's remove our min to allow it
+                heapq.heappop(self.heap)
+                del self.data[min_key]
+                del self.orders[min_key]
+
+            order = next(self.counter)
+            self.data[key] = value
+            self.orders[key] = order
+            heapq.heappush(self.heap, (value, order, key))
+            if len(self.heap) > 2 * max(len(self.data), 1):
+                self._compact()
+
+    def __delitem__(self, key):
+        with self.lock:
+            del self.data[key]
+            del self.orders[key]
+
+    def sorted(self):
+        with self.lock:
+            items = list(self.items())
+        return [k for k, _ in sorted(items, key=lambda x: x[1], reverse=True)]
+
+
+# ids are packed ordered as their decimal string (see id_key()), as Redis orders
+# members of equal score, in 37 bits: score then has to fit in 27 bits (signed)
+ID_DIGITS = 10
+ID_KEY_BITS = 37
+ID_KEY_MASK = (1 << ID_KEY_BITS) - 1
+
+
+def id_key(item_id: int) -> int:
+    """int ordered as str(item_id) is: zero-padded digits then number of digits"""
+    digits = str(item_id)
+    return int(digits.ljust(ID_DIGITS, "0")) * 10 + len(digits) - 1
+
+
+def pack_entry(score: int, item_id: int) -> int:
+    """(score, id) as a single int64, ordered by score then id as a string
+
+    score must fit in an int27 and id in a uint32"""
+    return (score << ID_KEY_BITS) | id_key(item_id)
+
+
+def unpack_entry(entry: int) -> tuple[int, int]:
+    """(score, id) packed with pack_entry()"""
+    key = entry & ID_KEY_MASK
+    nb_digits = key % 10 + 1
+    return entry >> ID_KEY_BITS, int(str(key // 10).zfill(ID_DIGITS)[:nb_digits])
+
+
+class TopIds:
+    """Fixed-size tops of ids by score, per key (tag name)
+
+    Each top is a min-heap of packed (score, id) int64 in an array: 8B per entry
+    instead of a tuple of Python ints (~100B). Tops only become heaps once full:
+    until then, entries are appended. Once full, an entry not above the lowest one
+    is rejected in O(1) and others replace it in O(log n).
+
+    On equal scores, ids kept are those Redis would keep trimming a sorted set by
+    rank: highest as strings ("9" over "10"), members being compared as such."""
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.tops: dict[str, array.array] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tops)
+
+    def add(self, key: str, score: int, item_id: int):
+        entry = pack_entry(score, item_id)
+        with self.lock:
+            top = self.tops.get(key)
+            if top is None:
+                top = self.tops[key] = array.array("q")
+            if len(top) < self.maxlen:
+                top.append(entry)
+                if len(top) == self.maxlen:
+                    entries = top.tolist()
+                    heapq.heapify(entries)
+                    self.tops[key] = array.array("q", entries)
+            elif entry > top[0]:
+                self._replace_min(top, entry)
+
+    @staticmethod
+    def _replace_min(heap: array.array, entry: int):
+        """replace lowest entry of heap with entry, sifting it down into place"""
+        size = len(heap)
+        pos = 0
+        child = 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[child] >= entry:
+                break
+            heap[pos] = heap[child]
+            pos = child
+            child = 2 * pos + 1
+        heap[pos] = entry
+
+    def pop(self, key: str) -> dict[int, int]:
+        """remove top of key, returned as {id: score}"""
+        with self.lock:
+            top = self.tops.pop(key, None)
+        if top is None:
+            return {}
+        return {item_id: score for score, item_id in map(unpack_entry, top)}
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+import threading
+from dataclasses import dataclass
+
+import psutil
+
+from sotoki.constants import (
+    MEMORY_HIGH_WATERMARK,
+    MEMORY_LOW_WATERMARK,
+    MEMORY_WATCHDOG_INTERVAL,
+)
+from sotoki.utils.executor import SotokiExecutor
+from sotoki.utils.misc import get_memory_usage
+from sotoki.utils.shared import logger, shared
+
+
+def format_size(size: int | None) -> str:
+    return "n/a" if size is None else f"{size / 2**20:,.0f}MiB"
+
+
+@dataclass(kw_only=True)
+class MemorySample:
+    total: int
+    used: int
+    rss: int
+    # memory used by database server (not accounted in rss)
+    database: int | None = None
+
+    @property
+    def ratio(self) -> float:
+        return self.used / self.total if self.total else 0.0
+
+    def __str__(self):
+        return (
+            f"used={format_size(self.used)}/{format_size(self.total)} "
+            f"({self.ratio:.0%}), scraper={format_size(self.rss)}, "
+            f"database={format_size(self.database)}"
+        )
+
+
+class MemoryWatchdog:
+    """Throttles executors while memory usage is above high-water mark
+
+    Samples system (container if inside one) memory usage, scraper RSS and database
+    server (Redis) used memory. Above high_watermark, executors admission is reduced
+    (images downloads are serialized, see Imager.worker_loop) and the database
+    writer is requested to flush (releasing buffered commands).
+    Normal admission resumes once usage is below low_watermark"""
+
+    def __init__(
+        self,
+        executors: list[SotokiExecutor],
+        interval: float = MEMORY_WATCHDOG_INTERVAL,
+        high_watermark: float = MEMORY_HIGH_WATERMARK,
+        low_watermark: float = MEMORY_LOW_WATERMARK,
+    ):
+        self.executors = executors
+        self.interval = interval
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.throttling = False
+        self.nb_throttles = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self) -> MemorySample:
+        """current memory usage"""
+        total, used = get_memory_usage()
+        try:
+            database = shared.database.memory_usage()
+        except Exception:
+            database = None
+        return MemorySample(
+            total=total,
+            used=used,
+            rss=psutil.Process().memory_info().rss,
+            database=database,
+        )
+
+    def check(self):
+        """sample memory and throttle or resume executors accordingly"""
+        sample = self.sample()
+        if sample.ratio >= self.high_watermark:
+            if not self.throttling:
+                self.throttling = True
+                self.nb_throttles += 1
+                logger.warning(f"Memory above high-water mark, throttling: {sample}")
+                for executor in self.executors:
+                    executor.throttle()
+            # until back under control, flush database writes on every sample
+            shared.database.request_commit()
+        elif self.throttling and sample.ratio <= self.low_watermark:
+            self.throttling = False
+            logger.info(f"Memory below low-water mark, resuming: {sample}")
+            for executor in self.executors:
+                executor.unthrottle()
+
+    def run(self):
+        while not self._stop.wait(timeout=self.interval):
+            try:
+                self.check()
+            except Exception as exc:
+                logger.warning(f"Unable to check memory usage: {exc}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="memory-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """stop sampling, restoring executors admission if throttled"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self.throttling:
+            self.throttling = False
+            for executor in self.executors:
+                executor.unthrottle()
+        logger.debug(f"Memory watchdog stopped after {self.nb_throttles} throttle(s)")
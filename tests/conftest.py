@@ -1,8 +1,18 @@
 #!/usr/bin/env python
-"""Test configuration and fixtures for sotoki tests"""
+"""Test configuration and fixtures for sotoki tests
 
+Also provides synthetic Stack Exchange data and an offline `shared` setup, allowing
+to run generators without a dump, a Redis server or a ZIM creator: databases and
+creator are mocks, renderer and rewriter are the real ones. Benchmarks use those
+as well."""
+
+import datetime
 import tempfile
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+from xml.sax.saxutils import quoteattr
 
 # Initialize context BEFORE any other sotoki imports
 # This must happen at module import time, before pytest collects tests
@@ -18,3 +28,150 @@ Context.setup(
     output_dir=Path(tmpdir) / "output",
     tmp_dir=Path(tmpdir) / "build",
 )
+
+from sotoki.renderer import Renderer  # noqa: E402
+from sotoki.utils.gcpolicy import GCPolicy  # noqa: E402
+from sotoki.utils.html import Rewriter  # noqa: E402
+from sotoki.utils.progress import Progresser  # noqa: E402
+
+BODY = (
+    "<p>Some <strong>question</strong> or answer body, with <code>code</code> "
+    "and a <a href='https://example.com/page'>link</a>.</p>"
+    "<pre><code>for item in items:\n    print(item)</code></pre>"
+)
+
+
+def _attrs(**kwargs: Any) -> str:
+    return " ".join(f"{key}={quoteattr(str(value))}" for key, value in kwargs.items())
+
+
+def write_posts_complete(
+    fpath: Path, nb_questions: int, nb_answers: int = 3, nb_comments: int = 2
+):
+    """write a posts_complete.xml-like file with nb_questions questions"""
+    with open(fpath, "w", encoding="UTF-8") as fh:
+        fh.write('<?xml version="1.0" encoding="utf-8"?>\n<root>\n')
+        post_id = 0
+        for index in range(nb_questions):
+            post_id += 1
+            question_id = post_id
+            fh.write(
+                "<post "
+                + _attrs(
+                    Id=question_id,
+                    PostTypeId=1,
+                    CreationDate="2021-05-03T10:11:12.345",
+                    LastActivityDate="2021-06-03T10:11:12.345",
+                    Score=index % 50,
+                    ViewCount=index * 10,
+                    Body=BODY,
+                    OwnerUserId=index % 100,
+                    Title=f"How to do thing number {index}?",
+                    Tags="|python|threads|",
+                    AnswerCount=nb_answers,
+                    CommentCount=nb_comments,
+                    ContentLicense="CC BY-SA 4.0",
+                )
+                + ">\n<comments>\n"
+            )
+            for comment in range(nb_comments):
+                fh.write(
+                    "<comment "
+                    + _attrs(
+                        Id=question_id * 100 + comment,
+                        PostId=question_id,
+                        Score=comment,
+                        Text=f"Comment `{comment}` with **markdown**",
+                        CreationDate="2021-05-03T11:11:12.345",
+                        UserId=comment,
+                        ContentLicense="CC BY-SA 4.0",
+                    )
+                    + " />\n"
+                )
+            fh.write("</comments>\n<answers>\n")
+            for _ in range(nb_answers):
+                post_id += 1
+                fh.write(
+                    "<answer "
+                    + _attrs(
+                        Id=post_id,
+                        PostTypeId=2,
+                        ParentId=question_id,
+                        CreationDate="2021-05-04T10:11:12.345",
+                        Score=post_id % 10,
+                        Body=BODY,
+                        OwnerUserId=post_id % 100,
+                        ContentLicense="CC BY-SA 4.0",
+                    )
+                    + " />\n"
+                )
+            fh.write("</answers>\n</post>\n")
+        fh.write("</root>\n")
+
+
+def get_user(user_id: int) -> dict[str, Any]:
+    """user details as returned by UsersDatabase.get_user_full()"""
+    return {
+        "id": user_id,
+        "name": f"User {user_id}",
+        "rep": user_id * 10,
+        "nb_gold": 1,
+        "nb_silver": 2,
+        "nb_bronze": 3,
+    }
+
+
+def get_question_details(post_id: int, score: int | None = None) -> dict[str, Any]:
+    """question details as returned by PostsDatabase.get_question_details()"""
+    return {
+        "id": post_id,
+        "score": score,
+        "title": f"How to do thing with id {post_id}?",
+        "excerpt": "Some question or answer body, with code and a link.",
+        "creation_date": datetime.datetime(2021, 5, 3, 10, 11, 12, tzinfo=datetime.UTC),
+        "owner_user_id": post_id % 100,
+        "has_accepted": True,
+        "nb_answers": 3,
+        "tags": ["python", "threads"],
+    }
+
+
+def get_users(users_ids) -> dict[Any, dict[str, Any]]:
+    """users details as returned by UsersDatabase.get_users_full()"""
+    return {user_id: get_user(user_id) for user_id in users_ids}
+
+
+def setup_shared(build_dir: Path, setattr_: Callable[[str, Any], None]):
+    """set shared attributes needed to render posts, using setattr_(name, value)
+
+    Accepts a setter so tests can use monkeypatch while scripts set them directly"""
+    setattr_("build_dir", build_dir)
+    setattr_("online_domain", "test.stackexchange.com")
+    setattr_("creator", MagicMock())
+    setattr_("database", MagicMock())
+    setattr_("imager", MagicMock(defer=lambda url, path=None: path or url))
+    setattr_("tagsdatabase", MagicMock())
+    setattr_(
+        "usersdatabase", MagicMock(get_user_full=get_user, get_users_full=get_users)
+    )
+    setattr_(
+        "postsdatabase",
+        MagicMock(
+            get_questions_states=lambda post_ids: {
+                post_id: {"score": 1, "has_accepted": True} for post_id in post_ids
+            },
+            get_question_details=get_question_details,
+            # all questions are displayed in listings
+            is_listed=lambda _: True,
+        ),
+    )
+    setattr_(
+        "site_details",
+        MagicMock(
+            mathjax=False, highlight=False, header_html="", site_title="Test Site"
+        ),
+    )
+    setattr_("progresser", Progresser(nb_questions=0))
+    setattr_("gc_policy", GCPolicy())
+    setattr_("rewriter", Rewriter())
+    setattr_("renderer", Renderer())
@@ -0,0 +1,112 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from sotoki.constants import NB_QUESTIONS_PER_PAGE
+from sotoki.posts import PostGenerator
+from sotoki.utils.executor import SotokiExecutor
+from sotoki.utils.shared import context, shared
+from tests.conftest import setup_shared, write_posts_complete
+
+NB_QUESTIONS = 200
+NB_ANSWERS = 3
+
+
+@pytest.fixture
+def synthetic_dump(tmp_path, monkeypatch):
+    write_posts_complete(
+        tmp_path / "posts_complete.xml", NB_QUESTIONS, nb_answers=NB_ANSWERS
+    )
+    setup_shared(
+        tmp_path,
+        lambda name, value: monkeypatch.setattr(shared, name, value, raising=False),
+    )
+    return tmp_path
+
+
+@pytest.mark.usefixtures("synthetic_dump")
+@pytest.mark.parametrize("nb_threads", [1, 16])
+def test_post_generator_renders_all_questions(monkeypatch, nb_threads):
+    """PostGenerator renders every question, whatever the number of threads
+
+    Runs concurrently with 16 threads, which is only truly parallel on free-threaded
+    builds, where it ensures shared state is not corrupted"""
+    monkeypatch.setattr(
+        shared,
+        "executor",
+        SotokiExecutor(queue_size=2 * nb_threads, nb_workers=nb_threads),
+        raising=False,
+    )
+
+    PostGenerator().run()
+
+    assert shared.executor.exception is None
+    items = shared.creator.add_item_for.call_args_list
+    redirects = shared.creator.add_redirect.call_args_list
+    assert len(items) == NB_QUESTIONS
+    assert len({item.kwargs["path"] for item in items}) == NB_QUESTIONS
+    assert all("How to do thing number" in item.kwargs["content"] for item in items)
+    assert len(redirects) == NB_QUESTIONS * (1 + NB_ANSWERS)
+    assert shared.progresser.current_step_progress == NB_QUESTIONS
+    # list items of (all listed) questions are captured along their page
+    list_items = shared.postsdatabase.record_list_item.call_args_list
+    assert sorted(call.args[0] for call in list_items) == list(
+        range(1, NB_QUESTIONS * (1 + NB_ANSWERS), 1 + NB_ANSWERS)
+    )
+    assert all("question-summary" in call.args[1] for call in list_items)
+
+
+@pytest.mark.usefixtures("synthetic_dump")
+@pytest.mark.parametrize("without_answers_redirects", [False, True])
+def test_post_generator_adds_answers_redirects(monkeypatch, without_answers_redirects):
+    """a/{id} redirects for all answers are added unless opted out"""
+    monkeypatch.setattr(context, "without_answers_redirects", without_answers_redirects)
+    monkeypatch.setattr(
+        shared, "executor", SotokiExecutor(queue_size=2, nb_workers=1), raising=False
+    )
+
+    PostGenerator().run()
+
+    redirects = shared.creator.add_redirect.call_args_list
+    targets = {call.kwargs["path"]: call.kwargs["target_path"] for call in redirects}
+    if without_answers_redirects:
+        # questions/{id} redirects only: links to answers point to question pages
+        assert len(redirects) == NB_QUESTIONS
+        assert "a/2" not in targets
+    else:
+        assert len(redirects) == NB_QUESTIONS * (1 + NB_ANSWERS)
+        assert targets["a/2"] == targets["questions/1"]
+
+
+@pytest.mark.usefixtures("synthetic_dump")
+def test_questions_pages_are_rendered_in_workers(monkeypatch):
+    """questions listing pages are rendered by executor tasks, not the main thread"""
+    monkeypatch.setattr(
+        shared, "executor", SotokiExecutor(queue_size=4, nb_workers=2), raising=False
+    )
+    shared.database.get_set_count.return_value = 3 * NB_QUESTIONS_PER_PAGE
+    shared.database.query_set.side_effect = lambda _, start, num, **__: (
+        (str(post_id), 1) for post_id in range(start + 1, start + num + 1)
+    )
+    render = MagicMock(
+        side_effect=lambda page: f"{page.number}:{threading.current_thread().name}"
+    )
+    monkeypatch.setattr(shared.renderer, "get_all_questions_for_page", render)
+
+    PostGenerator().generate_questions_page()
+
+    items = {
+        call.kwargs["path"]: call.kwargs
+        for call in shared.creator.add_item_for.call_args_list
+    }
+    assert set(items) == {"questions", "questions_page=2", "questions_page=3"}
+    assert items["questions"]["title"] == "Highest Voted Questions"
+    assert items["questions_page=2"]["title"] is None
+    assert items["questions_page=3"]["content"].startswith("3:")
+    assert all(
+        threading.main_thread().name not in item["content"] for item in items.values()
+    )
+    shared.creator.add_redirect.assert_called_once_with(
+        path="questions_page=1", target_path="questions", is_front=False
+    )
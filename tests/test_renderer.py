@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from sotoki.renderer import Renderer
+from sotoki.utils.shared import context, shared
+from tests.conftest import get_question_details
+
+
+@pytest.fixture
+def tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(context, "tmp_dir", tmp_path)
+    monkeypatch.setattr(shared, "rewriter", MagicMock(), raising=False)
+    return tmp_path
+
+
+def test_templates_bytecode_is_cached(tmp_dir):
+    """all templates are compiled upfront and their bytecode kept in tmp_dir"""
+    renderer = Renderer()
+    nb_templates = len(renderer.env.list_templates())
+    assert not renderer.env.auto_reload
+    assert len(list((tmp_dir / "templates_bytecode").iterdir())) == nb_templates
+
+    # another renderer loads bytecode instead of compiling templates
+    renderer = Renderer()
+    renderer.env.compile = MagicMock(side_effect=AssertionError("compiled"))
+    renderer.env.cache.clear()
+    assert renderer.env.get_template("question.html")
+
+
+@pytest.fixture
+def renderer(tmp_dir, monkeypatch):  # noqa: ARG001
+    user = {"id": 1, "name": "Jane Doe", "rep": 12345, "nb_gold": 1, "nb_silver": 0}
+    usersdatabase = MagicMock(
+        get_user_full=MagicMock(side_effect=lambda user_id: dict(user, id=user_id))
+    )
+    monkeypatch.setattr(shared, "usersdatabase", usersdatabase, raising=False)
+    return Renderer()
+
+
+def test_user_card_matches_template(renderer):
+    """user_card() renders as including user_card.html with same user and time"""
+    included = renderer.env.from_string(
+        '{% with user=uid|user, action_time="asked " + when, action_from_now=False %}'
+        '{% include "user_card.html" %}{% endwith %}'
+    )
+    called = renderer.env.from_string('{{ user_card(uid, "asked " + when) }}')
+    for uid in (1, "deleted"):
+        if uid == "deleted":
+            shared.usersdatabase.get_user_full.side_effect = lambda _: None
+        variables = {"uid": uid, "when": "Jan 1 '21", "to_root": "../../"}
+        assert called.render(**variables) == included.render(**variables)
+
+
+def test_user_cards_are_cached(renderer):
+    """cached card is reused for other action times, per page depth"""
+    cache = renderer.enable_user_cards_cache(max_size=10)
+    template = renderer.env.from_string("{{ user_card(1, action) }}")
+
+    asked = template.render(action="asked today", to_root="../../")
+    edited = template.render(action="edited now", to_root="../../")
+    listed = template.render(action="asked today", to_root="./")
+
+    assert asked.replace("asked today", "edited now") == edited
+    assert 'href="./users/1/jane-doe"' in listed
+    assert shared.usersdatabase.get_user_full.call_count == 2
+    assert cache.hits == 1
+
+
+def test_user_cards_cache_normalizes_ids(renderer):
+    """ids read from XML (str) and from records (int) share cached cards"""
+    cache = renderer.enable_user_cards_cache(max_size=10)
+    template = renderer.env.from_string('{{ user_card(uid, "asked today") }}')
+
+    cards = [template.render(uid=uid, to_root="./") for uid in (1, "1", "deleted")]
+
+    assert cards[0] == cards[1]
+    assert "deleted" in cards[2]
+    assert len(cache) == 2
+    assert cache.hits == 1
+
+
+def test_questions_list_items_are_pre_rendered(renderer, monkeypatch):
+    """list items rendered during questions step are used as included in listings
+
+    Only questions without one are rendered"""
+    postsdatabase = MagicMock(
+        get_question_details=get_question_details,
+        get_questions_details=lambda questions: [
+            get_question_details(int(post_id), score) for post_id, score in questions
+        ],
+    )
+    monkeypatch.setattr(shared, "postsdatabase", postsdatabase, raising=False)
+    postsdatabase.get_list_items.return_value = [
+        renderer.get_question_list_item({"Id": 1, "Score": 5}),
+        None,
+    ]
+    included = renderer.env.from_string('{% include "question_list_item.html" %}')
+
+    items = renderer.get_questions_list_items([("1", 5), ("2", 3)], to_root="../../")
+
+    assert items == [
+        included.render(question=get_question_details(post_id, score), to_root="../../")
+        for post_id, score in ((1, 5), (2, 3))
+    ]
+    assert 'href="../../questions/tagged/python"' in items[0]
@@ -0,0 +1,35 @@
+import pytest
+
+from sotoki.utils.bitmap import IdsBitmap
+
+
+def test_membership_and_count():
+    bitmap = IdsBitmap()
+    bitmap.update([3, 8, 3, -1, 1_000_000, -1])
+
+    assert len(bitmap) == 4
+    assert all(value in bitmap for value in (3, 8, -1, 1_000_000))
+    assert not any(value in bitmap for value in (0, 4, 9, -2, 999_999, 10**9))
+    # one bit per id (plus growth margin)
+    assert len(bitmap.bits) <= 1_000_000 // 8 + 1 + IdsBitmap.grow_by
+
+
+def test_dump_and_load(tmp_path):
+    bitmap = IdsBitmap()
+    bitmap.update([-1, -5, 0, 7, 12345])
+    fpath = tmp_path / "ids.bin"
+    bitmap.dump(fpath)
+
+    loaded = IdsBitmap.load(fpath)
+
+    assert len(loaded) == 5
+    assert all(value in loaded for value in (-1, -5, 0, 7, 12345))
+    assert 12346 not in loaded
+    assert fpath.stat().st_size < 12345 // 8 + 64
+
+
+def test_load_rejects_other_files(tmp_path):
+    fpath = tmp_path / "ids.json"
+    fpath.write_text("[1, 2, 3, 4, 5, 6, 7, 8, 9]")
+    with pytest.raises(ValueError, match="Unsupported"):
+        IdsBitmap.load(fpath)
@@ -0,0 +1,110 @@
+import threading
+from unittest.mock import MagicMock
+
+from sotoki.utils.cache import MISSING, LRUCache
+from sotoki.utils.database.codec import user_codec
+from sotoki.utils.database.users import UsersDatabase
+from sotoki.utils.shared import shared
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache("test", max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # b is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+    assert len(cache) == 2
+
+
+def test_lru_caches_none():
+    cache = LRUCache("test", max_size=2)
+    cache.set("deleted", None)
+    assert cache.get("deleted") is None
+    assert cache.hits == 1
+
+
+def test_lru_is_bounded_across_threads():
+    cache = LRUCache("test", max_size=100)
+
+    def use(offset):
+        for key in range(offset, offset + 1000):
+            cache.set(key, key)
+            cache.get(key - 1)
+
+    threads = [threading.Thread(target=use, args=(i * 500,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 100
+    assert cache.hits + cache.misses == 8000
+
+
+def test_users_cache_only_fetches_misses(monkeypatch):
+    """cached users are not queried again and returned dicts are copies"""
+    requested = []
+
+    def get_records(records):
+        records = list(records)
+        requested.append([user_id for _, user_id in records])
+        return [
+            user_codec.encode((f"User {user_id}", 1, 0, 0, 0)) if user_id else None
+            for _, user_id in records
+        ]
+
+    monkeypatch.setattr(
+        shared, "database", MagicMock(get_records=get_records), raising=False
+    )
+    usersdb = UsersDatabase()
+    cache = usersdb.enable_cache()
+
+    users = usersdb.get_users_full([1, 2, 0])
+    assert users[0] is None
+    assert users[1] == {
+        "id": 1,
+        "name": "User 1",
+        "rep": 1,
+        "nb_gold": 0,
+        "nb_silver": 0,
+        "nb_bronze": 0,
+    }
+    usersdb.get_user_full(1)[
+        "slug"
+    ] = "user-1"  # pyright: ignore[reportOptionalSubscript]
+    users = usersdb.get_users_full([0, 1, 3])
+
+    assert "slug" not in users[1]  # pyright: ignore[reportOptionalOperand]
+    assert requested == [[1, 2, 0], [], [3]]
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+def test_users_cache_normalizes_ids(monkeypatch):
+    """ids read from XML (str) and from records (int) share cache entries"""
+    requested = []
+
+    def get_records(records):
+        records = list(records)
+        requested.extend(user_id for _, user_id in records)
+        return [
+            user_codec.encode((f"User {user_id}", 1, 0, 0, 0)) for _, user_id in records
+        ]
+
+    monkeypatch.setattr(
+        shared, "database", MagicMock(get_records=get_records), raising=False
+    )
+    usersdb = UsersDatabase()
+    cache = usersdb.enable_cache()
+
+    user = usersdb.get_user_full("1")
+    users = usersdb.get_users_full([1, "1"])
+
+    assert user == users[1] == users["1"]
+    assert users[1]["id"] == 1  # pyright: ignore[reportOptionalSubscript]
+    assert requested == ["1"]
+    assert len(cache) == 1
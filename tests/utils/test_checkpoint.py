@@ -0,0 +1,86 @@
+import pytest
+
+from sotoki.utils.checkpoint import Checkpoints
+from sotoki.utils.database.sqlitedb import SQLiteDatabase
+from sotoki.utils.exceptions import DatabaseError
+from sotoki.utils.progress import Progresser
+from sotoki.utils.shared import context, shared
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """SQLiteDatabase in a temporary build dir holding a dump file"""
+    monkeypatch.setattr(shared, "build_dir", tmp_path, raising=False)
+    (tmp_path / "posts_complete.xml").write_text("<posts />")
+    db = SQLiteDatabase(initialize=True)
+    monkeypatch.setattr(shared, "database", db, raising=False)
+    for flag in ("skip_tags_meta", "skip_questions_meta"):
+        monkeypatch.setattr(context, flag, False)
+    yield db
+    db.teardown()
+
+
+@pytest.fixture
+def checkpoints(database, tmp_path):
+    """checkpoints saved after tags metadata step, with data in database"""
+    database.pipe.set("tags", b"recorded")
+    checkpoints = Checkpoints(tmp_path / "checkpoint.json")
+    checkpoints.save(Progresser.TAGS_METADATA_STEP)
+    # not resumable
+    checkpoints.save(Progresser.USERS_STEP)
+    return checkpoints
+
+
+def test_resume_skips_completed_steps(database, checkpoints):
+    Checkpoints(checkpoints.fpath).resume()
+
+    assert context.skip_tags_meta
+    assert not context.skip_questions_meta
+    assert database.safe_get("tags") == b"recorded"
+
+
+def test_resume_starts_over_if_dumps_changed(database, checkpoints, tmp_path):
+    (tmp_path / "posts_complete.xml").write_text("<posts>updated</posts>")
+
+    Checkpoints(checkpoints.fpath).resume()
+
+    assert not context.skip_tags_meta
+    assert database.safe_get("tags") is None
+
+
+def test_resume_starts_over_if_options_changed(
+    database, checkpoints, tmp_path, monkeypatch
+):
+    """stale files of completed steps are removed along database content"""
+    (tmp_path / "questions").mkdir()
+    (tmp_path / "questions" / "index").write_bytes(b"")
+    (tmp_path / "tags_ids.json").write_text("{}")
+    monkeypatch.setattr(context, "without_images", not context.without_images)
+
+    Checkpoints(checkpoints.fpath).resume()
+
+    assert not context.skip_tags_meta
+    assert database.safe_get("tags") is None
+    assert not (tmp_path / "questions").exists()
+    assert not (tmp_path / "tags_ids.json").exists()
+    assert (tmp_path / "posts_complete.xml").exists()
+
+
+def test_resume_starts_over_if_database_changed(database, checkpoints):
+    database.pipe.set(Checkpoints.database_key, b"other")
+    database.commit()
+
+    assert Checkpoints(checkpoints.fpath).load() == []
+
+
+@pytest.mark.usefixtures("database")
+def test_resume_without_checkpoint(tmp_path):
+    Checkpoints(tmp_path / "checkpoint.json").resume()
+    assert not context.skip_tags_meta
+
+
+def test_resume_refused_without_persistence(database, checkpoints, monkeypatch):
+    monkeypatch.setattr(database, "is_persistent", lambda: False)
+    with pytest.raises(DatabaseError):
+        Checkpoints(checkpoints.fpath).resume()
+    assert not context.skip_tags_meta
@@ -0,0 +1,26 @@
+import pytest
+
+from sotoki.utils.database.codec import (
+    file_codec,
+    questions_stats_codec,
+    user_codec,
+)
+
+
+@pytest.mark.parametrize(
+    "codec, record",
+    [
+        (user_codec, ("Jöhn", -5, 1, 20, 300)),
+        (file_codec, ("https://i.sstatic.net/a.png?s=64", "images/a.webp", 2)),
+        (questions_stats_codec, (10, 5, 3, 1620000000)),
+    ],
+)
+def test_records_roundtrip(codec, record):
+    assert codec.decode(codec.encode(record)) == record
+
+
+def test_version_is_checked():
+    data = bytearray(user_codec.encode(("John", 1, 0, 0, 0)))
+    data[0] = 0xFF
+    with pytest.raises(ValueError, match="version"):
+        user_codec.decode(bytes(data))
@@ -0,0 +1,113 @@
+import pytest
+
+from sotoki.utils.database.columnar import (
+    AnswersIndexWriter,
+    ListItemsStore,
+    ListItemsStoreWriter,
+    QuestionsStore,
+    QuestionsStoreWriter,
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """store of a few questions, spread over several buffer flushes"""
+    monkeypatch.setattr(QuestionsStoreWriter, "buffer_rows", 2)
+    writer = QuestionsStoreWriter(tmp_path / "questions")
+    writer.add(12, 1620000000, 3, True, 2, [1, 5], "Title 12", "Excerpt 12")
+    writer.add(3, 1620000001, "Deleted Ünicode", False, 0, [], "Title 3", "")
+    writer.add(1000, 1620000002, None, False, 1, [7], "Title 1000", "Exc. 1000")
+    writer.add(12, 1620000003, 4, False, 0, [], "Duplicate", "ignored")
+    store = writer.finalize()
+    yield store
+    store.close()
+
+
+def test_questions_roundtrip(store):
+    assert len(store) == 4
+    assert store.get_question(12) == (1620000000, 3, True, 2, [1, 5])
+    assert store.get_question(3) == (1620000001, "Deleted Ünicode", False, 0, [])
+    assert store.get_question(1000) == (1620000002, None, False, 1, [7])
+    assert store.get_title_desc(12) == ("Title 12", "Excerpt 12")
+    assert store.get_title_desc("1000") == ("Title 1000", "Exc. 1000")
+    assert store.has_accepted(12)
+    assert not store.has_accepted(3)
+
+
+@pytest.mark.parametrize("post_id", [0, 4, 999, 1001, -1, "abc", None])
+def test_missing_questions(store, post_id):
+    assert post_id not in store
+    assert store.get_question(post_id) is None
+    assert store.get_title_desc(post_id) is None
+    assert not store.has_accepted(post_id)
+
+
+def test_reopened_store(store):
+    """store is read back from its files (as when resuming)"""
+    reopened = QuestionsStore(store.path)
+    assert QuestionsStore.exists(store.path)
+    assert reopened.get_question(3) == store.get_question(3)
+    reopened.close()
+
+
+def test_empty_store(tmp_path):
+    store = QuestionsStoreWriter(tmp_path / "questions").finalize()
+    assert len(store) == 0
+    assert store.get_title_desc(1) is None
+    store.close()
+
+
+def test_answers_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(AnswersIndexWriter, "buffer_pairs", 2)
+    writer = AnswersIndexWriter(tmp_path / "answers.idx")
+    for answer_id, question_id in ((2, 1), (3, 1), (12, 10), (5, 4)):
+        writer.add(answer_id, question_id)
+    index = writer.finalize()
+
+    assert len(index) == 13
+    assert index.get(3) == 1
+    assert index.get("12") == 10
+    assert index.get(5) == 4
+    # questions, unknown and invalid ids
+    assert index.get(1) is None
+    assert index.get(13) is None
+    assert index.get(-1) is None
+    assert index.get("john") is None
+    assert not (tmp_path / "answers.pairs").exists()
+    index.close()
+
+
+def test_answers_index_empty(tmp_path):
+    index = AnswersIndexWriter(tmp_path / "answers.idx").finalize()
+    assert len(index) == 0
+    assert index.get(1) is None
+    index.close()
+
+
+def test_list_items_roundtrip(tmp_path):
+    writer = ListItemsStoreWriter(tmp_path / "list_items")
+    for item_id, blob in ((7, b"seven"), (3, b""), (42, b"forty-two")):
+        writer.add(item_id, blob)
+    store = writer.finalize()
+
+    assert len(store) == 3
+    assert store.get(7) == b"seven"
+    assert store.get("42") == b"forty-two"
+    assert store.get(3) == b""
+    # missing, out of index and invalid ids
+    assert store.get(8) is None
+    assert store.get(43) is None
+    assert store.get("john") is None
+    store.close()
+
+    # reopened from files
+    store = ListItemsStore(tmp_path / "list_items")
+    assert store.get(7) == b"seven"
+    store.close()
+
+
+def test_list_items_empty(tmp_path):
+    store = ListItemsStoreWriter(tmp_path / "list_items").finalize()
+    assert len(store) == 0
+    assert store.get(1) is None
+    store.close()
@@ -0,0 +1,181 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from sotoki.utils.executor import SotokiExecutor
+
+
+def test_submit_processes_each_task():
+    """submit() runs every task once"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=2)
+    executor.start()
+    seen = []
+    lock = threading.Lock()
+
+    def task(item):
+        with lock:
+            seen.append(item)
+
+    for index in range(20):
+        executor.submit(task, item=index)
+    executor.join()
+
+    assert sorted(seen) == list(range(20))
+    assert executor.exception is None
+
+
+def test_shutdown_awaits_pending_tasks():
+    """shutdown() processes tasks still in queue before stopping"""
+    executor = SotokiExecutor(queue_size=20, nb_workers=1)
+    executor.start()
+    seen = []
+
+    def task(item):
+        time.sleep(0.01)
+        seen.append(item)
+
+    for index in range(10):
+        executor.submit(task, item=index)
+    executor.shutdown()
+
+    assert seen == list(range(10))
+    assert not executor.alive
+
+
+def test_submit_batch_processes_items_in_order():
+    """submit_batch() calls task for each item, sequentially, in a single entry"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=1)
+    executor.start()
+    seen = []
+    callback = MagicMock()
+
+    def task(item):
+        seen.append(item)
+
+    executor.submit_batch(task, items=[1, 2, 3], callback=callback)
+    executor.join()
+
+    assert seen == [1, 2, 3]
+    callback.assert_called_once()
+
+
+def test_add_and_retire_workers():
+    """add_worker() and retire_worker() adjust the number of active workers"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=1, max_workers=3)
+    assert executor.adaptive
+    executor.start()
+    executor.add_worker()
+    assert executor.nb_active_workers == 2
+    executor.retire_worker()
+    assert executor.nb_active_workers == 1
+    executor.join()
+
+
+def test_submit_batch_records_exception():
+    """submit_batch() failure is recorded and shuts executor down"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=2)
+    executor.start()
+
+    def task(item):
+        raise ValueError(item)
+
+    executor.submit_batch(task, items=["boom"], raises=True)
+    executor.join()
+
+    assert isinstance(executor.exception, ValueError)
+    assert not executor.alive
+
+
+def test_submit_batch_logs_failing_item_only(monkeypatch):
+    """batch failure logs id of failing item and size of batch, not its items"""
+    logger = MagicMock()
+    monkeypatch.setattr("sotoki.utils.executor.logger", logger)
+    executor = SotokiExecutor(queue_size=5, nb_workers=1)
+    executor.start()
+
+    def task(item):
+        if item["Id"] == 2:
+            raise ValueError(item)
+
+    items = [{"Id": post_id, "Body": "x" * 100} for post_id in range(1, 4)]
+    executor.submit_batch(task, items=items, raises=True)
+    executor.join()
+
+    errors = [call.args[0] for call in logger.error.call_args_list]
+    assert len(errors) == 2
+    assert errors[0].endswith("on item 2")
+    assert errors[1].endswith("on a batch of 3 items")
+    assert all("Body" not in error for error in errors)
+
+
+def test_join_waits_for_slow_tasks():
+    """join() is a barrier: it returns only once every task completed"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=2)
+    executor.start()
+    done = []
+
+    def task(item):
+        time.sleep(0.2)
+        done.append(item)
+
+    for index in range(6):
+        executor.submit(task, item=index)
+    executor.join()
+
+    assert sorted(done) == list(range(6))
+    assert executor.nb_active_workers == 0
+
+
+def test_executor_can_restart_after_join():
+    """executor can be started again after a join() for a subsequent step"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=2)
+    done = []
+
+    def task(item):
+        done.append(item)
+
+    for step in range(2):
+        executor.start()
+        executor.submit(task, item=step)
+        executor.join()
+    assert done == [0, 1]
+
+
+def test_throttle_reduces_admission():
+    """throttle() shrinks queue size until unthrottle()"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=1)
+    executor.throttle()
+    assert executor.throttled
+    assert executor.maxsize == 1
+    executor.unthrottle()
+    assert not executor.throttled
+    assert executor.maxsize == 5
+
+
+def test_throttle_releases_blocked_submit():
+    """a submit() blocked by throttling proceeds once unthrottled"""
+    executor = SotokiExecutor(queue_size=5, nb_workers=1)
+    executor.start()
+    release = threading.Event()
+    done = []
+
+    def task(item):
+        release.wait()
+        done.append(item)
+
+    executor.throttle()
+    executor.submit(task, item=0)  # picked by worker
+    executor.submit(task, item=1)  # fills throttled queue
+    submitter = threading.Thread(
+        target=executor.submit, args=(task,), kwargs={"item": 2}
+    )
+    submitter.start()
+    submitter.join(timeout=0.2)
+    assert submitter.is_alive()
+
+    executor.unthrottle()
+    submitter.join(timeout=1)
+    assert not submitter.is_alive()
+    release.set()
+    executor.join()
+    assert sorted(done) == [0, 1, 2]
@@ -0,0 +1,50 @@
+import gc
+
+import pytest
+
+from sotoki.utils import gcpolicy
+from sotoki.utils.gcpolicy import GCPolicy
+
+
+@pytest.fixture
+def policy():
+    policy = GCPolicy()
+    policy.install()
+    yield policy
+    policy.uninstall()
+    gc.unfreeze()
+
+
+def test_step_raises_threshold_then_restores_it(policy):
+    """gen0 threshold is raised during a step only"""
+    default = gc.get_threshold()
+    with policy.step("bulk"):
+        assert gc.get_threshold()[0] == gcpolicy.bulk_threshold0
+        assert policy.current_step == "bulk"
+    assert gc.get_threshold() == default
+
+
+def test_step_records_collections_pauses(policy):
+    """collections happening during a step are recorded to that step"""
+    with policy.step("bulk"):
+        gc.collect()
+    stats = policy.stats["bulk"]
+    assert stats.nb_collections >= 1
+    assert stats.pause >= stats.max_pause > 0
+
+
+def test_step_freezes_existing_objects(policy):
+    """objects existing before the step are moved to permanent generation"""
+    with policy.step("bulk"):
+        assert gc.get_freeze_count() > 0
+
+
+def test_freeze_happens_once(policy):
+    """objects created after first step are left to the collector"""
+    with policy.step("first"):
+        pass
+    nb_frozen = gc.get_freeze_count()
+    garbage = [[index] for index in range(1000)]
+    with policy.step("second"):
+        assert gc.get_freeze_count() == nb_frozen
+    del garbage
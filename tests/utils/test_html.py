@@ -256,3 +256,35 @@ class TestRewriteUserProfileLinks:
             '<a href="/users/43968/reid-evans">reid-evans</a>', to_root=""
         )
         assert "href=" not in result
+
+
+class TestRewriteAnswerLinks:
+    """Links to answers point to their question page, found in answers index"""
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, monkeypatch):
+        monkeypatch.setattr(shared, "online_domain", "example.com", raising=False)
+        monkeypatch.setattr(
+            shared, "site_details", MagicMock(highlight=False), raising=False
+        )
+        answers = {"12": 10}
+        monkeypatch.setattr(
+            shared,
+            "postsdatabase",
+            MagicMock(
+                get_answer_question_id=answers.get,
+                get_question_title_desc=lambda _: {"title": "How to test?"},
+            ),
+            raising=False,
+        )
+        self.rewriter = Rewriter()
+
+    def test_answer_link_to_question(self):
+        result = self.rewriter.rewrite(
+            '<a href="https://example.com/a/12/3">answer</a>', to_root="../"
+        )
+        assert 'href="../questions/10/how-to-test#12"' in result
+
+    def test_unknown_answer_link_removed(self):
+        result = self.rewriter.rewrite('<a href="/a/13">answer</a>', to_root="")
+        assert "href=" not in result
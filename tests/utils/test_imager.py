@@ -0,0 +1,44 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from sotoki.utils.imager import Imager
+from sotoki.utils.shared import shared
+
+NB_WORKERS = 4
+
+
+@pytest.mark.parametrize("throttled, max_concurrent", [(False, NB_WORKERS), (True, 1)])
+def test_worker_loops_serialize_downloads_when_throttled(
+    monkeypatch, throttled, max_concurrent
+):
+    """throttled img_executor limits running worker loops to a single download"""
+    monkeypatch.setattr(
+        shared, "img_executor", MagicMock(throttled=throttled), raising=False
+    )
+    imager = Imager()
+    files = iter(range(4 * NB_WORKERS))
+    imager._get_next_file_to_download = lambda: next(files, None)
+    lock = threading.Lock()
+    running, concurrent = [], []
+
+    def process_image(file):
+        with lock:
+            running.append(file)
+            concurrent.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(file)
+
+    imager.process_image = process_image
+    threads = [threading.Thread(target=imager.worker_loop) for _ in range(NB_WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(concurrent) == 4 * NB_WORKERS
+    assert max(concurrent) <= max_concurrent
+    assert not imager.aborted
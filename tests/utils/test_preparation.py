@@ -0,0 +1,70 @@
+from sotoki.utils.database.columnar import AnswersIndex
+from sotoki.utils.preparation import PostsAnswersLinksMerger, extract_answers_index
+
+
+def test_extract_answers_index(tmp_path):
+    """question of each answer read from prepared posts (one post per line)"""
+    posts = tmp_path / "posts_complete.xml"
+    posts.write_bytes(
+        b'<?xml version="1.0" encoding="utf-8"?>\n<root>\n'
+        b'<post Id="1" PostTypeId="1" Title="One"><comments><comment Id="7" />'
+        b'</comments><answers><answer Id="2" PostTypeId="2" ParentId="1" />'
+        b'<answer Id="5" PostTypeId="2" ParentId="1"><comments>'
+        b'<comment Id="8" /></comments></answer></answers></post>\n'
+        b'<post Id="3" PostTypeId="1" Title="Unanswered"></post>\n'
+        b'<post Id="4" PostTypeId="1" Title="Four"><answers>'
+        b'<answer Id="6" PostTypeId="2" ParentId="4" /></answers>'
+        b'<links><link PostId="4" RelatedPostId="1" /></links></post>\n'
+        b"</root>"
+    )
+    extract_answers_index(src=posts, dst=tmp_path / "answers.idx")
+
+    index = AnswersIndex(tmp_path / "answers.idx")
+    assert [index.get(post_id) for post_id in range(1, 9)] == [
+        None,
+        1,
+        None,
+        None,
+        1,
+        4,
+        None,
+        None,
+    ]
+    index.close()
+
+
+def test_merger_writes_answers_index(tmp_path):
+    """question of each answer recorded while merging answers into questions"""
+    (tmp_path / "questions.xml").write_bytes(
+        b'<post Id="1" PostTypeId="1" Title="One"></post>\n'
+        b'<post Id="3" PostTypeId="1" Title="Unanswered"></post>\n'
+        b'<post Id="4" PostTypeId="1" Title="Four"></post>\n'
+    )
+    # sorted by ParentId
+    (tmp_path / "answers.xml").write_bytes(
+        b'<answer Id="2" PostTypeId="2" ParentId="1"></answer>\n'
+        b'<answer Id="5" PostTypeId="2" ParentId="1"></answer>\n'
+        b'<answer Id="16" PostTypeId="2" ParentId="4"></answer>\n'
+    )
+    (tmp_path / "links.xml").write_bytes(b'<link PostId="4" RelatedPostId="1" />\n')
+
+    PostsAnswersLinksMerger(
+        questions_src=tmp_path / "questions.xml",
+        answers_src=tmp_path / "answers.xml",
+        links_src=tmp_path / "links.xml",
+        dst=tmp_path / "posts_complete.xml",
+        answers_index_dst=tmp_path / "answers.idx",
+    )
+
+    index = AnswersIndex(tmp_path / "answers.idx")
+    assert {post_id: index.get(post_id) for post_id in (1, 2, 3, 4, 5, 16, 17)} == {
+        1: None,
+        2: 1,
+        3: None,
+        4: None,
+        5: 1,
+        16: 4,
+        17: None,
+    }
+    index.close()
+    assert b'<answers><answer Id="16"' in (tmp_path / "posts_complete.xml").read_bytes()
@@ -0,0 +1,27 @@
+import datetime
+import json
+
+from sotoki.utils.progress import Progresser
+from sotoki.utils.shared import context
+
+
+def test_json_file_written_on_print_and_rate_limited(tmp_path, monkeypatch):
+    """updates only rewrite JSON progress file every json_every_seconds"""
+    fpath = tmp_path / "stats.json"
+    monkeypatch.setattr(context, "stats_filename", fpath)
+    progresser = Progresser(nb_questions=0)
+    progresser.start(Progresser.USERS_STEP, nb_total=100)
+    assert fpath.exists()
+    fpath.unlink()
+
+    for _ in range(10):
+        progresser.update(incr=1)
+    assert not fpath.exists()
+
+    progresser.last_json_on -= datetime.timedelta(
+        seconds=Progresser.json_every_seconds + 1
+    )
+    progresser.update(incr=1)
+    assert json.loads(fpath.read_text())["done"] == round(
+        progresser.overall_progress * 100, 2
+    )
@@ -1,3 +1,7 @@
+import shutil
+import subprocess
+import time
+import zlib
 from unittest.mock import MagicMock, call, patch
 
 import pytest
@@ -12,9 +16,8 @@ def redis_db():
     """RedisDatabase instance with mocked Redis connection"""
     db = RedisDatabase.__new__(RedisDatabase)
     db.connections = {}
-    db.pipes = {}
-    db.nb_seens = {}
-    db.should_commits = {}
+    db.clients = [MagicMock()]
+    db.shards_executor = None
     return db
 
 
@@ -42,74 +45,316 @@ def test_dump_sets_dir_before_save(redis_db):
     assert call_order == ["config_set", "save"]
 
 
-def test_execute_pipe_with_retry_succeeds_first_attempt(redis_db):
-    """_execute_pipe_with_retry() calls pipe.execute() once when no error occurs"""
-    mock_pipe = MagicMock()
-    redis_db._execute_pipe_with_retry(mock_pipe)
+def test_execute_with_retry_succeeds_first_attempt(redis_db):
+    """_execute_with_retry() executes a non-transactional pipeline once"""
+    mock_conn = MagicMock()
+    mock_pipe = mock_conn.pipeline.return_value
+    with patch.object(
+        type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
+    ):
+        redis_db._execute_with_retry([("set", ("a", b"1"), {})])
+    mock_conn.pipeline.assert_called_once_with(transaction=False)
     mock_pipe.execute.assert_called_once()
 
 
-def test_execute_pipe_with_retry_retries_on_connection_error(redis_db):
-    """_execute_pipe_with_retry() retries after ConnectionError then succeeds"""
-
-    mock_pipe = MagicMock()
+def test_execute_with_retry_replays_commands_on_connection_error(redis_db):
+    """_execute_with_retry() rebuilds pipeline after ConnectionError (it is reset)"""
+    mock_conn = MagicMock()
+    mock_pipe = mock_conn.pipeline.return_value
     mock_pipe.execute.side_effect = [
         redis.exceptions.ConnectionError("reset"),
-        None,
+        [True],
     ]
-    with patch("threading.Event"):
-        redis_db._execute_pipe_with_retry(mock_pipe, retries=5)
+    with (
+        patch.object(
+            type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
+        ),
+        patch("threading.Event"),
+    ):
+        redis_db.execute_writes([("zadd", ("tags", {"python": 2}), {"nx": True})])
     assert mock_pipe.execute.call_count == 2
+    assert mock_pipe.zadd.call_args_list == [call("tags", {"python": 2}, nx=True)] * 2
 
 
-def test_execute_pipe_with_retry_exhausts_retries(redis_db):
-    """_execute_pipe_with_retry() re-raises after exhausting all retries"""
-
-    mock_pipe = MagicMock()
+def test_execute_with_retry_exhausts_retries(redis_db):
+    """_execute_with_retry() re-raises after exhausting all retries"""
+    mock_conn = MagicMock()
+    mock_pipe = mock_conn.pipeline.return_value
     mock_pipe.execute.side_effect = redis.exceptions.ConnectionError("reset")
-    with patch("threading.Event"), pytest.raises(redis.exceptions.ConnectionError):
-        redis_db._execute_pipe_with_retry(mock_pipe, retries=3)
+    with (
+        patch.object(
+            type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
+        ),
+        patch("threading.Event"),
+        pytest.raises(redis.exceptions.ConnectionError),
+    ):
+        redis_db._execute_with_retry([("set", ("a", b"1"), {})], retries=3)
     assert mock_pipe.execute.call_count == 3
 
 
-def test_commit_retries_on_connection_error(redis_db):
-    """commit() retries pipe.execute() on ConnectionError"""
-
+def test_records_are_packed_in_buckets(redis_db):
+    """set_record() HSETs into {family}:{id // N} hashes at field id % N"""
     mock_pipe = MagicMock()
-    mock_pipe.execute.side_effect = [
-        redis.exceptions.ConnectionError("reset"),
-        None,
+    with patch.object(
+        type(redis_db), "pipe", new_callable=lambda: property(lambda _: mock_pipe)
+    ):
+        redis_db.set_record("QD", 1234, b"details")
+        redis_db.set_record("Q", "1234", b"question", nx=True)
+        redis_db.set_record("U", -1, b"community")
+    assert mock_pipe.hset.call_args_list == [
+        call("QD:12", 34, b"details"),
+        call("U:-1", 99, b"community"),
+    ]
+    assert mock_pipe.hsetnx.call_args == call("Q:12", 34, b"question")
+
+
+def test_get_record_ignores_invalid_ids(redis_db):
+    """get_record() returns None for ids that are not integers (deleted users)"""
+    mock_conn = MagicMock()
+    with patch.object(
+        type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
+    ):
+        assert redis_db.get_record("U", "john") is None
+        assert redis_db.get_record("U", None) is None  # pyright: ignore
+        redis_db.get_record("U", 101)
+    assert mock_conn.hget.call_args == call("U:1", 1)
+
+
+def test_get_records_uses_single_pipeline(redis_db):
+    """get_records() sends HGETs in one non-transactional pipeline, skipping bad ids"""
+    mock_conn = MagicMock()
+    mock_pipe = mock_conn.pipeline.return_value
+    mock_pipe.execute.return_value = [b"user", None]
+    with patch.object(
+        type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
+    ):
+        values = redis_db.get_records([("U", 1), ("U", "john"), ("QD", 1234)])
+    assert values == [b"user", None, None]
+    mock_conn.pipeline.assert_called_once_with(transaction=False)
+    assert mock_pipe.hget.call_args_list == [call("U:0", 1), call("QD:12", 34)]
+    mock_pipe.execute.assert_called_once()
+
+
+def test_query_sets_pipelines_batches(redis_db, monkeypatch):
+    """query_sets() sends a ZREVRANGE pipeline per batch of sets"""
+    monkeypatch.setattr(redis_db, "query_sets_batch_size", 2)
+    mock_pipe = redis_db.conn.pipeline.return_value
+    mock_pipe.execute.side_effect = [[[b"1", b"2"], []], [[b"3"]]]
+
+    members = list(redis_db.query_sets(["T:a", "T:b", "T:c"], num=10))
+
+    assert members == [["1", "2"], [], ["3"]]
+    assert mock_pipe.execute.call_count == 2
+    assert mock_pipe.zrevrange.call_args_list == [
+        call("T:a", 0, 9),
+        call("T:b", 0, 9),
+        call("T:c", 0, 9),
+    ]
+
+
+def test_connection_pool_is_bounded():
+    """all threads share a client over a pool sized for executors' workers"""
+    db = RedisDatabase()
+    assert len(db.pools) == 1
+    assert isinstance(db.pools[0], redis.BlockingConnectionPool)
+    assert db.pools[0].max_connections == (
+        context.max_workers + context.nb_img_threads + db.extra_connections
+    )
+    assert db.conn is db.clients[0]
+    assert "0 connections in use" in db.report()
+    db.writer.stop()
+
+
+@pytest.mark.parametrize(
+    "key, family",
+    [
+        ("U:12", "U"),
+        ("TE:python", "TE"),
+        ("T:c#", "T"),
+        ("questions", "questions"),
+        ("i.stack.imgur.com-files", "*-files"),
+    ],
+)
+def test_key_family(key, family):
+    assert RedisDatabase.key_family(key) == family
+
+
+def test_memory_report_estimates_families_from_samples(redis_db):
+    """families totals are extrapolated from MEMORY USAGE of sampled keys"""
+    mock_conn = MagicMock()
+    mock_conn.scan_iter.return_value = [
+        b"U:0",
+        b"U:1",
+        b"U:2",
+        b"questions",
     ]
+    mock_conn.info.return_value = {"used_memory": 1000, "mem_fragmentation_ratio": 1.4}
+    usages = {b"U:0": 100, b"U:1": 300, b"questions": 50}
+
+    def execute_on_shard(_, commands):
+        return [usages.get(args[0]) for _, args, _ in commands]
+
     with (
         patch.object(
-            type(redis_db), "pipe", new_callable=lambda: property(lambda _: mock_pipe)
+            type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
         ),
-        patch("threading.Event"),
+        patch.object(redis_db, "memory_report_samples", 2),
+        patch.object(redis_db, "_execute_on_shard", side_effect=execute_on_shard),
     ):
-        redis_db.commit()
-    assert mock_pipe.execute.call_count == 2
+        report = redis_db.memory_report()
 
+    assert report["families"] == {
+        "U": {"keys": 3, "sampled": 2, "estimated_bytes": 600},
+        "questions": {"keys": 1, "sampled": 1, "estimated_bytes": 50},
+    }
+    assert report["estimated_bytes"] == 650
+    assert report["memory"] == [{"used_memory": 1000, "mem_fragmentation_ratio": 1.4}]
 
-def test_commit_done_retries_all_pipes(redis_db):
-    """commit(done=True) retries execute() on all thread pipelines"""
 
-    mock_pipe_a = MagicMock()
-    mock_pipe_b = MagicMock()
-    mock_pipe_a.execute.side_effect = [
-        redis.exceptions.ConnectionError("reset"),
-        None,
-    ]
-    mock_pipe_b.execute.return_value = None
-    redis_db.pipes = {1: mock_pipe_a, 2: mock_pipe_b}
+def test_memory_report_extrapolates_stopped_scan(redis_db):
+    """counts are scaled to DBSIZE when SCAN stops, top-level sets still measured"""
+    mock_conn = MagicMock()
+    mock_conn.scan_iter.return_value = iter(
+        [b"U:0", b"QD:0", b"U:1", b"QD:1", b"U:2", b"questions"]
+    )
+    mock_conn.dbsize.return_value = 40
+    mock_conn.info.return_value = {"used_memory": 1000}
+
+    def execute_on_shard(_, commands):
+        return [
+            {b"questions": 500, b"tags": None}.get(args[0], 10)
+            for _, args, _ in commands
+        ]
 
     with (
         patch.object(
-            type(redis_db), "pipe", new_callable=lambda: property(lambda _: MagicMock())
+            type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
         ),
-        patch("time.sleep"),
-        patch("threading.Event"),
+        patch.object(redis_db, "memory_report_scan_limit", 4),
+        patch.object(redis_db, "_execute_on_shard", side_effect=execute_on_shard),
+    ):
+        report = redis_db.memory_report()
+
+    assert report["families"] == {
+        "questions": {"keys": 1, "sampled": 1, "estimated_bytes": 500},
+        "U": {"keys": 20, "sampled": 2, "estimated_bytes": 200},
+        "QD": {"keys": 20, "sampled": 2, "estimated_bytes": 200},
+    }
+
+
+def test_memory_report_unavailable(redis_db):
+    """no report if MEMORY commands are disabled"""
+    mock_conn = MagicMock()
+    mock_conn.scan_iter.side_effect = redis.exceptions.ResponseError("unknown")
+    with patch.object(
+        type(redis_db), "conn", new_callable=lambda: property(lambda _: mock_conn)
     ):
-        redis_db.commit(done=True)
+        assert redis_db.memory_report() is None
+
+
+@pytest.mark.parametrize(
+    "save, appendonly, persistent",
+    [("3600 1", "no", True), ("", "yes", True), ("", "no", False)],
+)
+def test_is_persistent(redis_db, save, appendonly, persistent):
+    """RDB snapshots or AOF are required on every shard"""
+    redis_db.clients = [MagicMock(), MagicMock()]
+    redis_db.clients[0].config_get.side_effect = lambda name: {
+        "save": {"save": "3600 1"},
+        "appendonly": {"appendonly": "no"},
+    }[name]
+    redis_db.clients[1].config_get.side_effect = lambda name: {
+        "save": {"save": save},
+        "appendonly": {"appendonly": appendonly},
+    }[name]
+    assert redis_db.is_persistent() is persistent
+
+
+def test_shard_index_routes_records_and_pins_sets(redis_db):
+    """records keys are routed by crc32, sorted sets and lists go to first shard"""
+    redis_db.clients = [MagicMock() for _ in range(4)]
+    assert redis_db.shard_index("hget", "U:12") == zlib.crc32(b"U:12") % 4
+    assert redis_db.shard_index("hset", b"U:12") == redis_db.shard_index("hget", "U:12")
+    assert {redis_db.shard_index("hget", f"U:{bucket}") for bucket in range(100)} == {
+        0,
+        1,
+        2,
+        3,
+    }
+    assert redis_db.shard_index("zadd", "T:python") == 0
+    assert redis_db.shard_index("rpop", "i.stack.imgur.com-files") == 0
+
+
+def test_execute_with_retry_splits_pipelines_per_shard(redis_db):
+    """commands are sent in a pipeline per shard, results returned in order"""
+    redis_db.clients = [MagicMock(), MagicMock()]
+    keys = {
+        redis_db.shard_index("hget", f"U:{bucket}"): f"U:{bucket}"
+        for bucket in range(10)
+    }
+    for index, client in enumerate(redis_db.clients):
+        client.pipeline.return_value.execute.return_value = [f"hget{index}"]
+    redis_db.clients[0].pipeline.return_value.execute.return_value = ["zscore", "hget0"]
+
+    results = redis_db._execute_with_retry(
+        [
+            ("hget", (keys[1], 1), {}),
+            ("zscore", ("questions", 1), {}),
+            ("hget", (keys[0], 1), {}),
+        ]
+    )
+
+    assert results == ["hget1", "zscore", "hget0"]
+    for client in redis_db.clients:
+        client.pipeline.assert_called_once_with(transaction=False)
+    assert redis_db.clients[1].pipeline.return_value.hget.call_args == call(keys[1], 1)
+
+
+@pytest.fixture
+def redis_shards_urls(tmp_path):
+    """URLs of two redis-server processes listening on unix sockets"""
+    redis_server = shutil.which("redis-server")
+    if not redis_server:
+        pytest.skip("redis-server not available")
+    processes, sockets = [], []
+    for index in range(2):
+        socket = tmp_path / f"redis-{index}.sock"
+        processes.append(
+            subprocess.Popen(
+                [redis_server, "--port", "0", "--unixsocket", str(socket)],
+                cwd=tmp_path,
+                stdout=subprocess.DEVNULL,
+            )
+        )
+        sockets.append(socket)
+    for _ in range(100):
+        if all(socket.exists() for socket in sockets):
+            break
+        time.sleep(0.1)
+    yield ",".join(f"unix://{socket}" for socket in sockets)
+    for process in processes:
+        process.terminate()
+        process.wait()
+
+
+def test_sharded_database(redis_shards_urls, monkeypatch):
+    """records are spread across shards and read back, sets are on first one"""
+    monkeypatch.setattr(context, "redis_url", redis_shards_urls)
+    db = RedisDatabase(initialize=True)
+    for user_id in range(1000):
+        db.set_record("U", user_id, str(user_id).encode())
+    db.pipe.zadd("tags", {"python": 2})
+    db.commit()
+
+    assert db.get_records(("U", user_id) for user_id in range(1000)) == [
+        str(user_id).encode() for user_id in range(1000)
+    ]
+    assert db.get_record("U", 999) == b"999"
+    assert all(client.dbsize() for client in db.clients)
+    assert db.clients[0].zcard("tags") == 1
+    assert db.clients[1].zcard("tags") == 0
+    assert db.memory_report()["families"]["U"]["keys"] == 10
 
-    assert mock_pipe_a.execute.call_count == 2
-    assert mock_pipe_b.execute.call_count == 1
+    db.clear()
+    assert not any(client.dbsize() for client in db.clients)
+    db.teardown()
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sotoki.utils.database.sqlitedb import SQLiteDatabase
+from sotoki.utils.shared import shared
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """SQLiteDatabase in a temporary build dir"""
+    monkeypatch.setattr(shared, "build_dir", tmp_path, raising=False)
+    db = SQLiteDatabase(initialize=True)
+    yield db
+    db.teardown()
+
+
+def test_pipeline_writes_visible_after_commit(sqlite_db):
+    """set/setnx/zadd are written in background, all of them once commit() returns"""
+    sqlite_db.pipe.set("U:1", b"one")
+    sqlite_db.pipe.setnx("U:1", b"ignored")
+    sqlite_db.pipe.set("stats", "[1, 2]")
+    sqlite_db.pipe.zadd("questions", mapping={1: 10, 2: 30}, nx=True)
+    sqlite_db.pipe.zadd("questions", mapping={2: 50}, nx=True)
+
+    sqlite_db.commit()
+
+    assert sqlite_db.safe_get("U:1") == b"one"
+    assert sqlite_db.safe_get("stats") == b"[1, 2]"
+    assert sqlite_db.safe_zscore("questions", 2) == 30
+    assert sqlite_db.safe_zscore("questions", 3) is None
+    assert sqlite_db.get_set_count("questions") == 2
+
+
+def test_query_set_orders_by_score(sqlite_db):
+    """query_set() returns members by score like Redis ZREVRANGEBYSCORE"""
+    sqlite_db.pipe.zadd("tags", mapping={"a": 1, "b": 3, "c": 2}, nx=True)
+    sqlite_db.commit()
+
+    assert list(sqlite_db.query_set("tags")) == [("b", 3), ("c", 2), ("a", 1)]
+    assert list(sqlite_db.query_set("tags", start=1, num=1)) == [("c", 2)]
+    assert list(sqlite_db.query_set("tags", desc=False, scored=False)) == [
+        "a",
+        "c",
+        "b",
+    ]
+
+
+def test_query_sets_returns_top_members(sqlite_db):
+    sqlite_db.pipe.zadd("T:a", mapping={1: 1, 2: 3, 3: 2}, nx=True)
+    sqlite_db.commit()
+
+    assert list(sqlite_db.query_sets(["T:a", "T:b"], num=2)) == [["2", "3"], []]
+
+
+def test_zremrangebyrank_keeps_highest(sqlite_db):
+    """zremrangebyrank(0, -(n+1)) only keeps the n highest scored members"""
+    sqlite_db.pipe.zadd("T:python", mapping={index: index for index in range(10)})
+    sqlite_db.commit()
+
+    sqlite_db.safe_command("zremrangebyrank", "T:python", 0, -4)
+
+    assert list(sqlite_db.query_set("T:python", scored=False)) == ["9", "8", "7"]
+
+
+def test_lists_are_fifo(sqlite_db):
+    """lpush/rpop behave as a FIFO queue, as used by FileDatabase"""
+    for value in (b"a", b"b", b"c"):
+        sqlite_db.safe_command("lpush", "host-files", value)
+    assert sqlite_db.safe_command("llen", "host-files") == 3
+    assert sqlite_db.safe_command("rpop", "host-files") == b"a"
+    assert sqlite_db.safe_command("rpop", "host-files") == b"b"
+
+    sqlite_db.safe_command("delete", "host-files")
+    assert sqlite_db.safe_command("rpop", "host-files") is None
+
+
+def test_commit_waits_for_all_threads_writes(sqlite_db):
+    """commit() waits for writes queued by other threads too"""
+
+    def record(key):
+        sqlite_db.pipe.set(key, b"value")
+
+    threads = [threading.Thread(target=record, args=(f"K:{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sqlite_db.commit()
+
+    assert all(sqlite_db.safe_get(f"K:{i}") == b"value" for i in range(4))
+
+
+def test_records_roundtrip(sqlite_db):
+    """set_record/get_record store records in hashes, nx keeping first value"""
+    sqlite_db.set_record("Q", 1234, b"first", nx=True)
+    sqlite_db.set_record("Q", 1234, b"second", nx=True)
+    sqlite_db.set_record("QD", 1234, b"details")
+    sqlite_db.set_record("U", -1, b"community")
+    sqlite_db.commit()
+
+    assert sqlite_db.get_record("Q", 1234) == b"first"
+    assert sqlite_db.get_record("QD", "1234") == b"details"
+    assert sqlite_db.get_record("U", -1) == b"community"
+    assert sqlite_db.get_record("U", 1) is None
+    assert sqlite_db.get_record("U", "john") is None
+
+    sqlite_db.safe_command("delete", "QD:12")
+    assert sqlite_db.get_record("QD", 1234) is None
+
+
+def test_get_records_and_scores(sqlite_db):
+    """get_records() and get_scores() return values in requested order"""
+    sqlite_db.set_record("U", 1, b"one")
+    sqlite_db.set_record("QD", 1234, b"details")
+    sqlite_db.pipe.zadd("questions", mapping={1234: 10, 5: 2})
+    sqlite_db.commit()
+
+    assert sqlite_db.get_records([("QD", 1234), ("U", 2), ("U", "x"), ("U", 1)]) == [
+        b"details",
+        None,
+        None,
+        b"one",
+    ]
+    assert sqlite_db.get_scores("questions", [5, 3, 1234]) == [2, None, 10]
+
+
+def test_connections_closed_when_threads_exit(sqlite_db):
+    """each thread gets its own connection, closed once the thread exits"""
+    nb_connections = len(sqlite_db.connections)
+    handles = []
+
+    def read():
+        handles.append(sqlite_db.conn.sqlite)
+        assert sqlite_db.safe_get("missing") is None
+        assert len(sqlite_db.connections) == nb_connections + 1
+
+    for _ in range(3):
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+
+    assert len(sqlite_db.connections) == nb_connections
+    for handle in handles:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            handle.execute("SELECT 1")
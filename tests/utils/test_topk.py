@@ -0,0 +1,92 @@
+from sotoki.utils.topk import TopDict, TopIds, pack_entry, unpack_entry
+
+
+def test_topdict_keeps_highest_values():
+    top = TopDict(3)
+    for key, value in (("a", 5), ("b", 1), ("c", 3), ("d", 4), ("e", 0), ("f", 3)):
+        top[key] = value
+
+    assert dict(top) == {"a": 5, "d": 4, "f": 3}
+    assert top.sorted() == ["a", "d", "f"]
+
+
+def test_topdict_updates_are_lazily_deleted():
+    """updating a key replaces its value without evicting another one"""
+    top = TopDict(3)
+    for key, value in (("a", 1), ("b", 2), ("c", 3)):
+        top[key] = value
+    top["a"] = 10
+    top["a"] = 0
+    # stale a=1 and a=10 entries must not count as a's value
+    top["d"] = 1
+
+    assert top.sorted() == ["c", "b", "d"]
+    assert len(top.heap) <= 2 * len(top)
+
+
+def test_topdict_matches_full_sort():
+    values = {user_id: (user_id * 7919) % 1000 + 1 for user_id in range(5000)}
+    top = TopDict(100)
+    for user_id, value in values.items():
+        top[user_id] = value
+
+    expected = sorted(values.values(), reverse=True)[:100]
+    assert [values[user_id] for user_id in top.sorted()] == expected
+
+
+def test_topids_keeps_highest_scores_per_key():
+    tops = TopIds(3)
+    for post_id, score in ((1, 5), (2, -1), (3, 3), (4, 8), (5, 3), (6, 0)):
+        tops.add("python", score, post_id)
+    tops.add("rust", 7, 7)
+
+    assert tops.pop("python") == {4: 8, 1: 5, 5: 3}
+    assert tops.pop("rust") == {7: 7}
+    assert tops.pop("python") == {}
+    assert len(tops) == 0
+
+
+def test_topids_matches_full_sort():
+    scores = {post_id: (post_id * 7919) % 1000 - 500 for post_id in range(5000)}
+    tops = TopIds(100)
+    for post_id, score in scores.items():
+        tops.add("tag", score, post_id)
+
+    # equal scores ordered as Redis orders members: as strings
+    expected = sorted((score, str(post_id)) for post_id, score in scores.items())
+    top = sorted((score, str(post_id)) for post_id, score in tops.pop("tag").items())
+    assert top == expected[-100:]
+
+
+def test_topids_keeps_ids_redis_keeps_on_equal_scores():
+    """at the cut-off, ids kept are highest as strings, as trimmed Redis sets keep"""
+    tops = TopIds(3)
+    for post_id in (1, 9, 10, 100, 2, 89):
+        tops.add("python", 7, post_id)
+    tops.add("python", 8, 1000)
+
+    # ZREVRANGE order of equal scores: 9, 89, 2, 100, 10, 1
+    assert tops.pop("python") == {1000: 8, 9: 7, 89: 7}
+
+
+def test_pack_entry_roundtrip():
+    entries = [
+        pack_entry(score, item_id)
+        for score, item_id in (
+            (-(2**26), 0),
+            (-1, 4_294_967_295),
+            (0, 7),
+            (5, 10),
+            (5, 9),
+            (2**26 - 1, 100),
+        )
+    ]
+    assert entries == sorted(entries)
+    assert [unpack_entry(entry) for entry in entries] == [
+        (-(2**26), 0),
+        (-1, 4_294_967_295),
+        (0, 7),
+        (5, 10),
+        (5, 9),
+        (2**26 - 1, 100),
+    ]
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from sotoki.utils.shared import shared
+from sotoki.utils.watchdog import MemorySample, MemoryWatchdog
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = MagicMock()
+    monkeypatch.setattr(shared, "database", database, raising=False)
+    return database
+
+
+def sample_at(ratio: float) -> MemorySample:
+    return MemorySample(total=1000, used=int(ratio * 1000), rss=100)
+
+
+def test_throttles_above_high_watermark_and_resumes_below_low(database):
+    """executors are throttled above high-water mark until below low-water mark"""
+    executor = MagicMock()
+    watchdog = MemoryWatchdog([executor], high_watermark=0.9, low_watermark=0.8)
+
+    for ratio in (0.5, 0.95, 0.97, 0.85, 0.75):
+        watchdog.sample = MagicMock(return_value=sample_at(ratio))
+        watchdog.check()
+
+    executor.throttle.assert_called_once()
+    executor.unthrottle.assert_called_once()
+    assert database.request_commit.call_count == 2
+    assert watchdog.nb_throttles == 1
+    assert not watchdog.throttling
+
+
+def test_stop_resumes_throttled_executors(database):
+    """stop() restores admission of executors throttled at that time"""
+    executor = MagicMock()
+    watchdog = MemoryWatchdog([executor], high_watermark=0.9, low_watermark=0.8)
+    watchdog.sample = MagicMock(return_value=sample_at(0.95))
+    watchdog.check()
+
+    watchdog.stop()
+
+    database.request_commit.assert_called_once()
+    executor.unthrottle.assert_called_once()
+    assert not watchdog.throttling
@@ -0,0 +1,79 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from sotoki.utils.database.writer import BackgroundWriter
+
+
+@pytest.fixture
+def database():
+    """Database mock recording executed batches"""
+    database = MagicMock()
+    database.batches = []
+    database.execute_writes.side_effect = lambda commands: database.batches.append(
+        list(commands)
+    )
+    return database
+
+
+@pytest.fixture
+def writer(database):
+    writer = BackgroundWriter(database)
+    yield writer
+    writer.stop()
+
+
+def test_flush_executes_queued_commands_in_order(writer, database):
+    """flush() waits for all queued commands, executed as a single batch"""
+    writer.set("a", b"1")
+    writer.hsetnx("Q:12", 34, b"question")
+    writer.zadd("tags", {"python": 2}, nx=True)
+
+    writer.flush()
+
+    assert database.batches == [
+        [
+            ("set", ("a", b"1"), {}),
+            ("hsetnx", ("Q:12", 34, b"question"), {}),
+            ("zadd", ("tags", {"python": 2}), {"nx": True}),
+        ]
+    ]
+    assert writer.nb_commands == 3
+    assert writer.nb_flushes == 1
+
+
+def test_flushes_by_size(database, monkeypatch):
+    """a batch is executed as soon as flush_size bytes are buffered"""
+    monkeypatch.setattr(BackgroundWriter, "flush_size", 100)
+    monkeypatch.setattr(BackgroundWriter, "flush_interval", 60)
+    writer = BackgroundWriter(database)
+    for index in range(5):
+        writer.set(f"K:{index}", b"x" * 47)
+
+    writer.stop()
+
+    # 50B per command: every other command triggers a flush
+    assert [len(batch) for batch in database.batches] == [2, 2, 1]
+
+
+def test_flushes_by_interval(database, monkeypatch):
+    """buffered commands are executed flush_interval after the first one"""
+    monkeypatch.setattr(BackgroundWriter, "flush_interval", 0.01)
+    writer = BackgroundWriter(database)
+    writer.set("a", b"1")
+
+    time.sleep(0.5)
+
+    assert database.batches == [[("set", ("a", b"1"), {})]]
+    writer.stop()
+
+
+def test_flush_raises_execution_error(writer, database):
+    """errors executing a batch are raised (once) by next awaited flush()"""
+    database.execute_writes.side_effect = ValueError("bad command")
+    writer.set("a", b"1")
+
+    with pytest.raises(ValueError, match="bad command"):
+        writer.flush()
+    writer.flush()